@@ -1,16 +1,66 @@
 #!/usr/bin/env python2
 
-from itertools import izip
+try:
+  from itertools import izip
+except ImportError:
+  izip = zip
 import os
 import shutil
 import sys
 import datetime
 import traceback
 import argparse
+import multiprocessing
+import struct
+import zlib
+import threading
+import json
+import hashlib
+import contextlib
+import bisect
+import socket
+import signal
+import errno
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+try:
+  import queue
+except ImportError:
+  import Queue as queue
+import binascii
+import mmap
+import stat
+import random
+import tempfile
+try:
+  from math import gcd
+except ImportError:
+  from fractions import gcd
+from timeit import default_timer
+# NumPy is imported on first use (see _importNumpy()): it takes longer than the short runs.
+numpy = None
+try:
+  import resource
+except ImportError:
+  resource = None
+# asyncio is imported by mixAsync() only (see _importAsyncio()).
+asyncio = None
 
 defaultChunkSize = 16384 # 16KiB
+defaultTileBudget = 4194304 # 4MiB
+defaultShiftBlockSize = 16777216 # 16MiB
+shiftMinStep = 1048576 # 1MiB, the shortest gap-sized block move of openGap() for a long tail
+shiftMaxSteps = 64 # the most gap-sized block moves of openGap() for a tail of a short gap
+autoChunkSize = 'auto'
+defaultAutoChunkLimit = 16777216 # 16MiB
+defaultCheckpointChunks = 256
+defaultAsyncJobs = 4
+asyncProgressInterval = 0.1 # seconds between the progress updates posted by mixAsync()
+kernelCopyMinSegment = 65536 # 64KiB
+kernelCopyPiece = 4194304 # 4MiB
 logMsgDateTimeFormat = '%H:%M:%S, %d.%m.%Y'
 fileTimeStampFormat = '%Y.%m.%d-%H.%M.%S-%f'
+stdStream = '-' # Input File 1 / Output File path standing for stdin / stdout
 
 progName = 'jmFUUtil'
 progVersion = '0.1.b'
@@ -50,43 +100,409 @@ def ordbNOT(x):
   '''
   return (~x)%256
 
+# *** ==============================================================================================
+# Mixing Engines.
+# Each engine implements the same three operations -- xor(s1,s2), notxor(s1,s2) and bnot(s1) --
+# on whole strings (chunks) of bytes, giving byte-identical results. The engine to be used by 
+# sxor(), snotxor() and snot() is chosen once, on the first use, by selectMixEngine().
+# The in-place variants -- xorInto(buf, pos, src) and notInto(buf, n) -- modify a preallocated
+# bytearray buffer; they are used by jm_write().
+# *** ==============================================================================================
+
+# Translation table for the Bitwise NOT: byte x --> byte (255 - x).
+_NOT_TABLE = bytes(bytearray(range(255, -1, -1)))
+
+class bytewiseEngine:
+  '''
+  Reference engine: process the strings character by character, 
+  as the original sxor/snotxor/snot implementations did.
+  '''
+  name = 'bytewise'
+  
+  def xor(self, s1, s2):
+    return bytes(bytearray(a ^ b for a,b in izip(bytearray(s1), bytearray(s2))))
+  
+  def notxor(self, s1, s2):
+    return bytes(bytearray(ordbNOT(a ^ b) for a,b in izip(bytearray(s1), bytearray(s2))))
+  
+  def bnot(self, s1):
+    return bytes(bytearray(ordbNOT(a) for a in bytearray(s1)))
+  
+  def xorInto(self, buf, pos, src):
+    for i, b in enumerate(bytearray(src)):
+      buf[pos + i] ^= b
+  
+  def notInto(self, buf, n):
+    for i in range(n):
+      buf[i] = ordbNOT(buf[i])
+# *** ----------------------------------------------------------------------------------------------
+
+class wordwiseEngine:
+  '''
+  Treat the whole chunk as a single (long) integer and perform XOR on it at once;
+  perform Bitwise NOT by means of the translation table.
+  '''
+  name = 'wordwise'
+  
+  if hasattr(int, 'from_bytes'):
+    @staticmethod
+    def _s2i(s):
+      return int.from_bytes(s, 'big')
+    @staticmethod
+    def _i2s(x, n):
+      return x.to_bytes(n, 'big')
+  else:
+    @staticmethod
+    def _s2i(s):
+      return int(binascii.hexlify(s), 16)
+    @staticmethod
+    def _i2s(x, n):
+      return binascii.unhexlify('%0*x' % (2*n, x))
+  
+  def xor(self, s1, s2):
+    n = min(len(s1), len(s2))
+    if n == 0:
+      return b''
+    return self._i2s(self._s2i(s1[:n]) ^ self._s2i(s2[:n]), n)
+  
+  def notxor(self, s1, s2):
+    return self.xor(s1, s2).translate(_NOT_TABLE)
+  
+  def bnot(self, s1):
+    return bytes(s1).translate(_NOT_TABLE)
+  
+  def xorInto(self, buf, pos, src):
+    n = len(src)
+    if n == 0:
+      return
+    buf[pos:pos+n] = self._i2s(self._s2i(buf[pos:pos+n]) ^ self._s2i(src), n)
+  
+  def notInto(self, buf, n):
+    buf[:n] = buf[:n].translate(_NOT_TABLE)
+# *** ----------------------------------------------------------------------------------------------
+
+_numpyTried = False
+
+def _importNumpy():
+  ''' Import NumPy once, on first use: return the module, or None if it is not installed. '''
+  global numpy, _numpyTried
+  if not _numpyTried:
+    _numpyTried = True
+    try:
+      import numpy
+    except ImportError:
+      numpy = None
+  return numpy
+
+class numpyEngine:
+  ''' Use NumPy bitwise_xor() and invert() on uint8 arrays. Requires NumPy (see _importNumpy()). '''
+  name = 'numpy'
+  
+  @staticmethod
+  def _a2s(a):
+    if hasattr(a, 'tobytes'):
+      return a.tobytes()
+    return a.tostring()
+  
+  def xor(self, s1, s2):
+    n = min(len(s1), len(s2))
+    a1 = numpy.frombuffer(s1, dtype=numpy.uint8, count=n)
+    a2 = numpy.frombuffer(s2, dtype=numpy.uint8, count=n)
+    return self._a2s(numpy.bitwise_xor(a1, a2))
+  
+  def notxor(self, s1, s2):
+    n = min(len(s1), len(s2))
+    a1 = numpy.frombuffer(s1, dtype=numpy.uint8, count=n)
+    a2 = numpy.frombuffer(s2, dtype=numpy.uint8, count=n)
+    a = numpy.bitwise_xor(a1, a2)
+    return self._a2s(numpy.invert(a, out=a))
+  
+  def bnot(self, s1):
+    return self._a2s(numpy.invert(numpy.frombuffer(s1, dtype=numpy.uint8)))
+  
+  def xorInto(self, buf, pos, src):
+    n = len(src)
+    a = numpy.frombuffer(buf, dtype=numpy.uint8, count=n, offset=pos)
+    numpy.bitwise_xor(a, numpy.frombuffer(src, dtype=numpy.uint8, count=n), out=a)
+  
+  def notInto(self, buf, n):
+    a = numpy.frombuffer(buf, dtype=numpy.uint8, count=n)
+    numpy.invert(a, out=a)
+# *** ----------------------------------------------------------------------------------------------
+
+def availableMixEngines():
+  '''
+  engines = availableMixEngines()
+  Return a dict {name: engine object} of the Mixing Engines usable in the current environment.
+  '''
+  engines = {
+    bytewiseEngine.name: bytewiseEngine(),
+    wordwiseEngine.name: wordwiseEngine()
+    }
+  if _importNumpy() is not None:
+    engines[numpyEngine.name] = numpyEngine()
+  return engines
+
+# The names of all the Mixing Engines (see availableMixEngines() for the usable ones).
+mixEngineNames = (bytewiseEngine.name, wordwiseEngine.name, numpyEngine.name)
+# *** ----------------------------------------------------------------------------------------------
+
+def timeMixEngine(engine, sampleSize=defaultChunkSize, rounds=3):
+  '''
+  sec = timeMixEngine(engine, sampleSize, rounds)
+  Return the best time (in seconds) of "rounds" runs of the XOR, NOT-XOR and NOT operations 
+  of the given engine over random strings of sampleSize bytes.
+  '''
+  s1 = os.urandom(sampleSize)
+  s2 = os.urandom(sampleSize)
+  best = None
+  for i in range(rounds):
+    t0 = default_timer()
+    engine.xor(s1, s2)
+    engine.notxor(s1, s2)
+    engine.bnot(s1)
+    dt = default_timer() - t0
+    if best is None or dt < best:
+      best = dt
+  return best
+# *** ----------------------------------------------------------------------------------------------
+
+class _lazyMixEngine:
+  '''
+  Placeholder of mixEngine until the first use: selectMixEngine() is run then, so neither NumPy
+  is imported nor the engines are timed by the runs not mixing anything (--version, --client).
+  '''
+  def __getattr__(self, attr):
+    return getattr(selectMixEngine(), attr)
+
+mixEngine = _lazyMixEngine()
+
+def selectMixEngine(name=None):
+  '''
+  engine = selectMixEngine(name=None)
+  Set up the Mixing Engine used by sxor(), snotxor() and snot(). If name is not given (or 'auto') 
+  the fastest one of the vectorized (i.e. not 'bytewise') available engines is chosen 
+  by timing them on a sample chunk. Return the selected engine object.
+  '''
+  global mixEngine
+  engines = availableMixEngines()
+  if name and name != 'auto':
+    if name not in engines:
+      raise ValueError('Mixing Engine {!r} is not available. Choose from: {}'.format(
+        name, ', '.join(sorted(engines))))
+    mixEngine = engines[name]
+  else:
+    candidates = [e for n, e in engines.items() if n != bytewiseEngine.name]
+    mixEngine = min(candidates, key=timeMixEngine)
+  return mixEngine
+
 # *** ----------------------------------------------------------------------------------------------
 def sxor(s1,s2):
   '''
   sOut = sxor(s1,s2)
-    * convert strings s1 and s2 to a list of character pair tuples;
-    * go through each tuple, converting them to ASCII code (ord);
-    * perform XOR (Bitwise Exclusive Or) on the ASCII codes;
-    * then convert the result back to ASCII (chr);
-    * merge the resulting array of characters to the string sOut.
+  Perform XOR (Bitwise Exclusive Or) on the strings s1 and s2 byte by byte 
+  (up to the length of the shortest one) by the selected Mixing Engine. Return the result string.
   '''
-  #return ''.join(chr(ord(a) ^ ord(b)) for a,b in zip(s1,s2))
-  return ''.join(chr(ord(a) ^ ord(b)) for a,b in izip(s1,s2))
+  return mixEngine.xor(s1, s2)
 
 # *** ----------------------------------------------------------------------------------------------
 def snotxor(s1,s2):
   '''
   sOut = snotxor(s1,s2)
-    * convert strings s1 and s2 to a list of character pair tuples;
-    * go through each tuple, converting them to ASCII code (ord);
-    * perform XOR (Bitwise Exclusive Or) on the ASCII codes, 
-      returning also an ASCII code as a result;
-    * perform Bitwise NOT on the result of the previous step;
-    * then convert the result back to ASCII (chr);
-    * merge the resulting array of characters to the string sOut.
+  Perform XOR (Bitwise Exclusive Or) on the strings s1 and s2, then perform Bitwise NOT 
+  on the result by the selected Mixing Engine. Return the result string.
   '''
-  return ''.join(chr( ordbNOT(ord(a) ^ ord(b)) ) for a,b in izip(s1,s2))
+  return mixEngine.notxor(s1, s2)
 
 # *** ----------------------------------------------------------------------------------------------
 def snot(s1):
   ''' sOut = snot(s1)
-    * convert the s1 string to a list of characters;
-    * go through each character, converting them to ASCII code (ord);
-    * perform Bitwise NOT on the ASCII code;
-    * then convert the result back to ASCII (chr);
-    * merge the resulting array of characters to the string sOut.
+  Perform Bitwise NOT on every byte of the s1 string by the selected Mixing Engine. 
+  Return the result string.
+  '''
+  return mixEngine.bnot(s1)
+
+# *** ==============================================================================================
+# Input File cache shared by many runs in one process (see runBatch()).
+# *** ==============================================================================================
+
+def _pathKey(path):
+  ''' The key to tell the files by: the same for all the names of a file (relative, symlinked). '''
+  return os.path.realpath(path)
+
+def _fileId(path):
+  ''' (st_dev, st_ino) of the existing file (hard links included), else its _pathKey(). '''
+  try:
+    st = os.stat(path)
+  except OSError:
+    return _pathKey(path)
+  return (st.st_dev, st.st_ino)
+# *** ----------------------------------------------------------------------------------------------
+
+class inputFileCache:
+  '''
+  cache = inputFileCache(volatile=(), validate=False)
+  Thread-safe cache of Input File sizes, contents of the short ones (see tileReader) and read-only 
+  memory maps (see mmapReader), shared by many runs in one process. The files listed in volatile 
+  (i.e. written by some of the runs) are never cached; cache.addVolatile(paths) adds more of them.
+  If validate, the entries of a file are dropped once its stat (inode, size, modification time) 
+  changes: for a long-lived cache (see serveDaemon()) of files that may be changed by others.
   '''
-  return ''.join(chr(ordbNOT(ord(a))) for a in s1)
+  def __init__(self, volatile=(), validate=False):
+    self.volatile = set(_pathKey(path) for path in volatile)
+    self.validate = validate
+    self._lock = threading.Lock()
+    self._sizes = {}
+    self._data = {}
+    self._maps = {}
+    self._stats = {}
+    self._users = {}    # id(mmap) --> number of the readers using it (see unmap())
+    self._retired = []  # maps dropped while in use: closed once unused, or by close()
+  
+  def _key(self, path):
+    key = _pathKey(path)
+    if key in self.volatile:
+      return None
+    if self.validate:
+      st = os.stat(key)
+      sig = (st.st_ino, st.st_size, st.st_mtime)
+      with self._lock:
+        if self._stats.get(key) != sig:
+          self._drop(key)
+          self._stats[key] = sig
+    return key
+  
+  def _drop(self, key):
+    # (Under the lock.)
+    self._sizes.pop(key, None)
+    self._data.pop(key, None)
+    self._stats.pop(key, None)
+    if key in self._maps:
+      pair = self._maps.pop(key)
+      if self._users.get(id(pair[0])):
+        self._retired.append(pair)
+      else:
+        self._closeMap(pair)
+  
+  @staticmethod
+  def _closeMap(pair):
+    mm, view = pair
+    try:
+      if view is not mm:
+        view.release()
+      mm.close()
+    except BufferError:
+      # Some slice of it is still alive: the garbage collector unmaps it.
+      pass
+  
+  def addVolatile(self, paths):
+    with self._lock:
+      for path in paths:
+        key = _pathKey(path)
+        self.volatile.add(key)
+        self._drop(key)
+  
+  def size(self, path):
+    key = self._key(path)
+    if key is None:
+      return os.path.getsize(path)
+    with self._lock:
+      if key not in self._sizes:
+        self._sizes[key] = os.path.getsize(path)
+      return self._sizes[key]
+  
+  def data(self, path):
+    key = self._key(path)
+    if key is None:
+      with open(path, 'rb') as fObj:
+        return fObj.read()
+    with self._lock:
+      if key not in self._data:
+        with open(path, 'rb') as fObj:
+          self._data[key] = fObj.read()
+      return self._data[key]
+  
+  def mmap(self, path):
+    '''
+    Return the shared (mmap, view) pair for the file, or None if it is volatile. 
+    Hand it back by unmap() once done with it.
+    '''
+    key = self._key(path)
+    if key is None:
+      return None
+    with self._lock:
+      if key not in self._maps:
+        with open(path, 'rb') as fObj:
+          mm = mmap.mmap(fObj.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+          view = memoryview(mm)
+        except TypeError:
+          view = mm
+        self._maps[key] = (mm, view)
+      pair = self._maps[key]
+      self._users[id(pair[0])] = self._users.get(id(pair[0]), 0) + 1
+      return pair
+  
+  def unmap(self, pair):
+    ''' Hand back the pair got by mmap(): the map dropped from the cache meanwhile is closed. '''
+    with self._lock:
+      key = id(pair[0])
+      self._users[key] -= 1
+      if self._users[key]:
+        return
+      del self._users[key]
+      for i, retired in enumerate(self._retired):
+        if retired[0] is pair[0]:
+          del self._retired[i]
+          self._closeMap(retired)
+          break
+  
+  def close(self):
+    with self._lock:
+      for pair in list(self._maps.values()) + self._retired:
+        self._closeMap(pair)
+      self._maps.clear()
+      self._retired = []
+      self._users.clear()
+      self._stats.clear()
+      self._data.clear()
+      self._sizes.clear()
+# *** ----------------------------------------------------------------------------------------------
+
+# The inputFileCache in effect (if any).
+_inputCache = None
+
+def fileSize(filePath):
+  ''' Return the size of the file (from the Input File cache in effect, if any). '''
+  if _inputCache is not None:
+    return _inputCache.size(filePath)
+  return os.path.getsize(filePath)
+
+def isStream(filePath):
+  '''
+  streamFlag = isStream(filePath)
+  Whether the path stands for a non-seekable file: '-' (stdin / stdout), FIFO, character device
+  or socket. Such an Input File is consumed once, not in round-robin manner (see streamReader).
+  '''
+  if filePath == stdStream:
+    return True
+  try:
+    mode = os.stat(filePath).st_mode
+  except (OSError, TypeError):
+    return False
+  return stat.S_ISFIFO(mode) or stat.S_ISCHR(mode) or stat.S_ISSOCK(mode)
+
+def _stdBinary(fObj):
+  ''' Binary layer of sys.stdin / sys.stdout (python 3), or the file object itself (python 2). '''
+  return getattr(fObj, 'buffer', fObj)
+
+def _seekable(fObj):
+  ''' Whether the file object supports seek() (not a pipe, socket, terminal, ...). '''
+  try:
+    os.lseek(fObj.fileno(), 0, os.SEEK_CUR)
+  except (AttributeError, OSError, ValueError):
+    return False
+  return True
 
 # *** ==============================================================================================
 def fixOffset(filePath, offset):
@@ -97,7 +513,7 @@ def fixOffset(filePath, offset):
   by FileObj.seek() method. Returns the "normal" offset value.
   Both fxdOffset and offset are in bytes.
   '''
-  fSize = os.path.getsize(filePath)
+  fSize = fileSize(filePath)
   offset = int(offset)
   return offset % fSize
 
@@ -113,17 +529,1124 @@ def roundRead(fObj, bNum):
   by "fObj = open(fPath, 'rb')" and "fObj.seek(offset, 0)", respectively.
   !!! It is STRONGLY recomended to run this function inside "with"-Statement Context only !!!
   '''
-  s = ''
+  # Collect the pieces and join them once: "s += ..." on every pass is quadratic 
+  # when the file is much smaller than bNum.
+  parts = []
   bLeft = bNum
   while True:
-    s += fObj.read(bLeft)
-    bLeft = bNum - len(s)
+    s = fObj.read(bLeft)
+    parts.append(s)
+    bLeft -= len(s)
     if bLeft == 0:
       break
     else:
       fObj.seek(0, 0)
-  return s
+  return b''.join(parts)
+  
+# *** ----------------------------------------------------------------------------------------------
+
+class runCancelled(RuntimeError):
+  ''' Raised at a chunk boundary of the run whose cancel event is set (see runStats). '''
+# *** ----------------------------------------------------------------------------------------------
+
+class runStats:
+  '''
+  stats = runStats(progress=None, total=0, digest=None, cancel=None)
+  Timing and byte counters of a run: seconds spent in every phase (backup / temporary copy, 
+  reading, mixing, writing, renaming, ...), chunks processed, bytes written, bytes read and 
+  round-robin wrap-arounds per Input File. progress -- optional callable progress(done, total) 
+  invoked after every chunk written (from the writer thread in the pipelined mode) with the number 
+  of bytes written so far and the total number of bytes to write. See jmFU.run().
+  digest -- name of the hashlib algorithm to compute the digests of the bytes read from every 
+  Input File and of the mixed bytes written with (see hashingWriter), None -- no digests.
+  stats.hashes holds the hash objects of the written bytes by name ('mixed', 'output').
+  cancel -- optional threading.Event: once it is set, runCancelled is raised after the next chunk 
+  written (or segment, in the parallel mode).
+  stats.writing is set once jm_write() starts writing: some mixed bytes may be out from then on,
+  even if no chunk is counted yet (e.g. a failed write).
+  '''
+  def __init__(self, progress=None, total=0, digest=None, cancel=None):
+    self.progress = progress
+    self.cancel = cancel
+    self.total = total
+    self.digest = digest
+    self.seconds = {}
+    self.chunks = 0
+    self.bytesWritten = 0
+    self.inputs = {}  # path --> [bytes read, wraps]
+    self.inputDigests = {}
+    self.hashes = {}
+    self.resumedFrom = None  # bytes committed by the interrupted run resumed (see jmFU)
+    self.writing = False
+  
+  def newHash(self):
+    ''' Return a new hash object of the digest algorithm, or None if no digests are computed. '''
+    if not self.digest:
+      return None
+    return hashlib.new(self.digest)
+  
+  def addTime(self, phase, dt):
+    self.seconds[phase] = self.seconds.get(phase, 0.0) + dt
+  
+  @contextlib.contextmanager
+  def phase(self, name):
+    ''' "with stats.phase(name):" -- add the time spent in the block to the phase. '''
+    t0 = default_timer()
+    try:
+      yield
+    finally:
+      self.addTime(name, default_timer() - t0)
+  
+  def chunk(self, n):
+    self.chunks += 1
+    self.bytesWritten += n
+    if self.progress:
+      self.progress(self.bytesWritten, self.total)
+    self.checkCancel()
+  
+  def checkCancel(self):
+    if self.cancel is not None and self.cancel.is_set():
+      raise runCancelled('Cancelled after ' + str(self.bytesWritten) + ' bytes written')
+  
+  def addInput(self, path, bytesRead, wraps):
+    counts = self.inputs.setdefault(path, [0, 0])
+    counts[0] += bytesRead
+    counts[1] += wraps
+  
+  def addReaders(self, readers):
+    for rdr in readers:
+      self.addInput(rdr.path, rdr.bytesRead, (rdr.start + rdr.bytesRead) // rdr.size if rdr.size else 0)
+      if rdr.hashObj:
+        self.inputDigests[rdr.path] = rdr.hashObj.hexdigest()
+  
+  def merge(self, d):
+    ''' Add the counters of another run (as returned by as_dict()) to this one. '''
+    for phase, dt in d['seconds'].items():
+      self.addTime(phase, dt)
+    self.chunks += d['chunks']
+    for inp in d['inputs']:
+      counts = self.inputs.setdefault(inp['path'], [0, 0])
+      counts[0] += inp['bytes_read']
+      counts[1] += inp['wraps']
+    self.bytesWritten += d['bytes_written']
+    if self.progress:
+      self.progress(self.bytesWritten, self.total)
+    self.checkCancel()
+  
+  def as_dict(self):
+    d = {
+      'seconds': dict(self.seconds),
+      'chunks': self.chunks,
+      'bytes_written': self.bytesWritten,
+      'inputs': [{'path': path, 'bytes_read': counts[0], 'wraps': counts[1]} 
+                 for path, counts in self.inputs.items()]
+      }
+    if self.digest:
+      d['digest'] = self.digest
+      d['digests'] = dict((name, h.hexdigest()) for name, h in self.hashes.items())
+      for inp in d['inputs']:
+        inp['digest'] = self.inputDigests.get(inp['path'])
+    if self.seconds.get('jm_write'):
+      d['mb_per_s'] = self.bytesWritten / self.seconds['jm_write'] / 1e6
+    if self.resumedFrom is not None:
+      d['resumed_from'] = self.resumedFrom
+    return d
+# *** ----------------------------------------------------------------------------------------------
+
+def _promLabel(value):
+  ''' The value escaped for a label of the Prometheus text exposition format. '''
+  return ('%s' % value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+# *** ----------------------------------------------------------------------------------------------
+
+def writeStats(stats, path):
+  '''
+  writeStats(stats, path)
+  Export the stats dict (see jmFU.run()) to the file: in the Prometheus text exposition format 
+  if the path ends with '.prom' (for the node_exporter textfile collector), as JSON otherwise.
+  The file is replaced atomically.
+  '''
+  if path.endswith('.prom'):
+    method = _promLabel(stats['method'])
+    lines = ['# TYPE jmfu_phase_seconds gauge']
+    for phase, dt in sorted(stats['seconds'].items()):
+      lines.append('jmfu_phase_seconds{method="%s",phase="%s"} %r' % (method, _promLabel(phase), dt))
+    lines.append('# TYPE jmfu_bytes_written gauge')
+    lines.append('jmfu_bytes_written{method="%s"} %d' % (method, stats['bytes_written']))
+    lines.append('# TYPE jmfu_chunks gauge')
+    lines.append('jmfu_chunks{method="%s"} %d' % (method, stats['chunks']))
+    lines.append('# TYPE jmfu_input_bytes_read gauge')
+    for inp in stats['inputs']:
+      lines.append('jmfu_input_bytes_read{input="%s"} %d' % (_promLabel(inp['path']), inp['bytes_read']))
+    lines.append('# TYPE jmfu_input_wraps gauge')
+    for inp in stats['inputs']:
+      lines.append('jmfu_input_wraps{input="%s"} %d' % (_promLabel(inp['path']), inp['wraps']))
+    lines.append('# TYPE jmfu_mb_per_s gauge')
+    lines.append('jmfu_mb_per_s{method="%s"} %r' % (method, stats.get('mb_per_s', 0.0)))
+    lines.append('# TYPE jmfu_success gauge')
+    lines.append('jmfu_success{method="%s"} %d' % (method, stats['ok']))
+    text = '\n'.join(lines) + '\n'
+  else:
+    text = json.dumps(stats, indent=2, sort_keys=True) + '\n'
+  tmpPath = path + '.tmp'
+  with open(tmpPath, 'w') as fObj:
+    fObj.write(text)
+  os.rename(tmpPath, path)
+# *** ----------------------------------------------------------------------------------------------
+
+def _repeatFill(view, pos, n, period):
+  '''
+  Fill view[pos:n] continuing the periodic sequence (with the given period) already stored 
+  in view[0:pos] (pos >= period). The block copied doubles at every step, so the number of copy 
+  operations is logarithmic in n/period.
+  '''
+  while pos < n:
+    m = pos - pos % period
+    k = min(m, n - pos)
+    view[pos:pos+k] = view[pos-m:pos-m+k]
+    pos += k
+# *** ----------------------------------------------------------------------------------------------
+
+class roundReader:
+  '''
+  rdr = roundReader(filePath, offset)
+  Round-robin reader of the Input File (filePath) starting from the given "extended" offset 
+  (see fixOffset()). Unlike roundRead() it delivers the bytes into preallocated buffers:
+    * rdr.readinto(buf, n) -- fill buf[:n] with the next n bytes, return n;
+    * rdr.slices(n) -- yield buffer views holding the next n bytes in total;
+    * rdr.seek(pos) -- continue from the byte pos (counted from the starting offset);
+    * rdr.adviseCache(n) -- hint the kernel that n bytes are going to be read sequentially: 
+      the next chunk is read ahead (POSIX_FADV_WILLNEED) and, if the reading does not wrap 
+      around, the chunks consumed are dropped from the page cache (POSIX_FADV_DONTNEED).
+  Call rdr.close() (or use it in "with"-Statement Context) when done.
+  rdr.path, rdr.start (the fixed offset) and rdr.bytesRead (number of bytes delivered) 
+  are kept for the run statistics (see runStats); the bytes delivered are also fed to 
+  rdr.hashObj (hashlib object), if it is set.
+  '''
+  hashObj = None
+  hints = False
+  
+  def __init__(self, filePath, offset):
+    self.fObj = open(filePath, 'rb')
+    self.size = os.fstat(self.fObj.fileno()).st_size
+    self.path = filePath
+    self.start = fixOffset(filePath, offset)
+    self.bytesRead = 0
+    self.fObj.seek(self.start, 0)
+    self._buf = bytearray(0)
+  
+  def readinto(self, buf, n):
+    self.bytesRead += n
+    view = memoryview(buf)
+    pos = 0
+    while pos < n:
+      if pos >= self.size:
+        # The whole file is in the buffer already: repeat it instead of re-reading.
+        _repeatFill(view, pos, n, self.size)
+        self.fObj.seek((self.fObj.tell() + n - pos) % self.size, 0)
+        break
+      k = self.fObj.readinto(view[pos:n])
+      if not k:
+        self.fObj.seek(0, 0)
+      else:
+        pos += k
+    if self.hashObj:
+      self.hashObj.update(view[:n])
+    if self.hints:
+      cur = self.fObj.tell()
+      _fadvise(self.fObj.fileno(), cur, n, POSIX_FADV_WILLNEED)
+      if self.dropConsumed:
+        _fadvise(self.fObj.fileno(), cur - n, n, POSIX_FADV_DONTNEED)
+    return n
+  
+  def adviseCache(self, n):
+    self.hints = True
+    self.dropConsumed = self.start + n <= self.size
+    _fadvise(self.fObj.fileno(), 0, 0, POSIX_FADV_SEQUENTIAL)
+  
+  def slices(self, n):
+    if len(self._buf) < n:
+      self._buf = bytearray(n)
+    self.readinto(self._buf, n)
+    yield memoryview(self._buf)[:n]
+  
+  def seek(self, pos):
+    self.fObj.seek((self.start + pos) % self.size, 0)
+  
+  def close(self):
+    self.fObj.close()
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, *excInfo):
+    self.close()
+# *** ----------------------------------------------------------------------------------------------
+
+class mmapReader(roundReader):
+  '''
+  rdr = mmapReader(filePath, offset)
+  Memory-mapped version of roundReader: rdr.slices(n) yields views straight into the mapped file,
+  i.e. a single view if the requested bytes do not cross the end of the file, or two views 
+  (the tail and the head of the file) otherwise. If n exceeds the file size, the bytes are 
+  assembled into the reader's own buffer and delivered as a single view.
+  (Python 2 mmap objects do not support memoryview, so there the slices are plain strings.)
+  '''
+  def __init__(self, filePath, offset):
+    self._cache = _inputCache
+    self._shared = self._cache.mmap(filePath) if self._cache is not None else None
+    if self._shared:
+      self.fObj = None
+      self._mm, self._view = self._shared
+    else:
+      self.fObj = open(filePath, 'rb')
+      self._mm = mmap.mmap(self.fObj.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        self._view = memoryview(self._mm)
+      except TypeError:
+        self._view = self._mm
+    self.size = len(self._mm)
+    self.path = filePath
+    self.start = self.pos = fixOffset(filePath, offset)
+    self.bytesRead = 0
+    self._buf = bytearray(0)
+  
+  def readinto(self, buf, n):
+    self.bytesRead += n
+    view = memoryview(buf)
+    k = min(n, self.size - self.pos)
+    view[:k] = self._view[self.pos:self.pos+k]
+    if k < n:
+      view[k:min(n, k + self.size)] = self._view[0:min(n - k, self.size)]
+      _repeatFill(view, min(n, k + self.size), n, self.size)
+    self.pos = (self.pos + n) % self.size
+    if self.hashObj:
+      self.hashObj.update(view[:n])
+    return n
+  
+  def slices(self, n):
+    if n > self.size:
+      for v in roundReader.slices(self, n):
+        yield v
+      return
+    self.bytesRead += n
+    k = min(n, self.size - self.pos)
+    if self.hashObj:
+      self.hashObj.update(self._view[self.pos:self.pos+k])
+      self.hashObj.update(self._view[0:n-k])
+    yield self._view[self.pos:self.pos+k]
+    if k < n:
+      yield self._view[0:n-k]
+    self.pos = (self.pos + n) % self.size
+  
+  def seek(self, pos):
+    self.pos = (self.start + pos) % self.size
+  
+  def adviseCache(self, n):
+    if hasattr(self._mm, 'madvise'):
+      self._mm.madvise(mmap.MADV_SEQUENTIAL)
+  
+  def close(self):
+    if self.fObj is None:
+      # The map is shared through the Input File cache.
+      if self._shared:
+        self._cache.unmap(self._shared)
+        self._shared = None
+      return
+    if self._view is not self._mm:
+      self._view.release()
+    self._mm.close()
+    self.fObj.close()
+# *** ----------------------------------------------------------------------------------------------
+
+class tileReader(roundReader):
+  '''
+  rdr = tileReader(filePath, offset)
+  Round-robin reader for "short" Input Files (keys): the whole file is loaded into memory once, 
+  starting at the fixed offset, and the requested bytes are delivered as views into a tile buffer 
+  holding this pattern repeated enough times. The file is not accessed after the loading, 
+  and the tile buffer is reused unchanged from chunk to chunk.
+  '''
+  def __init__(self, filePath, offset):
+    if _inputCache is not None:
+      data = _inputCache.data(filePath)
+    else:
+      with open(filePath, 'rb') as fObj:
+        data = fObj.read()
+    oset = fixOffset(filePath, offset)
+    self.size = len(data)
+    self.path = filePath
+    self.start = oset
+    self.bytesRead = 0
+    self.pattern = data[oset:] + data[:oset]
+    self.phase = 0
+    self._tile = bytearray(0)
+  
+  def _buildTile(self, n):
+    # Any n bytes starting at any phase fit into (n // size + 2) periods.
+    self._tile = bytearray(self.size * (n // self.size + 2))
+    view = memoryview(self._tile)
+    view[:self.size] = self.pattern
+    _repeatFill(view, self.size, len(self._tile), self.size)
+  
+  def readinto(self, buf, n):
+    for v in self.slices(n):
+      memoryview(buf)[:n] = v
+    return n
+  
+  def slices(self, n):
+    if len(self._tile) < self.phase + n:
+      self._buildTile(n)
+    v = memoryview(self._tile)[self.phase:self.phase+n]
+    self.phase = (self.phase + n) % self.size
+    self.bytesRead += n
+    if self.hashObj:
+      self.hashObj.update(v)
+    yield v
+  
+  def seek(self, pos):
+    self.phase = pos % self.size
+  
+  def adviseCache(self, n):
+    # The file is in memory already.
+    pass
+  
+  def close(self):
+    self._tile = bytearray(0)
+# *** ----------------------------------------------------------------------------------------------
+
+class streamReader(roundReader):
+  '''
+  rdr = streamReader(filePath, offset)
+  Reader of a non-seekable Input File (stdin if filePath is '-', FIFO, ... see isStream()): 
+  the stream is consumed once, there is no round-robin. offset -- number of bytes to skip, 
+  must not be negative; EOFError is raised if the stream ends before it. 
+  rdr.readinto(buf, n) returns the number of bytes delivered: less than n only at the end 
+  of the stream.
+  '''
+  def __init__(self, filePath, offset):
+    offset = int(offset)
+    if offset < 0:
+      raise ValueError('Offset of the stream Input File %r can not be negative' % filePath)
+    if filePath == stdStream:
+      self.fObj = _stdBinary(sys.stdin)
+    else:
+      self.fObj = open(filePath, 'rb')
+    self.size = None
+    self.path = filePath
+    self.start = 0
+    self.bytesRead = 0
+    while offset > 0:
+      skipped = len(self.fObj.read(min(offset, defaultShiftBlockSize)))
+      if not skipped:
+        break
+      offset -= skipped
+    if offset > 0:
+      self.close()
+      raise EOFError('Input File %r: the stream ended %d bytes short of its offset' % 
+                     (filePath, offset))
+  
+  def readinto(self, buf, n):
+    view = memoryview(buf)
+    pos = 0
+    while pos < n:
+      k = self.fObj.readinto(view[pos:n])
+      if not k:
+        break
+      pos += k
+    self.bytesRead += pos
+    if self.hashObj:
+      self.hashObj.update(view[:pos])
+    return pos
+  
+  def adviseCache(self, n):
+    # Streams have no page cache to manage.
+    pass
+  
+  def close(self):
+    if self.path != stdStream:
+      self.fObj.close()
+# *** ----------------------------------------------------------------------------------------------
+
+def openReader(filePath, offset, NumOfBytes, UseMmap=False, TileBudget=0, CacheHints=False):
+  '''
+  rdr = openReader(filePath, offset, NumOfBytes, UseMmap=False, TileBudget=0, CacheHints=False)
+  Open the most suitable reader for delivering NumOfBytes bytes of the Input File:
+    * streamReader -- if the file is not seekable (see isStream());
+    * tileReader -- if the file is shorter than NumOfBytes and fits into TileBudget bytes;
+    * mmapReader -- if UseMmap;
+    * roundReader -- otherwise.
+  If CacheHints, the page cache hints are given for the reading (see roundReader.adviseCache()).
+  '''
+  if isStream(filePath):
+    rdr = streamReader(filePath, offset)
+  else:
+    fSize = fileSize(filePath)
+    if TileBudget and fSize <= TileBudget and fSize < NumOfBytes:
+      rdr = tileReader(filePath, offset)
+    elif UseMmap:
+      rdr = mmapReader(filePath, offset)
+    else:
+      rdr = roundReader(filePath, offset)
+  if CacheHints:
+    rdr.adviseCache(NumOfBytes)
+  return rdr
+# *** ----------------------------------------------------------------------------------------------
+
+def alignUnit(readers, blockSize=1):
+  '''
+  period = alignUnit(readers, blockSize=1)
+  Return the least common multiple of blockSize and the pattern period(s) of the tileReader(s) 
+  among the readers.
+  '''
+  period = blockSize
+  for rdr in readers:
+    if isinstance(rdr, tileReader):
+      period = period * rdr.size // gcd(period, rdr.size)
+  return period
+# *** ----------------------------------------------------------------------------------------------
+
+def alignChunkSize(chunkSize, readers, blockSize=1):
+  '''
+  chunkSz = alignChunkSize(chunkSize, readers, blockSize=1)
+  Round chunkSize down to a multiple of the pattern period(s) of the tileReader(s) among the 
+  readers (and of blockSize), if this period is not longer than chunkSize itself, so every chunk 
+  starts at the same phase of the pattern(s).
+  '''
+  period = alignUnit(readers, blockSize)
+  if period <= chunkSize:
+    chunkSize -= chunkSize % period
+  return chunkSize
+# *** ----------------------------------------------------------------------------------------------
+
+def outBlockSize(ofObj):
+  '''
+  blkSz = outBlockSize(outFileObj)
+  Return the preferred I/O block size (st_blksize) of the Output File, or 1 if it is unknown.
+  '''
+  try:
+    return os.fstat(ofObj.fileno()).st_blksize or 1
+  except (AttributeError, OSError, ValueError):
+    return 1
+# *** ----------------------------------------------------------------------------------------------
+
+def _tuneChunkSize(ofObj, readers, numBytes, bwNot, limit, unit, stats=None):
+  '''
+  chunkSize, bytesDone = _tuneChunkSize(ofObj, readers, numBytes, bwNot, limit, unit, stats=None)
+  Process the first chunks at growing sizes -- multiples of unit, doubling from about 
+  defaultChunkSize up to limit -- timing each of them. Stop growing as soon as the throughput 
+  drops noticeably. Return the size giving the best throughput and the number of bytes processed.
+  '''
+  if unit > limit:
+    unit = 1
+  size = unit * max(1, defaultChunkSize // unit)
+  best, bestRate, done = size, 0.0, 0
+  buf = bytearray(0)
+  while done < numBytes and size <= limit:
+    n = min(size, numBytes - done)
+    if len(buf) < n:
+      buf = bytearray(n)
+    t0 = default_timer()
+    _mixChunk(ofObj, readers, buf, n, bwNot, stats)
+    dt = default_timer() - t0
+    done += n
+    if n < size:
+      break
+    rate = n / max(dt, 1e-9)
+    if rate > bestRate:
+      best, bestRate = size, rate
+    elif rate < 0.9 * bestRate:
+      break
+    size *= 2
+  return best, done
+# *** ----------------------------------------------------------------------------------------------
+
+def _mixChunk(ofObj, readers, buf, n, bwNot, stats=None):
+  '''
+  Read the next n bytes from every reader, XOR them together in buf, apply Bitwise NOT 
+  to the result if bwNot, and write buf[:n] to ofObj. Count the time of the phases 
+  in stats (runStats), if given.
+  '''
+  t0 = default_timer()
+  if len(readers) == 1 and not bwNot:
+    # Nothing to mix: pass the bytes through.
+    for v in readers[0].slices(n):
+      ofObj.write(v)
+    if stats:
+      stats.addTime('copy', default_timer() - t0)
+      stats.chunk(n)
+    return
+  readers[0].readinto(buf, n)
+  t1 = default_timer()
+  for rdr in readers[1:]:
+    pos = 0
+    for v in rdr.slices(n):
+      mixEngine.xorInto(buf, pos, v)
+      pos += len(v)
+  if bwNot:
+    mixEngine.notInto(buf, n)
+  t2 = default_timer()
+  ofObj.write(memoryview(buf)[:n])
+  if stats:
+    # Reading of the other inputs is interleaved with mixing (slices): it counts as 'mix'.
+    stats.addTime('read', t1 - t0)
+    stats.addTime('mix', t2 - t1)
+    stats.addTime('write', default_timer() - t2)
+    stats.chunk(n)
+# *** ----------------------------------------------------------------------------------------------
+
+def _jm_write_pipelined(ofObj, readers, chunkSize, numBytes, bwNot, depth, stats=None):
+  '''
+  Pipelined version of the jm_write() chunk loop: a reader thread prefetches the next chunks of all 
+  the inputs, the calling thread mixes the current chunk, and a writer thread writes the previous
+  one(s), so disk and CPU work at the same time. The chunks are passed through a ring of "depth" 
+  reusable slots, each holding a buffer per input (the first one receives the mixed bytes).
+  '''
+  free, filled, mixed = queue.Queue(), queue.Queue(), queue.Queue()
+  for i in range(depth):
+    free.put([bytearray(chunkSize) for rdr in readers])
+  stop = threading.Event()
+  errors = []
+  
+  def readerLoop():
+    try:
+      bLeft = numBytes
+      while bLeft > 0 and not stop.is_set():
+        slot = free.get()
+        if slot is None:
+          break
+        n = min(bLeft, chunkSize)
+        t0 = default_timer()
+        for rdr, b in zip(readers, slot):
+          rdr.readinto(b, n)
+        if stats:
+          stats.addTime('read', default_timer() - t0)
+        filled.put((slot, n))
+        bLeft -= n
+    except BaseException:
+      errors.append(sys.exc_info()[1])
+    finally:
+      filled.put(None)
+  
+  def writerLoop():
+    try:
+      while True:
+        item = mixed.get()
+        if item is None:
+          break
+        slot, n = item
+        t0 = default_timer()
+        ofObj.write(memoryview(slot[0])[:n])
+        if stats:
+          stats.addTime('write', default_timer() - t0)
+          stats.chunk(n)
+        free.put(slot)
+    except BaseException:
+      errors.append(sys.exc_info()[1])
+      stop.set()
+      free.put(None)
+  
+  threads = [threading.Thread(target=readerLoop), threading.Thread(target=writerLoop)]
+  for t in threads:
+    t.daemon = True
+    t.start()
+  try:
+    while True:
+      item = filled.get()
+      if item is None:
+        break
+      slot, n = item
+      t0 = default_timer()
+      for b in slot[1:]:
+        mixEngine.xorInto(slot[0], 0, memoryview(b)[:n])
+      if bwNot:
+        mixEngine.notInto(slot[0], n)
+      if stats:
+        stats.addTime('mix', default_timer() - t0)
+      mixed.put((slot, n))
+  finally:
+    mixed.put(None)
+    stop.set()
+    free.put(None)
+    for t in threads:
+      t.join()
+  if errors:
+    raise errors[0]
+# *** ----------------------------------------------------------------------------------------------
+
+def getInputs(kwopts):
+  '''
+  inputs = getInputs(kwopts)
+  Collect all the Input Files given in kwopts (see jm_write()) to the single list of 
+  (path, offset, bwNot) tuples: Input File 1, Input File 2 (if any), then the additional ones 
+  listed in kwopts['INPUTS'] (if any).
+  '''
+  inputs = [(kwopts['INPUT1'], kwopts['INPUT1_oset'], kwopts['INPUT1_bwNot'])]
+  if kwopts.get('INPUT2'):
+    inputs.append((kwopts['INPUT2'], kwopts['INPUT2_oset'], kwopts['INPUT2_bwNot']))
+  for path, oset, bwNot in kwopts.get('INPUTS') or []:
+    inputs.append((path, oset, bwNot))
+  return inputs
+# *** ----------------------------------------------------------------------------------------------
+
+if hasattr(os, 'pwrite'):
+  _pwrite = os.pwrite
+else:
+  def _pwrite(fd, data, pos):
+    os.lseek(fd, pos, 0)
+    return os.write(fd, data)
+
+class positionalWriter:
+  '''
+  w = positionalWriter(fd, pos)
+  File-like object writing to the file descriptor fd from the given position on 
+  by positional writes (os.pwrite), i.e. without using the file pointer of fd.
+  '''
+  def __init__(self, fd, pos):
+    self.fd = fd
+    self.pos = pos
+  
+  def fileno(self):
+    return self.fd
+  
+  def write(self, data):
+    view = memoryview(data)
+    done = 0
+    while done < len(view):
+      done += _pwrite(self.fd, view[done:], self.pos + done)
+    self.pos += done
+# *** ----------------------------------------------------------------------------------------------
+
+class hashingWriter:
+  '''
+  hw = hashingWriter(ofObj, hashObjs)
+  Output File object wrapper feeding every chunk written to the hash objects (see hashlib) 
+  on the way, so the digest of the written bytes costs no extra pass over the file.
+  '''
+  def __init__(self, ofObj, hashObjs):
+    self.ofObj = ofObj
+    self.hashObjs = hashObjs
+  
+  def write(self, data):
+    for h in self.hashObjs:
+      h.update(data)
+    return self.ofObj.write(data)
+  
+  def fileno(self):
+    return self.ofObj.fileno()
+# *** ----------------------------------------------------------------------------------------------
+
+class checkpointWriter:
+  '''
+  cw = checkpointWriter(ofObj, ckpt, state, every)
+  Output File object wrapper committing the checkpoint of the run (see runCheckpoint) every 
+  "every" chunks written: the file is flushed and fsync-ed, then state['committed'] is advanced 
+  by the bytes written since the last commit and state is saved to ckpt. 
+  Call cw.commit() after the last chunk.
+  '''
+  def __init__(self, ofObj, ckpt, state, every):
+    self.ofObj = ofObj
+    self.ckpt = ckpt
+    self.state = state
+    self.every = every
+    self.chunks = 0
+    self.pending = 0
+  
+  def write(self, data):
+    res = self.ofObj.write(data)
+    self.pending += len(data)
+    self.chunks += 1
+    if self.chunks % self.every == 0:
+      self.commit()
+    return res
+  
+  def commit(self):
+    self.ofObj.flush()
+    os.fsync(self.ofObj.fileno())
+    self.state['committed'] += self.pending
+    self.pending = 0
+    self.state['offsets'] = [(start + self.state['committed']) % size 
+                             for path, start, size in self.state['inputs']]
+    self.ckpt.save(self.state)
+  
+  def fileno(self):
+    return self.ofObj.fileno()
+# *** ----------------------------------------------------------------------------------------------
+
+# Page cache control: posix_fadvise(2) hints, sync_file_range(2) and O_DIRECT output.
+POSIX_FADV_SEQUENTIAL = 2
+POSIX_FADV_WILLNEED = 3
+POSIX_FADV_DONTNEED = 4
+SYNC_FILE_RANGE_WAIT_BEFORE = 1
+SYNC_FILE_RANGE_WRITE = 2
+SYNC_FILE_RANGE_WAIT_AFTER = 4
+defaultSyncWindow = 8388608 # 8MiB
+directIOAlign = 4096
+
+def _fadvise(fd, offset, length, advice):
+  ''' posix_fadvise(fd, offset, length, advice) -- if available; a hint only, errors are ignored. '''
+  try:
+    if hasattr(os, 'posix_fadvise'):
+      os.posix_fadvise(fd, offset, length, advice)
+    else:
+      fn = _libcFunction('posix_fadvise', 'iqqi')
+      if fn is not None:
+        fn(fd, offset, length, advice)
+  except OSError:
+    pass
+
+def _syncFileRange(fd, offset, length, flags):
+  ''' Linux sync_file_range(fd, offset, length, flags) -- if available, else nothing. '''
+  fn = _libcFunction('sync_file_range', 'iqqI')
+  if fn is not None:
+    fn(fd, offset, length, flags)
+# *** ----------------------------------------------------------------------------------------------
+
+# Durability of the files written (see jmFU.Durability).
+durabilityLevels = ('none', 'end', 'periodic')
+defaultFsyncEvery = 67108864 # 64MiB
+
+def fsyncPath(path):
+  '''
+  fsyncPath(path)
+  fsync the file or directory at path (a directory -- to make the names created, removed or 
+  renamed in it durable). Directories are skipped where they can not be opened (not POSIX).
+  '''
+  if os.path.isdir(path) and os.name != 'posix':
+    return
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    os.fsync(fd)
+  finally:
+    os.close(fd)
+
+def _dirOf(path):
+  return os.path.dirname(os.path.abspath(path))
+# *** ----------------------------------------------------------------------------------------------
+
+class fsyncGroup:
+  '''
+  group = fsyncGroup()
+  Group commit of the fsyncs deferred by many jobs (see jmFU.SyncGroup). Every job gets its own 
+  ticket = group.ticket(): the job ticket.add()s the files and directories to be fsync-ed instead
+  of fsync-ing them at once; ticket.commit() returns once they all are on disk, or raises OSError
+  if the fsync of any of them failed (the paths gone by then, replaced or removed by later jobs, 
+  are skipped). A commit fsyncs the paths added by all the tickets so far, each once -- e.g. the 
+  directory of the outputs of many small jobs is fsync-ed once for them all; the tickets 
+  committed while another commit is running wait for it, then one of them commits the paths 
+  added meanwhile for all of them. A ticket keeps its own error: nothing is left in the group.
+  '''
+  def __init__(self):
+    self.cond = threading.Condition()
+    self.pending = {}  # path --> the tickets waiting for its fsync
+    self.busy = False
+  
+  def ticket(self):
+    return fsyncTicket(self)
+  
+  def _add(self, ticket, path):
+    with self.cond:
+      tickets = self.pending.setdefault(os.path.abspath(path), set())
+      if ticket not in tickets:
+        tickets.add(ticket)
+        ticket.waiting += 1
+  
+  def _commit(self, ticket):
+    with self.cond:
+      while ticket.waiting:
+        if self.busy:
+          self.cond.wait()
+          continue
+        self.busy = True
+        pending, self.pending = self.pending, {}
+        self.cond.release()
+        errors = {}
+        try:
+          # The files first, then the directories of their names.
+          for path in sorted(pending, key=lambda path: (os.path.isdir(path), path)):
+            try:
+              fsyncPath(path)
+            except OSError as e:
+              if e.errno != errno.ENOENT:
+                errors[path] = e
+        finally:
+          self.cond.acquire()
+          self.busy = False
+          for path, tickets in pending.items():
+            for waiting in tickets:
+              waiting.waiting -= 1
+              if path in errors and waiting.error is None:
+                waiting.error = errors[path]
+          self.cond.notify_all()
+      error, ticket.error = ticket.error, None
+    if error is not None:
+      raise error
+
+class fsyncTicket:
+  ''' ticket = group.ticket() -- the fsyncs deferred by one job, see fsyncGroup. '''
+  def __init__(self, group):
+    self.group = group
+    self.waiting = 0
+    self.error = None
   
+  def add(self, path):
+    self.group._add(self, path)
+  
+  def commit(self):
+    self.group._commit(self)
+# *** ----------------------------------------------------------------------------------------------
+
+class fsyncWriter:
+  '''
+  fw = fsyncWriter(ofObj, every)
+  Output File object wrapper flushing and fsync-ing the file every "every" bytes written 
+  (jmFU.Durability 'periodic'): a crash loses at most that many bytes of the run.
+  '''
+  def __init__(self, ofObj, every):
+    self.ofObj = ofObj
+    self.every = every
+    self.pending = 0
+  
+  def write(self, data):
+    res = self.ofObj.write(data)
+    self.pending += len(data)
+    if self.pending >= self.every:
+      self.sync()
+    return res
+  
+  def sync(self):
+    self.ofObj.flush()
+    os.fsync(self.ofObj.fileno())
+    self.pending = 0
+  
+  def flush(self):
+    self.ofObj.flush()
+  
+  def fileno(self):
+    return self.ofObj.fileno()
+# *** ----------------------------------------------------------------------------------------------
+
+class pageCacheWriter:
+  '''
+  pw = pageCacheWriter(ofObj, syncEvery=0, dropBehind=False, direct=False)
+  Output File object wrapper keeping the page cache in check while streaming huge outputs 
+  (written from the current position of ofObj on):
+    * syncEvery > 0 -- the writeback of every syncEvery bytes written is started at once 
+      (sync_file_range), and the previous window is waited for: so dirty pages are flushed 
+      at a steady rate instead of a burst at close, and writers are not stalled by it;
+    * dropBehind -- the windows written, once on disk, are dropped from the page cache 
+      (posix_fadvise DONTNEED) not to evict the working set of others; defaultSyncWindow 
+      is used as the window if syncEvery is not given;
+    * direct -- the bytes are written through a second descriptor of the file opened with 
+      O_DIRECT, from a page-aligned buffer, in whole blocks of directIOAlign bytes bypassing 
+      the page cache; the unaligned head and tail go through ofObj. The buffered writing is 
+      used if the filesystem does not support O_DIRECT (or with Python 2, whose mmap objects 
+      do not support memoryview: the aligned buffer can not be written without copying).
+  Call pw.close() after the last chunk: ofObj is left positioned after the bytes written.
+  The wrapper has neither tell() nor mode on purpose: jm_write() neither copies the bytes 
+  kernel-side nor writes them by parallel jobs past it (see _kernelCopyApplies()).
+  '''
+  def __init__(self, ofObj, syncEvery=0, dropBehind=False, direct=False, bufSize=1048576):
+    ofObj.flush()
+    self.ofObj = ofObj
+    self.fd = ofObj.fileno()
+    self.pos = ofObj.tell()
+    self.dropBehind = dropBehind
+    self.syncEvery = syncEvery or (defaultSyncWindow if dropBehind else 0)
+    self.winStart = self.pos
+    self.prevWin = None
+    self.directFd = None
+    if direct and hasattr(os, 'O_DIRECT'):
+      try:
+        self.directFd = os.open(ofObj.name, os.O_WRONLY | os.O_DIRECT)
+      except (OSError, TypeError, AttributeError):
+        self.directFd = None
+    if self.directFd is not None:
+      self.buf = mmap.mmap(-1, bufSize - bufSize % directIOAlign)
+      self.fill = 0
+      try:
+        self.bufView = memoryview(self.buf)
+      except TypeError:
+        self.buf.close()
+        os.close(self.directFd)
+        self.directFd = None
+  
+  def write(self, data):
+    if self.directFd is None:
+      self.ofObj.write(data)
+      self.pos += len(data)
+    else:
+      self._writeDirect(memoryview(data))
+    if self.syncEvery and self._end() - self.winStart >= self.syncEvery:
+      self._syncWindow()
+  
+  def _end(self):
+    return self.pos + (self.fill if self.directFd is not None else 0)
+  
+  def _writeBuffered(self, data):
+    self.ofObj.seek(self.pos, 0)
+    self.ofObj.write(data)
+    self.pos += len(data)
+  
+  def _writeDirect(self, view):
+    if not self.fill and self.pos % directIOAlign:
+      k = min(len(view), directIOAlign - self.pos % directIOAlign)
+      self._writeBuffered(view[:k])
+      view = view[k:]
+    while len(view):
+      k = min(len(view), len(self.buf) - self.fill)
+      self.buf[self.fill:self.fill+k] = view[:k].tobytes()
+      self.fill += k
+      view = view[k:]
+      if self.fill == len(self.buf):
+        self._flushDirect()
+  
+  def _flushDirect(self):
+    # Write the whole blocks of the buffer, keep the rest at its beginning.
+    n = self.fill - self.fill % directIOAlign
+    if n:
+      self.ofObj.flush()
+      done = 0
+      while done < n:
+        done += _pwrite(self.directFd, self.bufView[done:n], self.pos + done)
+      self.pos += n
+      self.buf[:self.fill - n] = self.buf[n:self.fill]
+      self.fill -= n
+  
+  def _syncWindow(self):
+    self.flush()
+    end = self._end()
+    _syncFileRange(self.fd, self.winStart, end - self.winStart, SYNC_FILE_RANGE_WRITE)
+    if self.prevWin:
+      start, length = self.prevWin
+      _syncFileRange(self.fd, start, length, SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE |
+                     SYNC_FILE_RANGE_WAIT_AFTER)
+      if self.dropBehind:
+        _fadvise(self.fd, start, length, POSIX_FADV_DONTNEED)
+    self.prevWin = (self.winStart, end - self.winStart)
+    self.winStart = end
+  
+  def flush(self):
+    if self.directFd is not None:
+      self._flushDirect()
+      if self.fill:
+        self._writeBuffered(self.buf[:self.fill])
+        self.fill = 0
+    self.ofObj.flush()
+  
+  def fileno(self):
+    return self.fd
+  
+  def close(self):
+    self.flush()
+    if self.syncEvery:
+      self._syncWindow()
+      start, length = self.prevWin
+      _syncFileRange(self.fd, start, length, SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE |
+                     SYNC_FILE_RANGE_WAIT_AFTER)
+      if self.dropBehind:
+        _fadvise(self.fd, start, length, POSIX_FADV_DONTNEED)
+    if self.directFd is not None:
+      os.close(self.directFd)
+      self.directFd = None
+      self.bufView.release()
+      self.buf.close()
+    self.ofObj.seek(self.pos, 0)
+# *** ----------------------------------------------------------------------------------------------
+
+def splitRange(total, parts, align):
+  '''
+  segments = splitRange(total, parts, align)
+  Split the range of total bytes into (at most) the given number of parts -- disjoint segments 
+  whose lengths are multiples of align (except the last one). Return the list of 
+  (start, length) tuples.
+  '''
+  segLen = max(-(-total // parts), 1)
+  segLen += (-segLen) % align
+  return [(start, min(segLen, total - start)) for start in range(0, total, segLen)]
+# *** ----------------------------------------------------------------------------------------------
+
+def shiftInputs(kwopts, skip):
+  '''
+  opts = shiftInputs(kwopts, skip)
+  Return a copy of jm_write() kwopts for the mixed bytes from "skip" on: the offsets of all 
+  the Input Files are advanced by skip, NumOfBytes is reduced by it. The output bytes are a pure 
+  function of their position, so that is how a part of a run is (re)done separately.
+  '''
+  opts = dict(kwopts)
+  opts['NumOfBytes'] = kwopts['NumOfBytes'] - skip
+  opts['INPUT1_oset'] = int(kwopts['INPUT1_oset']) + skip
+  if kwopts.get('INPUT2'):
+    opts['INPUT2_oset'] = int(kwopts['INPUT2_oset']) + skip
+  opts['INPUTS'] = [(path, int(oset) + skip, bwNot) 
+                    for path, oset, bwNot in kwopts.get('INPUTS') or []]
+  return opts
+# *** ----------------------------------------------------------------------------------------------
+
+def _jmWriteSegment(task):
+  '''
+  Pool worker of jm_write_parallel(): mix the segment (segStart, segLen) of the output range 
+  and write it to the outPath file at (outPos + segStart) position.
+  '''
+  outPath, outPos, segStart, segLen, kwopts, withStats = task
+  opts = shiftInputs(kwopts, segStart)
+  opts['Stats'] = runStats() if withStats else None
+  opts['Jobs'] = 1
+  opts['NumOfBytes'] = segLen
+  fd = os.open(outPath, os.O_WRONLY)
+  try:
+    chunkSize = jm_write(positionalWriter(fd, outPos + segStart), **opts)
+  finally:
+    os.close(fd)
+  return chunkSize, opts['Stats'].as_dict() if withStats else None
+# *** ----------------------------------------------------------------------------------------------
+
+def jm_write_parallel(ofObj, **kwopts):
+  '''
+  jm_write_parallel(outFileObj, **kwopts)
+  Parallel version of jm_write(): every output byte depends only on its position and the input 
+  offsets, so the NumOfBytes range is split into disjoint segments that are mixed by a pool 
+  of kwopts['Jobs'] worker processes. Each worker writes its segment to the Output File 
+  (reopened by outFileObj.name) with positional writes. Finally, the pointer of outFileObj 
+  is set right after the written bytes. Return the Chunk Size used by most of the workers.
+  The statistics of the workers are merged into kwopts['Stats'] (if given).
+  '''
+  stats = kwopts.get('Stats')
+  kwopts = dict(kwopts)
+  # Not to be pickled for the workers:
+  kwopts['Stats'] = None
+  kwopts['ProgressCallback'] = None
+  kwopts['CancelEvent'] = None
+  kwopts['Source'] = None
+  kwopts['SyncGroup'] = None
+  ofObj.flush()
+  if 'a' in ofObj.mode:
+    pos = os.fstat(ofObj.fileno()).st_size
+  else:
+    pos = ofObj.tell()
+  tasks = [(ofObj.name, pos, segStart, segLen, kwopts, bool(stats)) for segStart, segLen in 
+           splitRange(kwopts['NumOfBytes'], kwopts['Jobs'] * 4, fixedChunkSize(kwopts['ChunkSize']))]
+  chunkSizes = []
+  pool = multiprocessing.Pool(kwopts['Jobs'])
+  try:
+    for chunkSize, segStats in pool.imap_unordered(_jmWriteSegment, tasks):
+      chunkSizes.append(chunkSize)
+      if stats:
+        stats.merge(segStats)
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+  ofObj.seek(pos + kwopts['NumOfBytes'], 0)
+  return max(set(chunkSizes), key=chunkSizes.count)
+# *** ----------------------------------------------------------------------------------------------
+
+def fixedChunkSize(chunkSize):
+  ''' Return chunkSize itself, or defaultChunkSize in place of autoChunkSize ('auto'). '''
+  if chunkSize == autoChunkSize:
+    return defaultChunkSize
+  return chunkSize
 # *** ----------------------------------------------------------------------------------------------
 
 def jm_write(ofObj, **kwopts):
@@ -133,10 +1656,11 @@ def jm_write(ofObj, **kwopts):
     * open Input File(s) in binary read-only mode;
     * set pointer(s) in the previously openned Input File object(s) to the position(s) specified by 
       the corresponding offset value(s) for the given Input File(s);
-    * read bytes from the Input File object(s) by calling roundRead() function;
+    * read bytes from the Input File object(s) by means of the reader objects (see openReader());
     * "mix" these bytes: apply required/requested operations to delivered bytes;
     * write the result to the Output File object (outFileObj);
     * close Input File object(s).
+  Every chunk is mixed in one preallocated buffer, so no temporary strings are created per chunk.
   Output File object (outFileObj) must be prepared* and, after all, closed outside this function.
   * It is assumed that outFileObj MUST BE a correctly openned File-object in binary write mode 
   having pointer set up to correct offset position.
@@ -147,53 +1671,957 @@ def jm_write(ofObj, **kwopts):
     * INPUT1_oset, int -- offset of Input File 1, i.e. position to start reading from;
     * INPUT1_bwNot, boolean -- whether to apply Bitwise NOT to bytes obtained from Input File 1;
     * NumOfBytes -- total number of bytes to process;
-    * ChunkSize -- Chunk Size for file input/output;
+    * ChunkSize -- Chunk Size for file input/output, or 'auto' to choose it by the throughput 
+      measured on the first chunks (see _tuneChunkSize()), aligned to st_blksize of outFileObj;
+    * AutoChunkLimit, int (optional) -- the largest Chunk Size to try in the 'auto' mode;
+    * UseMmap, boolean (optional) -- whether to read Input File(s) through memory mapping;
+    * TileBudget, int (optional) -- load the Input File(s) not larger than this number of bytes
+      into memory once and tile them (see tileReader); ChunkSize is aligned to the pattern period;
+    * CacheHints, boolean (optional) -- whether to give the page cache hints for reading the 
+      Input File(s) (see roundReader.adviseCache());
+    * Jobs, int (optional) -- number of worker processes to mix the bytes in parallel with 
+      (see jm_write_parallel());
+    * PipelineDepth, int (optional) -- if > 1, overlap reading, mixing and writing of the chunks
+      by means of a ring of this number of buffers (see _jm_write_pipelined());
+    * Stats, runStats object (optional) -- to count the time of the phases, chunks and bytes in,
+      and to compute the digests of the bytes read and written with (see runStats);
   and optionally -- INPUT2, INPUT2_oset and INPUT2_bwNot -- having the same sense for Input File 2
-  (in case of two input files).
+  (in case of two input files);
+  and optionally -- INPUTS, list of (path, offset, bwNot) tuples -- any number of additional 
+  Input Files to be mixed in (see getInputs()).
+  Input File 1 may be a stream, outFileObj may be non-seekable (pipe): see mixChunks().
+  If kwopts has Source -- iterable of the mixed chunks (see chunkSource) -- they are written 
+  instead, the Input Files are not read.
+  A single Input File without Bitwise NOT is copied kernel-side (see _jm_write_copy()).
+  All the Input Files are read at once chunk by chunk and XOR-ed together in a single pass. 
+  Bitwise NOT is applied to the result if the number of Input Files with bwNot set is odd.
   * --------------------------------
   XOR (^) properties:
     * a^b = NOT(a)^NOT(b)
     * NOT(a)^b = a^NOT(b) = NOT(a^b)
   * --------------------------------
+  Return the Chunk Size used.
   '''
-  #  *** 2 input files case *** ----------------------------------------------- *
-  if kwopts['INPUT2']:
-    if (kwopts['INPUT1_bwNot'] ^ kwopts['INPUT2_bwNot']):
-      # "NOT(a^b)" case
-      fun = snotxor
-    else:
-      # "a^b = NOT(a)^NOT(b)" case
-      fun = sxor
-    oset_1 = fixOffset(kwopts['INPUT1'], kwopts['INPUT1_oset'])
-    oset_2 = fixOffset(kwopts['INPUT2'], kwopts['INPUT2_oset'])
-    #with A() as a, B() as b:
-    with open(kwopts['INPUT1'], 'rb') as if1_obj, open(kwopts['INPUT2'], 'rb') as if2_obj:
-      if1_obj.seek(oset_1, 0)
-      if2_obj.seek(oset_2, 0)
-      bLeft = kwopts['NumOfBytes']
-      while bLeft > 0:
-        chunkSz = min([bLeft, kwopts['ChunkSize']])
-        s1 = roundRead(if1_obj, chunkSz)
-        s2 = roundRead(if2_obj, chunkSz)
-        sO = fun(s1, s2)
-        ofObj.write(sO)
-        bLeft -= chunkSz
-  #  *** one input file case *** ---------------------------------------------- *
+  stats = kwopts.get('Stats')
+  t0 = default_timer()
+  if stats:
+    stats.writing = True
+  if stats and stats.digest:
+    # The mixed bytes (and the whole Output File, if its digest is requested, see jmFU) are 
+    # hashed in order while written: so the parallel mode is not used.
+    stats.hashes['mixed'] = stats.newHash()
+    ofObj = hashingWriter(ofObj, [stats.hashes[name] for name in ('mixed', 'output') 
+                                  if name in stats.hashes])
+  if kwopts.get('Source') is not None:
+    chunkSize = _jm_write_chunks(ofObj, stats, kwopts['Source'], kwopts['ChunkSize'])
+  elif isStream(kwopts['INPUT1']):
+    chunkSize = _jm_write_chunks(ofObj, stats, mixChunks(**kwopts), kwopts['ChunkSize'])
+  elif _kernelCopyApplies(ofObj, kwopts):
+    chunkSize = _jm_write_copy(ofObj, stats, **kwopts)
+  elif kwopts.get('Jobs', 1) > 1 and kwopts['NumOfBytes'] > fixedChunkSize(kwopts['ChunkSize']) \
+       and _seekable(ofObj) and not isinstance(ofObj, (hashingWriter, checkpointWriter, 
+                                                       pageCacheWriter, fsyncWriter)):
+    chunkSize = jm_write_parallel(ofObj, **kwopts)
   else:
-    if kwopts['INPUT1_bwNot']:
-      fun = snot
+    chunkSize = _jm_write_serial(ofObj, stats, **kwopts)
+  if stats:
+    stats.addTime('jm_write', default_timer() - t0)
+  return chunkSize
+# *** ----------------------------------------------------------------------------------------------
+
+def _kernelCopyApplies(ofObj, kwopts):
+  '''
+  Whether jm_write() can copy the bytes kernel-side (see _jm_write_copy()): a single Input File 
+  without Bitwise NOT, not tiled in memory (see openReader()) and not so short that the copies 
+  of its wrap-around segments would cost more than tiling; outFileObj is a plain seekable file 
+  (not opened for appending), the bytes are neither hashed nor checkpointed on the way.
+  '''
+  inputs = getInputs(kwopts)
+  if len(inputs) != 1 or inputs[0][2]:
+    return False
+  if isinstance(ofObj, (hashingWriter, checkpointWriter)) or not hasattr(ofObj, 'tell') or \
+     not _seekable(ofObj):
+    return False
+  try:
+    import fcntl
+    if fcntl.fcntl(ofObj.fileno(), fcntl.F_GETFL) & os.O_APPEND:
+      return False
+  except ImportError:
+    pass
+  fSize = fileSize(inputs[0][0])
+  numBytes = kwopts['NumOfBytes']
+  if fSize < numBytes and (fSize <= kwopts.get('TileBudget', 0) or fSize < kernelCopyMinSegment):
+    return False
+  return fSize > 0
+# *** ----------------------------------------------------------------------------------------------
+
+def _jm_write_copy(ofObj, stats, **kwopts):
+  '''
+  jm_write() for the single Input File without Bitwise NOT: the bytes are just copied 
+  from the file in round-robin manner, so no byte goes through user space. Every segment up to 
+  the end of the Input File (the first one from the offset, the last one maybe shorter) is 
+  copied in pieces of kernelCopyPiece bytes (or ChunkSize, if larger; whole filesystem blocks), 
+  each one counted as a chunk written (progress, cancellation, see runStats). A piece is reflinked
+  where it lines up with the filesystem blocks, and copied by copyRange() otherwise.
+  Return the Chunk Size (nominal: the pieces are not shorter than it).
+  '''
+  t0 = default_timer()
+  numBytes = kwopts['NumOfBytes']
+  ofObj.flush()
+  fdOut = ofObj.fileno()
+  outPos = ofObj.tell()
+  blkSize = outBlockSize(ofObj)
+  piece = max(fixedChunkSize(kwopts['ChunkSize']), kernelCopyPiece)
+  piece += (-piece) % blkSize
+  tryReflink = True
+  done = 0
+  with open(kwopts['INPUT1'], 'rb') as fIn:
+    fdIn = fIn.fileno()
+    fSize = os.fstat(fdIn).st_size
+    start = pos = fixOffset(kwopts['INPUT1'], kwopts['INPUT1_oset'])
+    while done < numBytes:
+      n = min(numBytes - done, fSize - pos, piece)
+      aligned = not (pos % blkSize or (outPos + done) % blkSize or (n % blkSize and pos + n < fSize))
+      if not (tryReflink and aligned and _reflinkRange(fdIn, fdOut, pos, n, outPos + done)):
+        tryReflink = tryReflink and not aligned
+        if copyRange(fdIn, fdOut, pos, n, outPos + done) < n:
+          raise IOError('Input File 1 %r is shorter than expected' % kwopts['INPUT1'])
+      done += n
+      pos = (pos + n) % fSize
+      if stats:
+        stats.chunk(n)
+  ofObj.seek(outPos + numBytes, 0)
+  if stats:
+    stats.addTime('copy', default_timer() - t0)
+    stats.addInput(kwopts['INPUT1'], numBytes, (start + numBytes) // fSize)
+  return fixedChunkSize(kwopts['ChunkSize'])
+# *** ----------------------------------------------------------------------------------------------
+
+def _jm_write_chunks(ofObj, stats, chunks, chunkSize):
+  '''
+  jm_write() of the mixed chunks delivered by an iterable: mixChunks() for the stream Input File 1,
+  or chunkSource. Return the Chunk Size used (the largest chunk).
+  '''
+  chunkSize, fallback = 0, chunkSize
+  for chunk in chunks:
+    t0 = default_timer()
+    ofObj.write(chunk)
+    chunkSize = max(chunkSize, len(chunk))
+    if stats:
+      stats.addTime('write', default_timer() - t0)
+      stats.chunk(len(chunk))
+  return chunkSize or fixedChunkSize(fallback)
+# *** ----------------------------------------------------------------------------------------------
+
+def mixChunks(**kwopts):
+  '''
+  for chunk in mixChunks(**kwopts): ...
+  Generator version of jm_write(): yield the mixed bytes chunk by chunk (bytes objects of 
+  ChunkSize bytes, the last one may be shorter) instead of writing them to a file. 
+  kwopts are the same as for jm_write(); Jobs, PipelineDepth and AutoChunkLimit are not used,
+  \'auto\' ChunkSize stands for the default one.
+  Input File 1 may be a stream (see isStream()): it is consumed once, chunk by chunk, while 
+  the other Input Files (which must be seekable) are read in round-robin manner. NumOfBytes 0 
+  (or None) means up to the end of the stream; if the stream ends before NumOfBytes bytes are 
+  mixed EOFError is raised.
+  '''
+  stats = kwopts.get('Stats')
+  inputs = getInputs(kwopts)
+  for path, oset, inNot in inputs[1:]:
+    if isStream(path):
+      raise ValueError('Only Input File 1 can be a stream, not %r' % path)
+  bwNot = False
+  for path, oset, inNot in inputs:
+    bwNot ^= bool(inNot)
+  numBytes = kwopts.get('NumOfBytes') or None
+  if numBytes is None and not isStream(inputs[0][0]):
+    numBytes = fileSize(inputs[0][0])
+  readers = []
+  try:
+    for path, oset, inNot in inputs:
+      readers.append(openReader(path, oset, numBytes or float('inf'), kwopts.get('UseMmap'), 
+                                kwopts.get('TileBudget', 0), kwopts.get('CacheHints')))
+      if stats:
+        readers[-1].hashObj = stats.newHash()
+    chunkSize = alignChunkSize(fixedChunkSize(kwopts['ChunkSize']), readers)
+    buf = bytearray(chunkSize)
+    view = memoryview(buf)
+    bLeft = numBytes
+    while bLeft is None or bLeft > 0:
+      t0 = default_timer()
+      n = readers[0].readinto(buf, chunkSize if bLeft is None else min(bLeft, chunkSize))
+      if not n:
+        break
+      t1 = default_timer()
+      for rdr in readers[1:]:
+        pos = 0
+        for v in rdr.slices(n):
+          mixEngine.xorInto(buf, pos, v)
+          pos += len(v)
+      if bwNot:
+        mixEngine.notInto(buf, n)
+      if stats:
+        stats.addTime('read', t1 - t0)
+        stats.addTime('mix', default_timer() - t1)
+      yield view[:n].tobytes()  # one copy (bytes(buf[:n]) would be two)
+      if bLeft is not None:
+        bLeft -= n
+    if bLeft:
+      raise EOFError('Input File 1 %r: %d bytes short of Number of bytes to process (%d)' 
+                     % (inputs[0][0], bLeft, numBytes))
+  finally:
+    if stats:
+      stats.addReaders(readers)
+    for rdr in readers:
+      rdr.close()
+# *** ----------------------------------------------------------------------------------------------
+
+class chunkSource:
+  '''
+  src = chunkSource(depth=4)
+  Bounded hand-over of the mixed chunks from the producer thread to one consumer, to be passed 
+  to jm_write() as Source (see runFanOut()). The producer src.put()-s the chunks and calls 
+  src.end(error=None) at last; the consumer iterates over src (the producer's error, if any, 
+  is raised there) and src.close()-s it when it stops: the producer does not wait for it then.
+  '''
+  def __init__(self, depth=4):
+    self.q = queue.Queue(depth)
+    self.closed = False
+  
+  def put(self, chunk):
+    if not self.closed:
+      self.q.put(chunk)
+  
+  def end(self, error=None):
+    self.put(error)
+  
+  def __iter__(self):
+    while True:
+      item = self.q.get()
+      if item is None:
+        return
+      if isinstance(item, BaseException):
+        raise item
+      yield item
+  
+  def close(self):
+    # Drain the queue: a producer blocked on it gets through, and puts at most one more chunk.
+    self.closed = True
+    while True:
+      try:
+        self.q.get_nowait()
+      except queue.Empty:
+        break
+# *** ----------------------------------------------------------------------------------------------
+
+class mixedFile:
+  '''
+  mf = mixedFile(blockSize=65536, cacheBlocks=16, **kwopts)
+  Read-only file-like object over the mixed bytes jm_write() would write for the same kwopts 
+  (see there; NumOfBytes 0 or None -- the size of Input File 1), without writing them anywhere:
+  mf.seek(offset, whence=0), mf.tell(), mf.read(size=-1), mf.readinto(buf), len(mf).
+  The bytes are mixed on demand in blocks of blockSize bytes (the Input Files are read at the 
+  corresponding offsets, see roundReader.seek()), the cacheBlocks most recently used blocks 
+  are kept. So a read costs time and memory proportional to the range asked for.
+  The Input Files must be seekable (no streams, see isStream()).
+  Call mf.close() (or use it in "with"-Statement Context) when done.
+  '''
+  def __init__(self, blockSize=65536, cacheBlocks=16, **kwopts):
+    inputs = getInputs(kwopts)
+    for path, oset, inNot in inputs:
+      if isStream(path):
+        raise ValueError('Random access to the stream Input File %r is impossible' % path)
+    self.bwNot = False
+    for path, oset, inNot in inputs:
+      self.bwNot ^= bool(inNot)
+    self.length = kwopts.get('NumOfBytes') or fileSize(inputs[0][0])
+    self.blockSize = blockSize
+    self.cacheBlocks = cacheBlocks
+    self.pos = 0
+    self._cache = OrderedDict()  # block number --> mixed bytes, the least recently used first
+    self.readers = []
+    try:
+      for path, oset, inNot in inputs:
+        self.readers.append(openReader(path, oset, self.length, kwopts.get('UseMmap'), 
+                                       kwopts.get('TileBudget', 0)))
+    except:
+      self.close()
+      raise
+  
+  def __len__(self):
+    return self.length
+  
+  def _block(self, b):
+    data = self._cache.pop(b, None)
+    if data is None:
+      start = b * self.blockSize
+      n = min(self.blockSize, self.length - start)
+      buf = bytearray(n)
+      self.readers[0].seek(start)
+      self.readers[0].readinto(buf, n)
+      for rdr in self.readers[1:]:
+        rdr.seek(start)
+        pos = 0
+        for v in rdr.slices(n):
+          mixEngine.xorInto(buf, pos, v)
+          pos += len(v)
+      if self.bwNot:
+        mixEngine.notInto(buf, n)
+      data = bytes(buf)
+      if len(self._cache) >= self.cacheBlocks:
+        self._cache.popitem(last=False)
+    self._cache[b] = data
+    return data
+  
+  def seek(self, offset, whence=0):
+    if whence == 1:
+      offset += self.pos
+    elif whence == 2:
+      offset += self.length
+    if offset < 0:
+      raise ValueError('Negative seek position %d' % offset)
+    self.pos = offset
+    return self.pos
+  
+  def tell(self):
+    return self.pos
+  
+  def read(self, size=-1):
+    end = self.length if size is None or size < 0 else min(self.length, self.pos + size)
+    parts = []
+    while self.pos < end:
+      b, k = divmod(self.pos, self.blockSize)
+      data = self._block(b)[k:k + end - self.pos]
+      parts.append(data)
+      self.pos += len(data)
+    return b''.join(parts)
+  
+  def readinto(self, buf):
+    view = memoryview(buf)
+    data = self.read(len(view))
+    view[:len(data)] = data
+    return len(data)
+  
+  def readable(self):
+    return True
+  
+  def seekable(self):
+    return True
+  
+  def close(self):
+    for rdr in self.readers:
+      rdr.close()
+    self.readers = []
+    self._cache.clear()
+  
+  def __enter__(self):
+    return self
+  
+  def __exit__(self, *excInfo):
+    self.close()
+# *** ----------------------------------------------------------------------------------------------
+
+def _jm_write_serial(ofObj, stats, **kwopts):
+  ''' jm_write() in the calling process (possibly pipelined). Return the Chunk Size used. '''
+  inputs = getInputs(kwopts)
+  # By the XOR properties NOT flags cancel out in pairs: only their parity matters.
+  bwNot = False
+  for path, oset, inNot in inputs:
+    bwNot ^= bool(inNot)
+  readers = []
+  try:
+    for path, oset, inNot in inputs:
+      readers.append(openReader(path, oset, kwopts['NumOfBytes'], kwopts.get('UseMmap'), 
+                                kwopts.get('TileBudget', 0), kwopts.get('CacheHints')))
+      if stats:
+        readers[-1].hashObj = stats.newHash()
+    chunkSize = kwopts['ChunkSize']
+    bLeft = kwopts['NumOfBytes']
+    if chunkSize == autoChunkSize:
+      unit = alignUnit(readers, outBlockSize(ofObj))
+      chunkSize, done = _tuneChunkSize(ofObj, readers, bLeft, bwNot, 
+                                       kwopts.get('AutoChunkLimit', defaultAutoChunkLimit), unit, 
+                                       stats)
+      bLeft -= done
+    chunkSize = alignChunkSize(chunkSize, readers)
+    if kwopts.get('PipelineDepth', 0) > 1 and bLeft > chunkSize:
+      _jm_write_pipelined(ofObj, readers, chunkSize, bLeft, bwNot, kwopts['PipelineDepth'], stats)
+      bLeft = 0
+    buf = bytearray(min(bLeft, chunkSize))
+    while bLeft > 0:
+      chunkSz = min([bLeft, chunkSize])
+      _mixChunk(ofObj, readers, buf, chunkSz, bwNot, stats)
+      bLeft -= chunkSz
+  finally:
+    if stats:
+      stats.addReaders(readers)
+    for rdr in readers:
+      rdr.close()
+  return chunkSize
+
+# *** ==============================================================================================
+# Copy layer: reflink (FICLONE) --> copy_file_range --> sendfile --> plain buffered copy.
+# *** ==============================================================================================
+
+FICLONE = 0x40049409
+
+def _reflink(fdIn, fdOut):
+  '''
+  ok = _reflink(fdIn, fdOut)
+  Make the file fdOut share all the data (extents) of the file fdIn by the FICLONE ioctl 
+  (copy-on-write filesystems: btrfs, xfs, ...). Return True on success.
+  '''
+  if not sys.platform.startswith('linux'):
+    return False
+  try:
+    import fcntl
+    fcntl.ioctl(fdOut, FICLONE, fdIn)
+  except (ImportError, IOError, OSError):
+    return False
+  return True
+# *** ----------------------------------------------------------------------------------------------
+
+FICLONERANGE = 0x4020940d
+_cloneRange = struct.Struct('=qQQQ')  # src_fd, src_offset, src_length, dest_offset
+
+def _reflinkRange(fdIn, fdOut, inPos, count, outPos):
+  '''
+  ok = _reflinkRange(fdIn, fdOut, inPos, count, outPos)
+  Make the range [outPos, outPos + count) of the file fdOut share the data of the range 
+  [inPos, inPos + count) of the file fdIn by the FICLONERANGE ioctl. The offsets (and count, 
+  unless the range ends at the end of fdIn) must be multiples of the filesystem block size. 
+  Return True on success.
+  '''
+  if not sys.platform.startswith('linux'):
+    return False
+  try:
+    import fcntl
+    fcntl.ioctl(fdOut, FICLONERANGE, _cloneRange.pack(fdIn, inPos, count, outPos))
+  except (ImportError, IOError, OSError):
+    return False
+  return True
+# *** ----------------------------------------------------------------------------------------------
+
+def copyRange(fdIn, fdOut, inPos, count, outPos, bufSize=defaultShiftBlockSize):
+  '''
+  copyRange(fdIn, fdOut, inPos, count, outPos, bufSize=defaultShiftBlockSize)
+  Copy count bytes from the position inPos of the file fdIn to the position outPos of the file 
+  fdOut, kernel-side if possible: by os.copy_file_range(), else by os.sendfile(), 
+  else by reading and writing buffers of up to bufSize bytes. 
+  The file pointer of fdIn is not used; the one of fdOut may be moved.
+  '''
+  done = 0
+  if hasattr(os, 'copy_file_range'):
+    try:
+      while done < count:
+        n = os.copy_file_range(fdIn, fdOut, count - done, inPos + done, outPos + done)
+        if not n:
+          break
+        done += n
+    except OSError:
+      pass
+  if done < count and hasattr(os, 'sendfile'):
+    try:
+      os.lseek(fdOut, outPos + done, 0)
+      while done < count:
+        n = os.sendfile(fdOut, fdIn, inPos + done, count - done)
+        if not n:
+          break
+        done += n
+    except OSError:
+      pass
+  while done < count:
+    os.lseek(fdIn, inPos + done, 0)
+    data = os.read(fdIn, min(bufSize, count - done))
+    if not data:
+      break
+    positionalWriter(fdOut, outPos + done).write(data)
+    done += len(data)
+  return done
+# *** ----------------------------------------------------------------------------------------------
+
+def copyFile(srcPath, dstPath):
+  '''
+  copyFile(srcPath, dstPath)
+  shutil.copy2() replacement: copy the file content by reflink where the filesystem supports it 
+  (no data is copied at all then), otherwise by copyRange(); then copy the file metadata 
+  (permission bits, access / modification times, flags) by shutil.copystat().
+  '''
+  with open(srcPath, 'rb') as fsrc, open(dstPath, 'wb') as fdst:
+    if not _reflink(fsrc.fileno(), fdst.fileno()):
+      copyRange(fsrc.fileno(), fdst.fileno(), 0, os.fstat(fsrc.fileno()).st_size, 0)
+  shutil.copystat(srcPath, dstPath)
+# *** ----------------------------------------------------------------------------------------------
+
+rangeBackupMagic = b'JMRB'
+_rangeBackupHead = struct.Struct('<4sQQQ')  # magic, origSize, offset, length
+
+def saveRangeBackup(filePath, bcpPath, offset, length):
+  '''
+  saveRangeBackup(filePath, bcpPath, offset, length)
+  "Range-only" backup: save to bcpPath only the bytes [offset, offset + length) of the file 
+  (those to be overwritten), together with the offset and the original file size 
+  needed to restore them by restoreRangeBackup().
+  '''
+  origSize = os.path.getsize(filePath)
+  length = max(0, min(length, origSize - offset))
+  with open(filePath, 'rb') as fsrc, open(bcpPath, 'wb') as fbcp:
+    fbcp.write(_rangeBackupHead.pack(rangeBackupMagic, origSize, offset, length))
+    fbcp.flush()
+    copyRange(fsrc.fileno(), fbcp.fileno(), offset, length, _rangeBackupHead.size)
+# *** ----------------------------------------------------------------------------------------------
+
+def restoreRangeBackup(bcpPath, filePath):
+  '''
+  restoreRangeBackup(bcpPath, filePath)
+  Put the bytes saved by saveRangeBackup() back to their place in the file 
+  and truncate the file to its original size.
+  '''
+  with open(bcpPath, 'rb') as fbcp, open(filePath, 'rb+') as fdst:
+    magic, origSize, offset, length = _rangeBackupHead.unpack(fbcp.read(_rangeBackupHead.size))
+    if magic != rangeBackupMagic:
+      raise ValueError('Not a range-only backup file: ' + bcpPath)
+    copyRange(fbcp.fileno(), fdst.fileno(), _rangeBackupHead.size, length, offset)
+    os.ftruncate(fdst.fileno(), origSize)
+# *** ----------------------------------------------------------------------------------------------
+
+class restoreRangeBackupAction(argparse.Action):
+  ''' argparse Action: restore a range-only backup and exit (like the 'version' action does). '''
+  def __call__(self, parser, namespace, values, option_string=None):
+    bcpPath, filePath = values
+    restoreRangeBackup(bcpPath, filePath)
+    parser.exit(message='Restored {!r} from the range-only backup {!r}\n'.format(filePath, bcpPath))
+
+# *** ==============================================================================================
+# In-place insertion: open a gap in the middle of a file by shifting its tail.
+# *** ==============================================================================================
+
+_libcFunctions = {}
+
+def _libcFunction(name, argTypes):
+  '''
+  fn = _libcFunction(name, argTypes)
+  Return the Linux libc function through ctypes, its arguments being of the types given 
+  by the characters of argTypes: 'i' -- int, 'I' -- unsigned int, 'q' -- 64-bit integer 
+  (off_t, size_t). Return None if it is not available. The look-ups are cached.
+  '''
+  if name not in _libcFunctions:
+    fn = None
+    if sys.platform.startswith('linux'):
+      try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fn = getattr(libc, name)
+        types = {'i': ctypes.c_int, 'I': ctypes.c_uint, 'q': ctypes.c_longlong}
+        fn.argtypes = [types[t] for t in argTypes]
+      except (ImportError, OSError, AttributeError):
+        fn = None
+    _libcFunctions[name] = fn
+  return _libcFunctions[name]
+# *** ----------------------------------------------------------------------------------------------
+
+FALLOC_FL_INSERT_RANGE = 0x20
+
+def _fallocate(fd, mode, offset, length):
+  '''
+  ok = _fallocate(fd, mode, offset, length)
+  Call Linux fallocate(2) with the given mode through ctypes. Return True on success, 
+  False if it is not available or not supported for the file (filesystem).
+  '''
+  fn = _libcFunction('fallocate', 'iiqq')
+  if fn is None:
+    return False
+  return fn(fd, mode, offset, length) == 0
+# *** ----------------------------------------------------------------------------------------------
+
+class insertJournal:
+  '''
+  jrn = insertJournal(path)
+  Small journal making the in-place opening of a gap (see openGap()) crash-safe instead of 
+  a full backup copy of the file. It holds a header -- original file size, fixed offset, 
+  gap length and block size -- and two alternating slots with the latest step records:
+    * 'F' -- the gap is being inserted by fallocate(FALLOC_FL_INSERT_RANGE);
+    * 'S' -- the block [start, end) is being moved to [start + gap, end + gap), all the bytes 
+      from "end" on are moved already; "data" is a copy of the part of the block overlapping 
+      its target (from start + gap on), if any -- the only part a torn move can overwrite;
+    * 'M' -- the gap is open, the mixed bytes are being written into it.
+  Every record is fsync-ed before the corresponding step is performed, so after a crash 
+  the step can be redone, and the same insertion continued (see jmFU.insertBytes()).
+  '''
+  magic = b'JMIJ'
+  _head = struct.Struct('<4sQQQQL')  # magic, origSize, oset, gap, blockSize, crc
+  _slot = struct.Struct('<Q1sQQQL')  # seq, kind, start, end, dataLen, crc
+  
+  def __init__(self, path):
+    self.path = path
+    self.jObj = None
+    self.seq = 0
+    self.blockSize = 0
+  
+  def _slotPos(self, seq):
+    return self._head.size + (seq % 2) * (self._slot.size + self.blockSize)
+  
+  def load(self):
+    '''
+    state = jrn.load()
+    Return the (origSize, oset, gap, record) tuple of an unfinished insertion, record being 
+    the latest valid (kind, start, end, data) step record or None. Return None if there is 
+    no (valid) journal.
+    '''
+    if not os.path.isfile(self.path):
+      return None
+    with open(self.path, 'rb') as jObj:
+      head = jObj.read(self._head.size)
+      if len(head) < self._head.size:
+        return None
+      magic, origSize, oset, gap, blockSize, crc = self._head.unpack(head)
+      if magic != self.magic or crc != zlib.crc32(head[:-4]) & 0xffffffff:
+        return None
+      self.blockSize = blockSize
+      record = None
+      for pos in (self._slotPos(0), self._slotPos(1)):
+        jObj.seek(pos, 0)
+        slot = jObj.read(self._slot.size)
+        if len(slot) < self._slot.size:
+          continue
+        seq, kind, start, end, dataLen, crc = self._slot.unpack(slot)
+        data = jObj.read(dataLen)
+        if crc != zlib.crc32(data, zlib.crc32(slot[:-4])) & 0xffffffff or len(data) != dataLen:
+          continue
+        if seq >= self.seq:
+          self.seq = seq + 1
+          record = (kind.decode('ascii'), start, end, data)
+    return origSize, oset, gap, record
+  
+  def create(self, origSize, oset, gap, blockSize):
+    self.blockSize = blockSize
+    self.seq = 0
+    head = self._head.pack(self.magic, origSize, oset, gap, blockSize, 0)[:-4]
+    with open(self.path, 'wb') as jObj:
+      jObj.write(head + struct.pack('<L', zlib.crc32(head) & 0xffffffff))
+      jObj.flush()
+      os.fsync(jObj.fileno())
+  
+  def record(self, kind, start, end, data=b''):
+    slot = self._slot.pack(self.seq, kind.encode('ascii'), start, end, len(data), 0)[:-4]
+    crc = zlib.crc32(data, zlib.crc32(slot)) & 0xffffffff
+    if self.jObj is None:
+      self.jObj = open(self.path, 'rb+')
+    self.jObj.seek(self._slotPos(self.seq), 0)
+    self.jObj.write(slot + struct.pack('<L', crc))
+    self.jObj.write(data)
+    self.jObj.flush()
+    os.fsync(self.jObj.fileno())
+    self.seq += 1
+  
+  def remove(self):
+    if self.jObj is not None:
+      self.jObj.close()
+      self.jObj = None
+    if os.path.isfile(self.path):
+      os.remove(self.path)
+# *** ----------------------------------------------------------------------------------------------
+
+def _insertRange(fObj, oset, gap, origSize, journal, redo=False):
+  '''
+  Try to open the gap by fallocate(FALLOC_FL_INSERT_RANGE) without moving any data: possible 
+  if gap is a multiple of the filesystem block size. The range is inserted at the block boundary 
+  preceding oset, then the head fragment of the block is moved back in front of the gap.
+  Return True on success.
+  '''
+  fd = fObj.fileno()
+  bs = os.fstatvfs(fd).f_bsize
+  if gap % bs:
+    return False
+  a = oset - oset % bs
+  if not (redo and os.fstat(fd).st_size == origSize + gap):
+    if journal:
+      journal.record('F', a, oset)
+    if not _fallocate(fd, FALLOC_FL_INSERT_RANGE, a, gap):
+      return False
+  if oset > a:
+    fObj.seek(a + gap, 0)
+    data = fObj.read(oset - a)
+    fObj.seek(a, 0)
+    fObj.write(data)
+    fObj.flush()
+  return True
+# *** ----------------------------------------------------------------------------------------------
+
+def openGap(fObj, offset, gap, journal=None, blockSize=defaultShiftBlockSize):
+  '''
+  oset = openGap(fObj, offset, gap, journal=None, blockSize=defaultShiftBlockSize)
+  Open a gap of "gap" bytes in the file (fObj, openned in 'rb+' mode) at the "extended" offset:
+  the tail of the file is shifted towards the end -- by fallocate(FALLOC_FL_INSERT_RANGE) where 
+  possible, otherwise by moving it backwards in blocks of up to blockSize bytes, starting from 
+  the end of the file. The bytes before the gap are not touched. Return the fixed offset.
+  With an insertJournal object the steps are journaled (and the file fsync-ed after each of them),
+  and an unfinished opening of the same gap recorded in the journal is continued.
+  Cost of the move: the tail is read and written once. With the journal there are two fsyncs 
+  per block, so the blocks are gap-sized (not overlapping their targets, nothing to journal) 
+  only if the gap is at least min(blockSize, shiftMinStep) or the tail is at most shiftMaxSteps 
+  gaps long. Otherwise they are blockSize long, and the part of each block overlapping its target 
+  is written to the journal too: up to 1.5 times the I/O of the plain move for a short gap 
+  and a long tail, in exchange for few fsyncs.
+  '''
+  fObj.flush()
+  fd = fObj.fileno()
+  state = journal.load() if journal else None
+  if state:
+    origSize, oset, jGap, record = state
+    if jGap != gap or oset != int(offset) % origSize:
+      raise RuntimeError('Unfinished insertion of other bytes is recorded in the journal: ' + 
+                         journal.path)
+    blockSize = journal.blockSize
+  else:
+    origSize = os.fstat(fd).st_size
+    oset = int(offset) % origSize
+    record = None
+    if not gap:
+      return oset
+    if journal:
+      journal.create(origSize, oset, gap, blockSize)
+  kind = record[0] if record else None
+  if kind == 'M':
+    return oset
+  if kind in (None, 'F') and _insertRange(fObj, oset, gap, origSize, journal, redo=(kind == 'F')):
+    if journal:
+      os.fsync(fd)
+      journal.record('M', oset, oset)
+    return oset
+  # Blocks not longer than the gap do not overlap their targets: a torn move of such a block can be
+  # redone from the source, no copy of the data is journaled. Too many fsyncs for a short gap 
+  # and a long tail though.
+  if gap >= min(blockSize, shiftMinStep) or origSize - oset <= gap * shiftMaxSteps:
+    step = min(blockSize, gap)
+  else:
+    step = blockSize
+  if kind == 'S':
+    end = record[2]
+  else:
+    end = origSize
+  while end > oset:
+    start = record[1] if kind == 'S' else max(oset, end - step)
+    fObj.seek(start, 0)
+    if kind == 'S' and record[3]:
+      # The head of the block, up to its target, is intact.
+      data = fObj.read(gap) + record[3]
     else:
-      fun = lambda x: x
-    oset_1 = fixOffset(kwopts['INPUT1'], kwopts['INPUT1_oset'])
-    with open(kwopts['INPUT1'], 'rb') as if1_obj:
-      if1_obj.seek(oset_1, 0)
-      bLeft = kwopts['NumOfBytes']
-      while bLeft > 0:
-        chunkSz = min([bLeft, kwopts['ChunkSize']])
-        s1 = roundRead(if1_obj, chunkSz)
-        sO = fun(s1)
-        ofObj.write(sO)
-        bLeft -= chunkSz
+      data = fObj.read(end - start)
+    if journal and kind != 'S':
+      journal.record('S', start, end, data[gap:])
+    kind = None
+    if os.fstat(fd).st_size < origSize + gap:
+      os.ftruncate(fd, origSize + gap)
+    fObj.seek(start + gap, 0)
+    fObj.write(data)
+    fObj.flush()
+    if journal:
+      os.fsync(fd)
+    end = start
+  if journal:
+    journal.record('M', oset, oset)
+  return oset
+# *** ----------------------------------------------------------------------------------------------
+
+class runCheckpoint:
+  '''
+  ckpt = runCheckpoint(path)
+  Sidecar checkpoint file of a long run (see jmFU, checkpointWriter): JSON dict holding the hash 
+  of the configuration ('config', see jmFU._configHash()), the Temporary Output and Backup paths 
+  ('tmp', 'bcp'), the position of the mixed bytes in the file written ('out_pos'), the number 
+  of the mixed bytes committed -- written and fsync-ed -- ('committed'), the Input Files 
+  ('inputs': [path, fixed offset, size] lists) and their fixed offsets at the committed position 
+  ('offsets'). The file is replaced atomically (written, fsync-ed and renamed).
+  '''
+  def __init__(self, path):
+    self.path = path
+  
+  def load(self):
+    ''' Return the state dict saved, or None if there is no (valid) checkpoint. '''
+    if not os.path.isfile(self.path):
+      return None
+    try:
+      with open(self.path) as cObj:
+        return json.load(cObj)
+    except ValueError:
+      return None
+  
+  def save(self, state):
+    tmpPath = self.path + '.tmp'
+    with open(tmpPath, 'w') as cObj:
+      cObj.write(json.dumps(state, sort_keys=True))
+      cObj.flush()
+      os.fsync(cObj.fileno())
+    os.rename(tmpPath, self.path)
+  
+  def remove(self):
+    if os.path.isfile(self.path):
+      os.remove(self.path)
+# *** ----------------------------------------------------------------------------------------------
+
+def padRanges(size, start, numBytes):
+  '''
+  ranges = padRanges(size, start, numBytes)
+  Byte ranges ((start, end) pairs) of the pad (Input File) of "size" bytes consumed by reading 
+  numBytes bytes round-robin from the fixed offset start (see fixOffset()): one range, or two 
+  if the reading wraps around the end of the file; the whole file if numBytes >= size.
+  '''
+  if numBytes >= size:
+    return [(0, size)]
+  if start + numBytes <= size:
+    return [(start, start + numBytes)]
+  return [(start, size), (0, start + numBytes - size)]
+# *** ----------------------------------------------------------------------------------------------
+
+class padLedger:
+  '''
+  ldg = padLedger(path)
+  Usage ledger of a pad (Input File, see jmFU): the append-only JSON-lines log (path) of the byte 
+  ranges of the pad consumed by the runs ('start', 'end', and 'output', 'method', 'time' of 
+  the run), and its index -- the sorted arrays of the starts and ends of the consumed ranges 
+  merged into disjoint ones:
+    * ldg.overlaps(start, end) -- the consumed ranges overlapping [start, end), O(log n);
+    * ldg.record(ranges, **info) -- append the ranges ((start, end) pairs) to the log and index;
+    * ldg.reserve(ranges, reuse=False, **info) -- check the ranges against the log and record 
+      them in one step, under an exclusive lock (flock) of the log, so the runs of other threads
+      or processes can not consume them in between. Return the consumed ranges they overlap: 
+      if any, the ranges are not recorded unless reuse. The reservation is then either settled
+      by ldg.settle(**info) (the ranges are consumed) or undone by ldg.release();
+    * ldg.adopt(reservation) -- take over the reservation (id, see ldg.reservation) left pending
+      by an interrupted run, to settle or release it as its own: the run resumed (see jmFU.Resume).
+      Return False if it is not pending (settled, released, or not in the log);
+    * ldg.nextFree(n, size, after=0) -- the first offset (from after on, wrapping around the end 
+      of the pad of "size" bytes) n unused bytes can be read from, or None if there is none.
+  The ranges of a reservation neither settled nor released (the run crashed, or it is checkpointed 
+  to be resumed) stay consumed.
+  '''
+  def __init__(self, path):
+    self.path = path
+    self.reservation = None
+    self.starts = []
+    self.ends = []
+    self.pending = set()
+    if os.path.isfile(path):
+      with open(path) as lObj:
+        self._load(lObj)
+  
+  def _load(self, lObj):
+    # (Re)build the index from the log: the ranges of the released reservations are left out.
+    # self.pending -- the ids of the reservations neither settled nor released.
+    self.starts = []
+    self.ends = []
+    entries = [json.loads(line) for line in lObj if line.strip()]
+    released = set(entry['id'] for entry in entries if entry.get('released'))
+    closed = set(entry['id'] for entry in entries if 'id' in entry and 'start' not in entry)
+    self.pending = set(entry['id'] for entry in entries if 'start' in entry and 'id' in entry) - closed
+    for entry in entries:
+      if 'start' in entry and entry.get('id') not in released:
+        self._add(entry['start'], entry['end'])
+  
+  @contextlib.contextmanager
+  def _locked(self):
+    # The log opened for appending, exclusively locked (where flock is available).
+    with open(self.path, 'a+') as lObj:
+      try:
+        import fcntl
+      except ImportError:
+        fcntl = None
+      if fcntl is not None:
+        fcntl.flock(lObj.fileno(), fcntl.LOCK_EX)
+      try:
+        yield lObj
+      finally:
+        if fcntl is not None:
+          fcntl.flock(lObj.fileno(), fcntl.LOCK_UN)
+  
+  def _append(self, lObj, entries):
+    lObj.seek(0, 2)
+    for entry in entries:
+      lObj.write(json.dumps(entry, sort_keys=True) + '\n')
+    lObj.flush()
+    os.fsync(lObj.fileno())
+  
+  def _add(self, start, end):
+    # Merge [start, end) with the ranges it overlaps or adjoins.
+    i = bisect.bisect_left(self.ends, start)
+    j = bisect.bisect_right(self.starts, end)
+    if i < j:
+      start = min(start, self.starts[i])
+      end = max(end, self.ends[j-1])
+    self.starts[i:j] = [start]
+    self.ends[i:j] = [end]
+  
+  def overlaps(self, start, end):
+    if start >= end:
+      return []
+    i = bisect.bisect_right(self.ends, start)
+    j = bisect.bisect_left(self.starts, end)
+    return list(zip(self.starts[i:j], self.ends[i:j]))
+  
+  def record(self, ranges, **info):
+    with self._locked() as lObj:
+      self._append(lObj, [dict(info, start=start, end=end) for start, end in ranges])
+    for start, end in ranges:
+      self._add(start, end)
+  
+  def reserve(self, ranges, reuse=False, **info):
+    with self._locked() as lObj:
+      # The log as the other runs have left it.
+      lObj.seek(0)
+      self._load(lObj)
+      reused = [r for start, end in ranges for r in self.overlaps(start, end)]
+      if reused and not reuse:
+        return reused
+      self.reservation = binascii.hexlify(os.urandom(8)).decode('ascii')
+      self._append(lObj, [dict(info, start=start, end=end, id=self.reservation) 
+                          for start, end in ranges])
+    for start, end in ranges:
+      self._add(start, end)
+    return reused
+  
+  def adopt(self, reservation):
+    with self._locked() as lObj:
+      lObj.seek(0)
+      self._load(lObj)
+    if reservation not in self.pending:
+      return False
+    self.reservation = reservation
+    return True
+  
+  def settle(self, **info):
+    with self._locked() as lObj:
+      self._append(lObj, [dict(info, id=self.reservation)])
+    self.reservation = None
+  
+  def release(self):
+    with self._locked() as lObj:
+      self._append(lObj, [{'id': self.reservation, 'released': True}])
+      lObj.seek(0)
+      self._load(lObj)
+    self.reservation = None
+  
+  def nextFree(self, n, size, after=0):
+    if n > size or not size:
+      return None
+    after %= size
+    if not self.starts:
+      return after
+    # The gaps between the consumed ranges in order, the last one wrapping around the end of 
+    # the pad; gap k starts at the end of range k.
+    gaps = list(zip(self.ends, self.starts[1:] + [self.starts[0] + size]))
+    k = bisect.bisect_right(self.ends, after) - 1
+    if k < 0:
+      # after is before the end of the first range: in the wrapping gap, if at all.
+      k, after = len(gaps) - 1, after + size
+    for i in range(len(gaps) + 1):
+      gapStart, gapEnd = gaps[(k + i) % len(gaps)]
+      if i == 0:
+        gapStart = max(gapStart, after)
+      if gapEnd - gapStart >= n:
+        return gapStart % size
+    return None
 
 # *** ==============================================================================================
 
@@ -209,12 +2637,40 @@ class jmFU:
     self.INPUT2_oset = 0
     self.INPUT2_bwNot = False
     #------------------------
+    # Additional Input Files: list of (INPUTn, INPUTn_oset, INPUTn_bwNot) tuples.
+    self.INPUTS = []
+    #------------------------
     # Output file:
     self.OUTPUT = None
     self.OUTPUT_oset = 0
     # Number of bytes to process. Chunk Size for file input/output. 
     self.NumOfBytes = 0
     self.ChunkSize = defaultChunkSize
+    # The largest Chunk Size to try if ChunkSize is 'auto'.
+    self.AutoChunkLimit = defaultAutoChunkLimit
+    # Whether to read Input File(s) through memory mapping.
+    self.UseMmap = False
+    # Input File(s) not larger than this number of bytes are loaded into memory once and tiled.
+    # (0 disables)
+    self.TileBudget = defaultTileBudget
+    # Page cache control (see pageCacheWriter): whether to give the page cache hints (read-ahead 
+    # and drop-behind of the Input File(s) and the Output File), whether to write the Output File 
+    # with O_DIRECT, and every how many bytes to start its writeback (0 -- leave it to the kernel).
+    self.CacheHints = False
+    self.DirectIO = False
+    self.SyncEvery = 0
+    # Durability of the Output File (see durabilityLevels): 'none' -- left to the kernel, 'end' --
+    # fsync-ed once written (the Temporary Output before it is renamed to the Output File, the 
+    # directory after that), 'periodic' -- fsync-ed every FsyncEvery bytes as well 
+    # (0 -- defaultFsyncEvery). The Backup is fsync-ed before the Output File is modified.
+    self.Durability = 'none'
+    self.FsyncEvery = 0
+    # fsyncTicket to defer the fsyncs not needed before the run ends to (see fsyncGroup).
+    self.SyncGroup = None
+    # Number of worker processes to mix the bytes in parallel with.
+    self.Jobs = 1
+    # Ring depth of the read / mix / write pipeline (0 -- strictly serial chunk loop).
+    self.PipelineDepth = 0
     # One of the: 'overwriteFile', 'appendBytes', 'rewriteBytes', 'insertBytes'
     self.ModifyMethod = 'overwriteFile'
     # If the Output File exists, back up it to this path before process.
@@ -223,7 +2679,44 @@ class jmFU:
     # Output all the data to this file first, and then MOVE the file to its 
     # "final destination": the Output File Path as specified in self.OUTPUT
     self.TmpOutPath = None
+    # 'insertBytes' Modify Method: open a gap in the Output File (or Temporary Output) by shifting
+    # its tail, instead of rebuilding it from a full copy. Crash-safe by a journal (see openGap()).
+    self.InsertInPlace = False
+    # 'rewriteBytes' Modify Method: back up only the bytes to be overwritten (see saveRangeBackup()).
+    self.RangeBackup = False
+    # Callable progress(done, total) invoked after every chunk written, see runStats.
+    self.ProgressCallback = None
+    # threading.Event to cancel the run with at the next chunk boundary (see runCancelled).
+    self.CancelEvent = None
+    # Iterable of the mixed chunks to write instead of reading the Input File(s) (see runFanOut()).
+    self.Source = None
+    # Export the statistics of every run to this file (Prometheus textfile if '*.prom', JSON otherwise).
+    self.StatsPath = None
+    # hashlib algorithm to compute the digests of the bytes read and written with (None -- none).
+    self.Digest = None
+    # Whether to compute the digest of the whole resulting Output File as well.
+    self.DigestOutput = False
+    # Commit the checkpoint of the run every this number of chunks (0 -- no checkpoints).
+    self.Checkpoint = 0
+    # Continue the interrupted run from its checkpoint (if any).
+    self.Resume = False
+    # Pads: Input Files to keep the usage ledger of (see padLedger), and what to do if the run 
+    # would reuse their bytes: 'refuse' (fail the run) or 'warn' (log it and go on).
+    self.Ledger = []
+    self.LedgerPolicy = 'refuse'
     # --------------------------------------
+    # Chunk Size actually used by the last run (differs from ChunkSize if it is 'auto').
+    self._chunkSizeUsed = None
+    # Statistics of the last run (see run()); self._stats -- the runStats object being filled.
+    self.stats = None
+    self._stats = runStats()
+    # Checkpoint of the run (runCheckpoint) and the state resumed (see _openCheckpoint()).
+    self._ckpt = None
+    self._resumed = None
+    # Reservations of the pad ranges of the run: (padLedger, ranges) list (see _checkLedger()).
+    self._ledgers = []
+    # Start and end of the mixed bytes in the file written.
+    self._mixedStart = self._mixedEnd = 0
     self._modifyMethods = {
       'overwriteFile': self.overwriteFile,
       'appendBytes':   self.appendBytes,
@@ -250,6 +2743,9 @@ class jmFU:
     if 'INPUT2_bwNot' in kwopts:
       self.INPUT2_bwNot = kwopts['INPUT2_bwNot']
     #-------------------------------------------
+    if 'INPUTS' in kwopts:
+      self.INPUTS = [tuple(inp) for inp in kwopts['INPUTS'] or []]
+    #-------------------------------------------
     if 'OUTPUT' in kwopts:
       self.OUTPUT = kwopts['OUTPUT']
     if 'OUTPUT_oset' in kwopts:
@@ -258,12 +2754,58 @@ class jmFU:
       self.NumOfBytes = kwopts['NumOfBytes']
     if 'ChunkSize' in kwopts:
       self.ChunkSize = kwopts['ChunkSize']
+    if 'AutoChunkLimit' in kwopts:
+      self.AutoChunkLimit = kwopts['AutoChunkLimit']
+    if 'UseMmap' in kwopts:
+      self.UseMmap = kwopts['UseMmap']
+    if 'TileBudget' in kwopts:
+      self.TileBudget = kwopts['TileBudget']
+    if 'CacheHints' in kwopts:
+      self.CacheHints = kwopts['CacheHints']
+    if 'DirectIO' in kwopts:
+      self.DirectIO = kwopts['DirectIO']
+    if 'SyncEvery' in kwopts:
+      self.SyncEvery = kwopts['SyncEvery']
+    if 'Durability' in kwopts:
+      self.Durability = kwopts['Durability']
+    if 'FsyncEvery' in kwopts:
+      self.FsyncEvery = kwopts['FsyncEvery']
+    if 'SyncGroup' in kwopts:
+      self.SyncGroup = kwopts['SyncGroup']
+    if 'Jobs' in kwopts:
+      self.Jobs = kwopts['Jobs']
+    if 'PipelineDepth' in kwopts:
+      self.PipelineDepth = kwopts['PipelineDepth']
     if 'ModifyMethod' in kwopts:
       self.ModifyMethod = kwopts['ModifyMethod']
     if 'BackupPath' in kwopts:
       self.BackupPath = kwopts['BackupPath']
     if 'TmpOutPath' in kwopts:
       self.TmpOutPath = kwopts['TmpOutPath']
+    if 'InsertInPlace' in kwopts:
+      self.InsertInPlace = kwopts['InsertInPlace']
+    if 'RangeBackup' in kwopts:
+      self.RangeBackup = kwopts['RangeBackup']
+    if 'ProgressCallback' in kwopts:
+      self.ProgressCallback = kwopts['ProgressCallback']
+    if 'CancelEvent' in kwopts:
+      self.CancelEvent = kwopts['CancelEvent']
+    if 'Source' in kwopts:
+      self.Source = kwopts['Source']
+    if 'StatsPath' in kwopts:
+      self.StatsPath = kwopts['StatsPath']
+    if 'Digest' in kwopts:
+      self.Digest = kwopts['Digest']
+    if 'DigestOutput' in kwopts:
+      self.DigestOutput = kwopts['DigestOutput']
+    if 'Checkpoint' in kwopts:
+      self.Checkpoint = kwopts['Checkpoint']
+    if 'Resume' in kwopts:
+      self.Resume = kwopts['Resume']
+    if 'Ledger' in kwopts:
+      self.Ledger = list(kwopts['Ledger'] or [])
+    if 'LedgerPolicy' in kwopts:
+      self.LedgerPolicy = kwopts['LedgerPolicy']
   # *** --------------------------------------------------------------------------------------------
   
   def get_conf(self):
@@ -276,106 +2818,528 @@ class jmFU:
     kwopts['INPUT2_oset'] = self.INPUT2_oset
     kwopts['INPUT2_bwNot'] = self.INPUT2_bwNot
     #-----------------------------------------
+    kwopts['INPUTS'] = list(self.INPUTS)
+    #-----------------------------------------
     kwopts['OUTPUT'] = self.OUTPUT
     kwopts['OUTPUT_oset'] = self.OUTPUT_oset
     kwopts['NumOfBytes'] = self.NumOfBytes
     kwopts['ChunkSize'] = self.ChunkSize
+    kwopts['AutoChunkLimit'] = self.AutoChunkLimit
+    kwopts['UseMmap'] = self.UseMmap
+    kwopts['TileBudget'] = self.TileBudget
+    kwopts['CacheHints'] = self.CacheHints
+    kwopts['DirectIO'] = self.DirectIO
+    kwopts['SyncEvery'] = self.SyncEvery
+    kwopts['Durability'] = self.Durability
+    kwopts['FsyncEvery'] = self.FsyncEvery
+    kwopts['SyncGroup'] = self.SyncGroup
+    kwopts['Jobs'] = self.Jobs
+    kwopts['PipelineDepth'] = self.PipelineDepth
     kwopts['ModifyMethod'] = self.ModifyMethod
     kwopts['BackupPath'] = self.BackupPath
     kwopts['TmpOutPath'] = self.TmpOutPath
+    kwopts['InsertInPlace'] = self.InsertInPlace
+    kwopts['RangeBackup'] = self.RangeBackup
+    kwopts['ProgressCallback'] = self.ProgressCallback
+    kwopts['CancelEvent'] = self.CancelEvent
+    kwopts['Source'] = self.Source
+    kwopts['StatsPath'] = self.StatsPath
+    kwopts['Digest'] = self.Digest
+    kwopts['DigestOutput'] = self.DigestOutput
+    kwopts['Checkpoint'] = self.Checkpoint
+    kwopts['Resume'] = self.Resume
+    kwopts['Ledger'] = list(self.Ledger)
+    kwopts['LedgerPolicy'] = self.LedgerPolicy
     return kwopts
   # *** ============================================================================================
   
   # <--- Consider preservation of Output File attributes, at least MODIFICATION / Access timestamps !!! 
   def overwriteFile(self):
-    if self.BackupPath:
-      shutil.copy2(self.OUTPUT, self.BackupPath)
-    optsD = self.get_conf()
+    if isStream(self.OUTPUT):
+      return self._writeStream()
+    self._openCheckpoint()
+    if self.BackupPath and not self._resumed:
+      with self._stats.phase('backup'):
+        copyFile(self.OUTPUT, self.BackupPath)
+      self._syncBackup()
     outFile = self.TmpOutPath or self.OUTPUT
-    with open(outFile, 'wb') as ofObj:
-      jm_write(ofObj, **optsD)
-    if self.TmpOutPath:
-      os.rename(self.TmpOutPath, self.OUTPUT)
+    with open(outFile, 'rb+' if self._resumed else 'wb') as ofObj:
+      self._mixInto(ofObj, outFile, 0)
+      self._syncOutput(ofObj)
+    self._replaceOutput()
   # *** --------------------------------------------------------------------------------------------
   
   def appendBytes(self):
-    if self.BackupPath:
-      shutil.copy2(self.OUTPUT, self.BackupPath)
+    if isStream(self.OUTPUT):
+      return self._writeStream()
+    self._openCheckpoint()
+    if self.BackupPath and not self._resumed:
+      with self._stats.phase('backup'):
+        copyFile(self.OUTPUT, self.BackupPath)
+      self._syncBackup()
     if self.TmpOutPath:
-      shutil.copy2(self.OUTPUT, self.TmpOutPath)
+      if not self._resumed:
+        with self._stats.phase('tmp_copy'):
+          copyFile(self.OUTPUT, self.TmpOutPath)
       outFile = self.TmpOutPath
     else:
       outFile = self.OUTPUT
-    optsD = self.get_conf()
-    with open(outFile, 'ab') as ofObj:
-      jm_write(ofObj, **optsD)
-    if self.TmpOutPath:
-      os.rename(self.TmpOutPath, self.OUTPUT)
+    # Not 'ab': the position of the appended bytes is kept to write them again (if checkpointed),
+    # and O_APPEND files can not be written by os.copy_file_range() (see _jm_write_copy()).
+    # The file is created if missing, as 'ab' does.
+    if not os.path.exists(outFile):
+      open(outFile, 'wb').close()
+    with open(outFile, 'rb+') as ofObj:
+      ofObj.seek(0, 2)
+      self._mixInto(ofObj, outFile, ofObj.tell())
+      self._syncOutput(ofObj)
+    self._replaceOutput()
   # *** --------------------------------------------------------------------------------------------
   
   def rewriteBytes(self):
-    if self.BackupPath:
-      shutil.copy2(self.OUTPUT, self.BackupPath)
+    self._checkSeekableOutput()
+    self._openCheckpoint()
+    if self._resumed:
+      pass
+    elif self.BackupPath and self.RangeBackup:
+      with self._stats.phase('backup'):
+        saveRangeBackup(self.OUTPUT, self.BackupPath, fixOffset(self.OUTPUT, self.OUTPUT_oset), 
+                        self.NumOfBytes)
+      self._syncBackup()
+    elif self.BackupPath:
+      with self._stats.phase('backup'):
+        copyFile(self.OUTPUT, self.BackupPath)
+      self._syncBackup()
     if self.TmpOutPath:
-      shutil.copy2(self.OUTPUT, self.TmpOutPath)
+      if not self._resumed:
+        with self._stats.phase('tmp_copy'):
+          copyFile(self.OUTPUT, self.TmpOutPath)
       outFile = self.TmpOutPath
     else:
       outFile = self.OUTPUT
-    optsD = self.get_conf()
     oset = fixOffset(outFile, self.OUTPUT_oset)
     with open(outFile, 'rb+') as ofObj:
       ofObj.seek(oset, 0)
-      jm_write(ofObj, **optsD)
-    if self.TmpOutPath:
-      os.rename(self.TmpOutPath, self.OUTPUT)
+      self._mixInto(ofObj, outFile, oset)
+      self._syncOutput(ofObj)
+    self._digestFile(outFile, self._mixedEnd)
+    self._replaceOutput()
   # *** --------------------------------------------------------------------------------------------
   
   def insertBytes(self):
+    self._checkSeekableOutput()
+    if self.InsertInPlace:
+      return self._insertBytesInPlace()
     if not (self.BackupPath or self.TmpOutPath):
       msg = ''.join([
         '\'insertBytes\' Modify Method: Can not directly insert bytes to an existing file !\n',
         '''At least either separate Temporary Output File or Back Up the original version 
         of the Output File is required. At least one of the options: \'Use Temporary Output\'
         or \'Backup the Original [Output File]\' MUST be enabled / configured together with 
-        \'insertBytes\' Modify Method.'''
+        \'insertBytes\' Modify Method -- unless the in-place insertion is enabled.'''
         ])
       raise RuntimeError(msg)
-    if self.BackupPath:
-      shutil.copy2(self.OUTPUT, self.BackupPath)
+    self._openCheckpoint()
+    if self.BackupPath and not self._resumed:
+      with self._stats.phase('backup'):
+        copyFile(self.OUTPUT, self.BackupPath)
+      self._syncBackup()
     if self.TmpOutPath:
-      shutil.copy2(self.OUTPUT, self.TmpOutPath)
+      if not self._resumed:
+        with self._stats.phase('tmp_copy'):
+          copyFile(self.OUTPUT, self.TmpOutPath)
       outFile = self.TmpOutPath
       srcFile = self.OUTPUT
     else:
       outFile = self.OUTPUT
       srcFile = self.BackupPath
-    optsD = self.get_conf()
-    oset = fixOffset(outFile, self.OUTPUT_oset)
+    # The source file keeps the original size (the file written grows on a resumed run).
+    oset = fixOffset(srcFile, self.OUTPUT_oset)
+    outHash = self._stats.hashes.get('output')
     with open(outFile, 'rb+') as ofObj, open(srcFile, 'rb') as srcObj:
       ofObj.seek(oset, 0)
       srcObj.seek(oset, 0)
-      jm_write(ofObj, **optsD)
-      for chunk in iter(lambda: srcObj.read(self.ChunkSize), ''):
-        ofObj.write(chunk)
+      self._mixInto(ofObj, outFile, oset)
+      with self._stats.phase('tail_copy'):
+        for chunk in iter(lambda: srcObj.read(self._chunkSizeUsed), b''):
+          ofObj.write(chunk)
+          if outHash:
+            outHash.update(chunk)
+      self._syncOutput(ofObj)
+    self._replaceOutput()
+  # *** --------------------------------------------------------------------------------------------
+  
+  def _insertBytesInPlace(self):
+    # Only the tail of the file is shifted, see openGap(). Working on the Output File directly
+    # the insertion is journaled; re-running the same insertion after a crash completes it.
+    if not self.NumOfBytes:
+      raise RuntimeError('In-place insertion requires Number of bytes to process to be given!')
+    self._openCheckpoint()
+    if self.BackupPath and not self._resumed:
+      with self._stats.phase('backup'):
+        copyFile(self.OUTPUT, self.BackupPath)
+      self._syncBackup()
+    if self.TmpOutPath:
+      if not self._resumed:
+        with self._stats.phase('tmp_copy'):
+          copyFile(self.OUTPUT, self.TmpOutPath)
+      outFile = self.TmpOutPath
+      journal = None
+    else:
+      outFile = self.OUTPUT
+      journal = insertJournal(genJournalPath(self.OUTPUT))
+    with open(outFile, 'rb+') as ofObj:
+      if self._resumed:
+        # The gap is open already.
+        oset = self._resumed['out_pos']
+      else:
+        with self._stats.phase('open_gap'):
+          oset = openGap(ofObj, self.OUTPUT_oset, self.NumOfBytes, journal)
+      ofObj.seek(oset, 0)
+      self._mixInto(ofObj, outFile, oset)
+      if journal:
+        ofObj.flush()
+        os.fsync(ofObj.fileno())
+      else:
+        self._syncOutput(ofObj)
+    self._digestFile(outFile, self._mixedEnd)
+    if journal:
+      journal.remove()
+    self._replaceOutput()
+  
+  def _mixInto(self, ofObj, outFile, outPos):
+    # jm_write() the mixed bytes to outFile (ofObj) at outPos, where ofObj is positioned already.
+    # The bytes of outFile before them are fed to the Output File digest first. If the run is 
+    # checkpointed, the checkpoint is committed every self.Checkpoint chunks, and a resumed run 
+    # continues from the committed position (see _openCheckpoint()).
+    optsD = self.get_conf()
+    state = self._resumed
+    if state:
+      outPos = state['out_pos']
+    committed = state['committed'] if state else 0
+    self._mixedStart = outPos
+    self._digestFile(outFile, 0, outPos + committed)
+    if self._ckpt is None:
+      with self._pageCache(ofObj) as ofObj, self._periodicSync(ofObj) as ofObj:
+        self._chunkSizeUsed = jm_write(ofObj, Stats=self._stats, **optsD)
+    else:
+      if not state:
+        inputs = [[path, fixOffset(path, oset), fileSize(path)] for path, oset, bwNot in getInputs(optsD)]
+        state = {'config': self._configHash(), 'tmp': self.TmpOutPath, 'bcp': self.BackupPath, 
+                 'out_pos': outPos, 'committed': 0, 'inputs': inputs, 
+                 'offsets': [start for path, start, size in inputs], 
+                 'ledgers': [[ldg.path, ldg.reservation, ranges] for ldg, ranges in self._ledgers]}
+        self._ckpt.save(state)
+      ofObj.seek(outPos + committed, 0)
+      with self._pageCache(ofObj) as pcObj:
+        writer = checkpointWriter(pcObj, self._ckpt, state, 
+                                  self.Checkpoint or defaultCheckpointChunks)
+        if committed < self.NumOfBytes:
+          self._chunkSizeUsed = jm_write(writer, Stats=self._stats, **shiftInputs(optsD, committed))
+        else:
+          self._chunkSizeUsed = fixedChunkSize(self.ChunkSize)
+        writer.commit()
+    self._mixedEnd = outPos + committed + self._stats.bytesWritten
+  
+  @contextlib.contextmanager
+  def _pageCache(self, ofObj):
+    # ofObj wrapped into pageCacheWriter if any of the page cache options is set (and OUTPUT 
+    # is a regular file): the wrapper is closed when the mixing is done.
+    if not (self.CacheHints or self.DirectIO or self.SyncEvery) or isStream(self.OUTPUT):
+      yield ofObj
+      return
+    writer = pageCacheWriter(ofObj, self.SyncEvery, self.CacheHints, self.DirectIO)
+    try:
+      yield writer
+    finally:
+      writer.close()
+  
+  @contextlib.contextmanager
+  def _periodicSync(self, ofObj):
+    # ofObj wrapped into fsyncWriter if Durability is 'periodic' (checkpointed runs are fsync-ed
+    # by checkpointWriter).
+    if self.Durability != 'periodic' or isStream(self.OUTPUT):
+      yield ofObj
+    else:
+      yield fsyncWriter(ofObj, self.FsyncEvery or defaultFsyncEvery)
+  
+  def _fsync(self, path, defer=False):
+    # fsync the file or directory at path unless Durability is 'none'; deferred to SyncGroup 
+    # (if any) if "defer" -- nothing later in the run relies on it being on disk.
+    if self.Durability == 'none':
+      return
+    if defer and self.SyncGroup is not None:
+      self.SyncGroup.add(path)
+      return
+    with self._stats.phase('fsync'):
+      fsyncPath(path)
+  
+  def _syncOutput(self, ofObj):
+    # The file written (ofObj) is made durable: at once if it is the Temporary Output (before 
+    # it is renamed, see _replaceOutput()), else it may be deferred to SyncGroup.
+    if self.Durability == 'none':
+      return
+    ofObj.flush()
+    if self.TmpOutPath or self.SyncGroup is None:
+      with self._stats.phase('fsync'):
+        os.fsync(ofObj.fileno())
+    else:
+      self.SyncGroup.add(ofObj.name)
+  
+  def _syncBackup(self):
+    # The Backup (and its name) must be on disk before the Output File is modified.
+    self._fsync(self.BackupPath)
+    self._fsync(_dirOf(self.BackupPath))
+  
+  def _replaceOutput(self):
+    # Rename the Temporary Output (fsync-ed, see _syncOutput()) to the Output File, and fsync the
+    # directory: the new name is durable then. The directory of the Output File written in place
+    # is fsync-ed as well (it may be created by the run). The directory fsync may be deferred.
     if self.TmpOutPath:
-      os.rename(self.TmpOutPath, self.OUTPUT)
+      with self._stats.phase('rename'):
+        os.rename(self.TmpOutPath, self.OUTPUT)
+    self._fsync(_dirOf(self.OUTPUT), defer=True)
+  
+  def _rollback(self):
+    # Undo the cancelled run (see runCancelled) as far as its files allow: the Temporary Output 
+    # is removed (with the Backup, the Output File is intact then), or the Output File is restored
+    # from the Backup, or the appended bytes are cut off. Return the log lines.
+    msg = ''
+    if self._ckpt:
+      self._ckpt.remove()
+      self._ckpt = None
+    if isStream(self.OUTPUT):
+      return msg
+    if self.TmpOutPath and os.path.isfile(self.TmpOutPath):
+      os.remove(self.TmpOutPath)
+      msg += '* Temporary Output removed: ' + self.TmpOutPath + '\n'
+      if self.BackupPath and os.path.isfile(self.BackupPath):
+        os.remove(self.BackupPath)
+        msg += '* Backup removed: ' + self.BackupPath + '\n'
+    elif self.BackupPath and os.path.isfile(self.BackupPath):
+      if self.ModifyMethod == 'rewriteBytes' and self.RangeBackup:
+        restoreRangeBackup(self.BackupPath, self.OUTPUT)
+        os.remove(self.BackupPath)
+      else:
+        os.rename(self.BackupPath, self.OUTPUT)
+      if os.path.isfile(genJournalPath(self.OUTPUT)):
+        # Not to be redone on the restored file.
+        insertJournal(genJournalPath(self.OUTPUT)).remove()
+      msg += '* Output File restored from the Backup: ' + self.BackupPath + '\n'
+    elif self.ModifyMethod == 'appendBytes':
+      with open(self.OUTPUT, 'rb+') as fObj:
+        fObj.truncate(self._mixedStart)
+      msg += '* Appended bytes cut off the Output File\n'
+    else:
+      msg += '!!! Output File is left partially modified: neither Backup nor Temporary Output\n'
+    return msg
+  
+  def _checkLedger(self):
+    # Check the ranges of the pads (self.Ledger) the run is going to consume against their 
+    # ledgers. Return the list of (ledger, ranges) and the warnings of the pad reuse, if the 
+    # LedgerPolicy is 'warn'; raise RuntimeError if it is 'refuse'.
+    # The ranges are reserved in the ledgers at once (see padLedger.reserve()): settle or release
+    # them by _recordLedger(). A resumed run takes over the reservations of the interrupted one, 
+    # saved in its checkpoint: they are its own, not reused.
+    ledgers, fresh, warnings, pads = [], [], [], []
+    offsets = dict((_pathKey(path), oset) for path, oset, bwNot in getInputs(self.get_conf()))
+    for path in self.Ledger:
+      if _pathKey(path) not in offsets:
+        raise ValueError('Pad %r of the ledger is not an Input File of the run!' % path)
+      if isStream(path) or not self.NumOfBytes:
+        raise ValueError('Pad %r: the ledger needs a seekable file and Number of bytes!' % path)
+      size = fileSize(path)
+      if self.NumOfBytes > size:
+        warnings.append('Pad %r: %d bytes are to be read from %d bytes long file!' % 
+                        (path, self.NumOfBytes, size))
+      pads.append((path, padRanges(size, fixOffset(path, offsets[_pathKey(path)]), self.NumOfBytes)))
+    resumed = {}
+    if self.Resume and pads and not isStream(self.OUTPUT):
+      state = self._resumableState()
+      for ldgPath, reservation, ranges in (state or {}).get('ledgers', []):
+        resumed[ldgPath] = reservation
+    reuse = self.LedgerPolicy == 'warn'
+    t = datetime.datetime.now()
+    try:
+      for path, ranges in pads:
+        if warnings and not reuse:
+          break
+        ldg = padLedger(genLedgerPath(_pathKey(path)))
+        if ldg.path in resumed and ldg.adopt(resumed[ldg.path]):
+          ledgers.append((ldg, ranges))
+          continue
+        reused = ldg.reserve(ranges, reuse, output=self.OUTPUT, method=self.ModifyMethod, 
+                             time=t.strftime(logMsgDateTimeFormat))
+        if reused:
+          warnings.append('Pad %r: bytes %s are used already!' % 
+                          (path, ', '.join('[%d, %d)' % r for r in reused)))
+        if ldg.reservation:
+          ledgers.append((ldg, ranges))
+          fresh.append((ldg, ranges))
+      if warnings and not reuse:
+        raise RuntimeError('Pad reuse refused:\n' + '\n'.join(warnings))
+    except:
+      # The reservations taken over stay pending for the next --resume.
+      self._recordLedger(fresh, False, False)
+      raise
+    return ledgers, warnings
+  
+  def _recordLedger(self, ledgers, ok, used=True):
+    # Settle the reservations of the pad ranges (see _checkLedger()): consumed by the run 
+    # if "used", else released.
+    t = datetime.datetime.now()
+    for ldg, ranges in ledgers:
+      if used:
+        ldg.settle(ok=ok, time=t.strftime(logMsgDateTimeFormat))
+      else:
+        ldg.release()
+  
+  def _configHash(self):
+    # Hash of everything the bytes written depend on: a checkpoint is resumed only by the same run.
+    inputs = [(path, int(oset), bool(bwNot), os.path.getsize(path), int(os.path.getmtime(path)))
+              for path, oset, bwNot in getInputs(self.get_conf())]
+    conf = [inputs, self.OUTPUT, int(self.OUTPUT_oset), self.NumOfBytes, self.ModifyMethod, 
+            bool(self.InsertInPlace), bool(self.RangeBackup), bool(self.TmpOutPath), 
+            bool(self.BackupPath)]
+    return hashlib.sha256(json.dumps(conf).encode('utf-8')).hexdigest()
+  
+  def _resumableState(self):
+    # The state saved in the checkpoint of the interrupted run (None if there is none); raise 
+    # RuntimeError if the checkpoint was made by another run.
+    ckpt = runCheckpoint(genCheckpointPath(self.OUTPUT))
+    state = ckpt.load()
+    if state and state['config'] != self._configHash():
+      raise RuntimeError('Checkpoint ' + repr(ckpt.path) + ' was made by another run ' + 
+                         '(or the Input Files have changed since)!')
+    return state
+  
+  def _openCheckpoint(self):
+    # Set up the checkpoint of the run (if enabled): self._ckpt; and self._resumed -- the state 
+    # to continue from, if resuming, whose Temporary Output and Backup paths are taken over.
+    self._ckpt = self._resumed = None
+    if not (self.Checkpoint or self.Resume):
+      return
+    if isStream(self.INPUT1) or isStream(self.OUTPUT):
+      raise RuntimeError('A run on streams can neither be checkpointed nor resumed!')
+    self._ckpt = runCheckpoint(genCheckpointPath(self.OUTPUT))
+    state = self._resumableState() if self.Resume else None
+    if state:
+      self._resumed = state
+      self.TmpOutPath = state['tmp']
+      self.BackupPath = state['bcp']
+      self._stats.resumedFrom = state['committed']
+  
+  def _writeStream(self):
+    # 'overwriteFile' / 'appendBytes' to stdout ('-') or a FIFO: the bytes are just written out.
+    if self.BackupPath or self.TmpOutPath:
+      raise RuntimeError('Output stream %r can neither be backed up nor replaced with Temporary Output!' 
+                         % self.OUTPUT)
+    optsD = self.get_conf()
+    if self.OUTPUT == stdStream:
+      ofObj = _stdBinary(sys.stdout)
+      self._chunkSizeUsed = jm_write(ofObj, Stats=self._stats, **optsD)
+      ofObj.flush()
+    else:
+      with open(self.OUTPUT, 'wb') as ofObj:
+        self._chunkSizeUsed = jm_write(ofObj, Stats=self._stats, **optsD)
+  
+  def _digestFile(self, path, start, end=None):
+    # Feed the bytes [start, end) of the file (up to its end if end is None) -- the ones the run
+    # leaves as they are -- to the digest of the resulting Output File, if it is requested.
+    outHash = self._stats.hashes.get('output')
+    if outHash is None:
+      return
+    with self._stats.phase('digest'):
+      with open(path, 'rb') as fObj:
+        fObj.seek(start, 0)
+        bLeft = None if end is None else end - start
+        while bLeft is None or bLeft > 0:
+          data = fObj.read(defaultShiftBlockSize if bLeft is None else min(bLeft, defaultShiftBlockSize))
+          if not data:
+            break
+          outHash.update(data)
+          if bLeft is not None:
+            bLeft -= len(data)
+  
+  def openMixed(self, blockSize=65536, cacheBlocks=16):
+    ''' mf = fw_obj.openMixed() -- the mixed bytes of this configuration as mixedFile object. '''
+    return mixedFile(blockSize, cacheBlocks, **self.get_conf())
+  
+  def _checkSeekableOutput(self):
+    if isStream(self.OUTPUT):
+      raise RuntimeError('\'' + self.ModifyMethod + '\' Modify Method: Output File ' + 
+                         repr(self.OUTPUT) + ' is a stream, it can not be modified in place!')
   # <--- Consider preservation of Output File attributes, at least MODIFICATION / Access timestamps !!! 
   # *** ============================================================================================
   
   def run(self):
+    '''
+    logMsg, execFlag = fw_obj.run()
+    Run the configured Modify Method. The statistics of the run (dict, see runStats.as_dict(); 
+    plus 'method', 'ok', 'num_bytes', 'chunk_size' and the 'total' time in 'seconds') are left 
+    in fw_obj.stats and exported to StatsPath, if set.
+    If the run is cancelled (CancelEvent set, see runCancelled) it is rolled back as far as its 
+    files allow (see _rollback()), and execFlag is False.
+    '''
     # <--------------------------- DIRTY !!! To be fixed !!! <------------------ !!! !!! !!! <-------- !!!
     t = datetime.datetime.now()
     logMsg = t.strftime(logMsgDateTimeFormat) + '\n' + str(self) + '\n'
+    self._stats = runStats(self.ProgressCallback, self.NumOfBytes, self.Digest, self.CancelEvent)
+    if self.Digest and self.DigestOutput:
+      self._stats.hashes['output'] = self._stats.newHash()
+    self._ckpt = self._resumed = None
+    t0 = default_timer()
+    execFlag = False
+    self._ledgers = []
     try:
+      self._ledgers, warnings = self._checkLedger()
+      for warning in warnings:
+        logMsg += '!!! ' + warning + '\n'
       self._modifyMethods[self.ModifyMethod]()
+      if self._ckpt:
+        self._ckpt.remove()
+    except runCancelled as e:
+      logMsg += '!!! Operation CANCELLED !!! ' + str(e) + '\n'
+      try:
+        logMsg += self._rollback()
+      except Exception:
+        logMsg += '!!! Can not roll the run back !!!\n' + traceback.format_exc()
+      execFlag = False
     except:
       tbStr = traceback.format_exc()  # <------------------------------------------ Check THAT !!! <---- !!!
       logMsg += '!!! Operation FAILED !!!\n' + tbStr
       execFlag = False #'fail'
     else:
+      if self.ChunkSize == autoChunkSize:
+        logMsg += '* Chunk Size chosen: ' + str(self._chunkSizeUsed) + '\n'
+      if self._resumed:
+        logMsg += '* Resumed from the checkpoint at byte ' + str(self._stats.resumedFrom) + '\n'
       logMsg += '* Operation Completed Successfully!\n'
       execFlag = True #'ok'
     finally:
+      # The pad bytes are used up once any mixed bytes may be out (the whole ranges reserved), 
+      # unless the run is to be resumed: its checkpoint keeps the reservations pending for that.
+      if self._ledgers and not execFlag and self._ckpt and os.path.isfile(self._ckpt.path):
+        logMsg += '* The pad ranges stay reserved for --resume\n'
+      elif self._ledgers:
+        try:
+          self._recordLedger(self._ledgers, execFlag, execFlag or self._stats.writing)
+        except (IOError, OSError) as e:
+          logMsg += '!!! Can not update the pad usage ledger: ' + str(e) + '\n'
+      self._stats.addTime('total', default_timer() - t0)
+      self.stats = self._stats.as_dict()
+      self.stats.update({'method': self.ModifyMethod, 'ok': execFlag, 'num_bytes': self.NumOfBytes,
+                         'chunk_size': self._chunkSizeUsed})
+      if self.StatsPath:
+        try:
+          writeStats(self.stats, self.StatsPath)
+        except (IOError, OSError) as e:
+          logMsg += '!!! Can not export the statistics: ' + str(e) + '\n'
+      if execFlag and self.Digest:
+        for name in sorted(self.stats['digests']):
+          logMsg += '* ' + self.Digest + ' of the ' + name + ' bytes: ' + self.stats['digests'][name] + '\n'
+        for inp in self.stats['inputs']:
+          logMsg += '* ' + self.Digest + ' of the bytes read from ' + inp['path'] + ': ' + str(inp['digest']) + '\n'
       logMsg += '='*100 + '\n'
     # ------------------------------------------------------------------------ # <-------------------- !!!
     # self.GUIobj.setupFinish(logMsg, execFlag) # There to find target in old version of GUI <-------- !!!
@@ -388,7 +3352,10 @@ class jmFU:
     ''' String representation of an object of this class. '''
     s = '*** ' + '-'*50 + ' ***\n'
     s += ' * Input file #1 : ' + str(self.INPUT1) + '\n'
-    s += 'Offset (raw/fixed): ' + str(self.INPUT1_oset) + ' bytes / ' + str(fixOffset(self.INPUT1, self.INPUT1_oset)) + ' bytes\n'
+    if isStream(self.INPUT1):
+      s += 'Stream, bytes to skip: ' + str(self.INPUT1_oset) + '\n'
+    else:
+      s += 'Offset (raw/fixed): ' + str(self.INPUT1_oset) + ' bytes / ' + str(fixOffset(self.INPUT1, self.INPUT1_oset)) + ' bytes\n'
     if self.INPUT1_bwNot:
       s += 'Apply bitwise NOT\n'
     s += '-'*25 + '\n'
@@ -400,19 +3367,773 @@ class jmFU:
         s += 'Apply bitwise NOT\n'
       s += '-'*25 + '\n'
     # -------------------------
+    for i, (path, oset, bwNot) in enumerate(self.INPUTS):
+      s += ' * Input file #' + str(i + 3) + ' : ' + str(path) + '\n'
+      s += 'Offset (raw/fixed): ' + str(oset) + ' bytes / ' + str(fixOffset(path, oset)) + ' bytes\n'
+      if bwNot:
+        s += 'Apply bitwise NOT\n'
+      s += '-'*25 + '\n'
+    # -------------------------
     s += ' * Modify Method: ' + self.ModifyMethod + '\n'
     s += 'Number of bytes to process: ' + str(self.NumOfBytes) + '\n'
     s += 'Chunk Size for file input/output: ' + str(self.ChunkSize) + '\n'
+    if self.ChunkSize == autoChunkSize:
+      s += 'The largest Chunk Size to try: ' + str(self.AutoChunkLimit) + '\n'
+    if self.UseMmap:
+      s += 'Read Input File(s) through memory mapping\n'
+    s += 'Memory budget for tiling short Input File(s): ' + str(self.TileBudget) + '\n'
+    if self.CacheHints:
+      s += 'Give page cache hints (read-ahead / drop-behind)\n'
+    if self.DirectIO:
+      s += 'Write the Output File with O_DIRECT\n'
+    if self.SyncEvery:
+      s += 'Start the writeback of the Output File every: ' + str(self.SyncEvery) + ' bytes\n'
+    if self.CacheHints or self.DirectIO or self.SyncEvery:
+      s += 'Page cache control: neither the kernel-side copy nor parallel jobs are used\n'
+    if self.Durability != 'none':
+      s += 'Durability of the Output File: ' + self.Durability + '\n'
+    if self.Durability == 'periodic':
+      s += 'fsync the Output File every: ' + str(self.FsyncEvery or defaultFsyncEvery) + ' bytes\n'
+    if self.Jobs > 1:
+      s += 'Number of parallel jobs: ' + str(self.Jobs) + '\n'
+    if self.PipelineDepth > 1:
+      s += 'Read / mix / write pipeline ring depth: ' + str(self.PipelineDepth) + '\n'
     s += '-'*25 + '\n'
     # -------------------------
     s += ' * Output file : ' + str(self.OUTPUT) + '\n'
-    if self.ModifyMethod in ['rewriteBytes', 'insertBytes']:
+    if self.ModifyMethod in ['rewriteBytes', 'insertBytes'] and not isStream(self.OUTPUT):
       s += 'Offset (raw/fixed): ' + str(self.OUTPUT_oset) + ' bytes / ' + str(fixOffset(self.OUTPUT, self.OUTPUT_oset)) + ' bytes\n'
     s += 'Path to Temporary Output: ' + str(self.TmpOutPath) + '\n'
     s += 'Path to Backup: ' + str(self.BackupPath) + '\n'
+    if self.ModifyMethod == 'rewriteBytes' and self.BackupPath and self.RangeBackup:
+      s += 'Back up only the bytes to be overwritten\n'
+    if self.ModifyMethod == 'insertBytes' and self.InsertInPlace:
+      s += 'Insert bytes in place (shift the tail of the file)\n'
+    if self.StatsPath:
+      s += 'Export the statistics to: ' + str(self.StatsPath) + '\n'
+    if self.Checkpoint or self.Resume:
+      s += 'Checkpoint every ' + str(self.Checkpoint or defaultCheckpointChunks) + ' chunks to: ' + \
+           genCheckpointPath(str(self.OUTPUT)) + '\n'
+    if self.Resume:
+      s += 'Resume the interrupted run from its checkpoint\n'
+    for path in self.Ledger:
+      s += 'Pad usage ledger (' + self.LedgerPolicy + ' reuse): ' + genLedgerPath(path) + '\n'
+    if self.Digest:
+      s += 'Digest algorithm: ' + str(self.Digest) + '\n'
+      if self.DigestOutput:
+        s += 'Compute the digest of the resulting Output File\n'
     s += '*** ' + '-'*50 + ' ***\n'
     return s
   
+# *** ==============================================================================================
+# Fan-out: several targets from one read pass over the Input Files.
+# *** ==============================================================================================
+
+# The keys of the configuration the targets must share: they define the bytes read and mixed.
+fanOutShared = ('INPUT1', 'INPUT1_oset', 'INPUT1_bwNot', 'INPUT2', 'INPUT2_oset', 'INPUT2_bwNot', 
+                'INPUTS', 'NumOfBytes', 'ChunkSize', 'AutoChunkLimit', 'UseMmap', 'TileBudget')
+defaultFanOutDepth = 4
+
+def fanOutTargets(kwopts):
+  '''
+  confs = fanOutTargets(kwopts)
+  Complete the configurations of the fan-out targets: kwopts (jmFU.config() keyword arguments 
+  as for runJob()) with the TARGETS key -- list of dicts overriding them per target (OUTPUT, 
+  OUTPUT_oset, ModifyMethod, BackupPath, TmpOutPath, ...), and bwNot -- whether to apply 
+  Bitwise NOT to the mixed bytes for the target. If kwopts has OUTPUT, it is the first target. 
+  Return the list of (conf, bwNot) pairs, conf -- the prepared configuration of the target 
+  (see prepareConfig()).
+  Raise ValueError if a target overrides a shared key (see fanOutShared), the targets write 
+  to the same files, or the checkpoints are requested.
+  '''
+  base = dict(kwopts)
+  targets = list(base.pop('TARGETS', None) or [])
+  if base.get('OUTPUT'):
+    targets.insert(0, {})
+  if not targets:
+    raise ValueError('No targets to fan out to!')
+  confs = []
+  written = set()
+  for target in targets:
+    shared = [key for key in fanOutShared if key in target]
+    if shared:
+      raise ValueError('The targets must share: ' + ', '.join(shared))
+    conf = dict(base)
+    conf.update(target)
+    bwNot = bool(conf.pop('bwNot', False))
+    if conf.get('Checkpoint') or conf.get('Resume'):
+      raise ValueError('Fan-out targets can neither be checkpointed nor resumed!')
+    prepareConfig(conf)
+    for key in ('OUTPUT', 'TmpOutPath', 'BackupPath'):
+      if not conf.get(key):
+        continue
+      if _fileId(conf[key]) in written:
+        raise ValueError('The targets must write to DIFFERENT files: ' + repr(conf[key]))
+      written.add(_fileId(conf[key]))
+    confs.append((conf, bwNot))
+  return confs
+# *** ----------------------------------------------------------------------------------------------
+
+def runFanOut(kwopts, depth=defaultFanOutDepth):
+  '''
+  report = runFanOut(kwopts, depth=4)
+  Fan-out job: read and mix the Input Files once (see mixChunks()) and write the mixed bytes 
+  to all the targets (see fanOutTargets()) at the same time, each one by its own jmFU run in 
+  a thread, fed through a chunkSource of "depth" chunks. Bitwise NOT of a chunk is computed 
+  once for all the targets needing it, so the input I/O and the mixing do not depend on the 
+  number of targets. A target failing does not stop the others. The pad usage ledgers (see 
+  jmFU.Ledger) are checked and updated once for the read pass, not per target.
+  Return the report as runJob() does ('stats' -- of the read pass, the per-input statistics 
+  and digests), with 'targets' -- the list of the reports of the targets ('ok', 'log', 'stats').
+  '''
+  t0 = default_timer()
+  try:
+    confs = fanOutTargets(kwopts)
+    lead = jmFU(**confs[0][0])
+    ledgers, warnings = lead._checkLedger()
+  except Exception:
+    logMsg = '!!! Operation FAILED !!!\n' + traceback.format_exc() + '='*100 + '\n'
+    return {'ok': False, 'log': logMsg, 'seconds': default_timer() - t0, 'stats': None, 
+            'targets': []}
+  # The Input Files are mixed without Bitwise NOT: its parity is applied per target.
+  shared = lead.get_conf()
+  bwNot = False
+  for path, oset, inNot in getInputs(shared):
+    bwNot ^= bool(inNot)
+  shared.update({'INPUT1_bwNot': False, 'INPUT2_bwNot': False, 'Source': None,
+                 'INPUTS': [(path, oset, False) for path, oset, inNot in shared.get('INPUTS') or []]})
+  stats = runStats(None, shared['NumOfBytes'], shared.get('Digest'))
+  sources, fw_objs, reports = [], [], [None] * len(confs)
+  for conf, targetNot in confs:
+    sources.append(chunkSource(depth))
+    fw_objs.append(jmFU(**dict(conf, Source=sources[-1], Ledger=[])))
+  
+  def runTarget(i):
+    stats = None
+    try:
+      logMsg, execFlag = fw_objs[i].run()
+      stats = fw_objs[i].stats
+    except Exception:
+      logMsg = '!!! Operation FAILED !!!\n' + traceback.format_exc() + '='*100 + '\n'
+      execFlag = False
+    finally:
+      sources[i].close()
+    reports[i] = {'ok': execFlag, 'log': logMsg, 'stats': stats}
+  
+  threads = [threading.Thread(target=runTarget, args=(i,)) for i in range(len(confs))]
+  for t in threads:
+    t.daemon = True
+    t.start()
+  error = None
+  logMsg = ''.join('!!! ' + warning + '\n' for warning in warnings)
+  try:
+    with stats.phase('total'):
+      for chunk in mixChunks(Stats=stats, **shared):
+        inverted = None
+        for (conf, targetNot), src in zip(confs, sources):
+          if bwNot ^ targetNot:
+            if inverted is None:
+              inverted = bytearray(chunk)
+              mixEngine.notInto(inverted, len(inverted))
+            src.put(inverted)
+          else:
+            src.put(chunk)
+        stats.chunk(len(chunk))
+        if all(src.closed for src in sources):
+          break
+  except Exception as e:
+    error = e
+    logMsg = '!!! Reading the Input Files FAILED !!!\n' + traceback.format_exc()
+  finally:
+    for src in sources:
+      src.end(error)
+    for t in threads:
+      t.join()
+  ok = error is None and all(report['ok'] for report in reports)
+  if ledgers:
+    # The pad bytes may be out once a chunk is handed over to the targets.
+    try:
+      lead._recordLedger(ledgers, ok, ok or stats.bytesWritten > 0)
+    except (IOError, OSError) as e:
+      logMsg += '!!! Can not update the pad usage ledger: ' + str(e) + '\n'
+  logMsg = ''.join(report['log'] for report in reports) + logMsg
+  return {'ok': ok, 'log': logMsg, 'seconds': default_timer() - t0, 'stats': stats.as_dict(), 
+          'targets': reports}
+
+# *** ==============================================================================================
+# Batch mode: many jmFU runs in one process.
+# *** ==============================================================================================
+
+def readManifest(path):
+  '''
+  jobs = readManifest(path)
+  Read the JSON-lines manifest ('-' -- from stdin): every non-empty line is a dict of jmFU.config() 
+  keyword arguments (as main() passes them; see prepareConfig()), a fan-out job has the TARGETS 
+  key as well (see fanOutTargets()). Return the list of the dicts.
+  A malformed line does not stop the batch: it gets the dict with the ManifestError key only 
+  (the error message), reported as a failed job by runJob().
+  '''
+  fObj = sys.stdin if path == '-' else open(path, 'r')
+  try:
+    jobs = []
+    for num, line in enumerate(fObj, 1):
+      if not line.strip():
+        continue
+      try:
+        job = json.loads(line)
+        if not isinstance(job, dict):
+          raise ValueError('a JSON object of jmFU.config() keyword arguments is expected')
+      except ValueError as e:
+        job = {'ManifestError': 'line %d of the manifest: %s' % (num, e)}
+      jobs.append(job)
+    return jobs
+  finally:
+    if fObj is not sys.stdin:
+      fObj.close()
+# *** ----------------------------------------------------------------------------------------------
+
+def _jobFiles(kw, keys):
+  '''
+  The files of the job (and of its fan-out targets, if any) given by the keys, as _pathKey()s. 
+  The '__AUTO__' paths are left out: they are named after the Output File.
+  '''
+  paths = [kw.get(key) for key in keys]
+  for target in kw.get('TARGETS') or []:
+    paths += [target.get(key) for key in keys]
+  return [_pathKey(path) for path in paths if path and path != '__AUTO__']
+
+def _batchChains(jobs):
+  '''
+  chains = _batchChains(jobs)
+  Group the jobs into chains of dependent ones: jobs sharing any file written by some of them
+  (Output, Temporary Output or Backup file, pad usage ledger) get into the same chain, in the 
+  manifest order. 
+  Different chains are independent and may run at the same time.
+  '''
+  parent = list(range(len(jobs)))
+  def root(i):
+    while parent[i] != i:
+      parent[i] = parent[parent[i]]
+      i = parent[i]
+    return i
+  written = set()
+  for kw in jobs:
+    written.update(_jobFiles(kw, ('OUTPUT', 'TmpOutPath', 'BackupPath')))
+    written.update(genLedgerPath(_pathKey(path)) for path in kw.get('Ledger') or [])
+  users = {}
+  for i, kw in enumerate(jobs):
+    paths = _jobFiles(kw, ('INPUT1', 'INPUT2', 'OUTPUT', 'TmpOutPath', 'BackupPath'))
+    paths += [_pathKey(inp[0]) for inp in kw.get('INPUTS') or []]
+    paths += [genLedgerPath(_pathKey(path)) for path in kw.get('Ledger') or []]
+    for path in set(p for p in paths if p in written):
+      if path in users:
+        parent[root(i)] = root(users[path])
+      else:
+        users[path] = i
+  chains = {}
+  for i in range(len(jobs)):
+    chains.setdefault(root(i), []).append(i)
+  return sorted(chains.values())
+# *** ----------------------------------------------------------------------------------------------
+
+def runJob(kwopts):
+  '''
+  report = runJob(kwopts)
+  Run one job of a batch: complete the configuration by prepareConfig(), then run jmFU. Return 
+  the report dict: 'ok' -- execFlag of jmFU.run() (False also if the configuration is wrong), 
+  'log' -- its log message, 'seconds' -- the wall time of the job, 'stats' -- jmFU.stats 
+  (None if the configuration is wrong). A job with TARGETS is run by runFanOut(); the one with
+  ManifestError (see readManifest()) is not run, only reported as failed.
+  '''
+  if 'ManifestError' in kwopts:
+    return {'ok': False, 'log': '!!! Wrong job request: ' + kwopts['ManifestError'] + '\n', 
+            'seconds': 0.0, 'stats': None}
+  if kwopts.get('TARGETS'):
+    return runFanOut(kwopts)
+  t0 = default_timer()
+  stats = None
+  try:
+    fw_obj = jmFU(**prepareConfig(dict(kwopts)))
+    logMsg, execFlag = fw_obj.run()
+    stats = fw_obj.stats
+  except Exception:
+    logMsg = '!!! Operation FAILED !!!\n' + traceback.format_exc() + '='*100 + '\n'
+    execFlag = False
+  return {'ok': execFlag, 'log': logMsg, 'seconds': default_timer() - t0, 'stats': stats}
+# *** ----------------------------------------------------------------------------------------------
+
+def _commitJobs(tickets, jobs, reports):
+  # Commit the fsyncs deferred by the jobs to their fsyncGroup tickets: if it fails, the reports 
+  # of the jobs asking for durability (or of their fan-out targets) turn failed.
+  for ticket, job, report in zip(tickets, jobs, reports):
+    try:
+      ticket.commit()
+    except OSError as e:
+      levels = [job.get('Durability')] + [target.get('Durability') 
+                                          for target in job.get('TARGETS') or []]
+      if any(level not in (None, 'none') for level in levels) and report['ok']:
+        report['ok'] = False
+        report['log'] += '!!! Can not fsync the files written: ' + str(e) + '\n'
+# *** ----------------------------------------------------------------------------------------------
+
+def runBatch(jobs, workers=1, groupSync=True):
+  '''
+  reports = runBatch(jobs, workers=1, groupSync=True)
+  Run the jobs (list of jmFU.config() kwargs dicts, see readManifest()) in this process: 
+  chains of dependent jobs (see _batchChains()) run on a pool of "workers" threads, all the jobs 
+  share one inputFileCache. Return the list of per-job reports (see runJob()) in the jobs order, 
+  each one with the 'job' key -- the index of the job.
+  groupSync -- the jobs with Durability defer the fsyncs they can to one fsyncGroup, committed 
+  once all the jobs are done (before the reports are returned).
+  '''
+  global _inputCache
+  written = [path for kw in jobs for path in _jobFiles(kw, ('OUTPUT', 'TmpOutPath', 'BackupPath'))]
+  _inputCache = inputFileCache(written)
+  group = fsyncGroup() if groupSync else None
+  tickets = [group.ticket() if group else None for kw in jobs]
+  reports = [None] * len(jobs)
+  def runChain(chain):
+    for i in chain:
+      reports[i] = runJob(dict(jobs[i], SyncGroup=tickets[i]))
+      reports[i]['job'] = i
+  pool = ThreadPool(workers)
+  try:
+    pool.map(runChain, _batchChains(jobs))
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+    _inputCache.close()
+    _inputCache = None
+  if group is not None:
+    _commitJobs(tickets, jobs, reports)
+  return reports
+
+# *** ==============================================================================================
+# asyncio API: jmFU jobs as awaitable futures run by a bounded pool of threads shared by them all.
+# *** ==============================================================================================
+
+_asyncPool = None
+_asyncJobs = defaultAsyncJobs
+_asyncPoolLock = threading.Lock()
+
+def _importAsyncio():
+  ''' Import asyncio (and concurrent.futures) on first use: return the module, or None if missing. '''
+  global asyncio, concurrent
+  if asyncio is None:
+    try:
+      import asyncio
+      import concurrent.futures
+    except ImportError:
+      asyncio = None
+  return asyncio
+# *** ----------------------------------------------------------------------------------------------
+
+def setAsyncJobs(jobs):
+  '''
+  setAsyncJobs(jobs)
+  Set the global limit of the jobs started by mixAsync() running at the same time (defaultAsyncJobs
+  if not set): the size of the pool of threads they share, the jobs over the limit wait in its 
+  queue. The jobs started (or queued) before are finished by the previous pool.
+  '''
+  global _asyncPool, _asyncJobs
+  with _asyncPoolLock:
+    if _asyncPool is not None:
+      _asyncPool.shutdown(wait=False)
+      _asyncPool = None
+    _asyncJobs = jobs
+# *** ----------------------------------------------------------------------------------------------
+
+def _asyncExecutor():
+  global _asyncPool
+  with _asyncPoolLock:
+    if _asyncPool is None:
+      _asyncPool = concurrent.futures.ThreadPoolExecutor(_asyncJobs)
+    return _asyncPool
+# *** ----------------------------------------------------------------------------------------------
+
+def mixAsync(progress=None, loop=None, **kwopts):
+  '''
+  future = mixAsync(progress=None, loop=None, **kwopts)
+  asyncio entry point: run the job (jmFU.config() keyword arguments as for runJob(); with TARGETS
+  -- a fan-out job) by the shared bounded pool of threads (see setAsyncJobs()), not blocking 
+  the event loop ("loop", the current one by default). Return the asyncio Future of the report
+  of the job (see runJob()): report = await mixAsync(...)
+  progress -- optional callable progress(done, total) called in the event loop as the chunks are 
+  written (see runStats): at most once per asyncProgressInterval seconds, and once more with 
+  the last counts when the job ends.
+  Cancelling the future (or the task awaiting it) cancels the job: a queued one does not start, 
+  a running one stops at the next chunk boundary and its files are rolled back (see jmFU.run());
+  its pool thread is released once the rollback is done.
+  '''
+  if _importAsyncio() is None:
+    raise RuntimeError('asyncio is not available!')
+  loop = loop or asyncio.get_event_loop()
+  cancel = threading.Event()
+  kwopts = dict(kwopts, CancelEvent=cancel)
+  job = runJob
+  if progress is not None:
+    # Every update posted is a wake-up of the event loop: not one per chunk.
+    last = {'counts': None, 'posted': None, 'time': None}
+    def post(counts):
+      last['posted'] = counts
+      try:
+        loop.call_soon_threadsafe(progress, *counts)
+      except RuntimeError:
+        # The event loop is closed: nobody to report to.
+        pass
+    def onProgress(done, total):
+      last['counts'] = (done, total)
+      t = default_timer()
+      if last['time'] is None or t - last['time'] >= asyncProgressInterval or (total and done >= total):
+        last['time'] = t
+        post(last['counts'])
+    def job(kwopts):
+      try:
+        return runJob(kwopts)
+      finally:
+        if last['counts'] != last['posted']:
+          post(last['counts'])
+    kwopts['ProgressCallback'] = onProgress
+  future = loop.run_in_executor(_asyncExecutor(), job, kwopts)
+  def onDone(f):
+    if f.cancelled():
+      cancel.set()
+  future.add_done_callback(onDone)
+  return future
+
+# *** ==============================================================================================
+# Daemon mode: the jobs served over a Unix socket by one long-running process.
+# *** ==============================================================================================
+
+def serveDaemon(socketPath, workers=1, stop=None):
+  '''
+  serveDaemon(socketPath, workers=1, stop=None)
+  Run the jmFU daemon: listen on the Unix socket socketPath (accessible by the owner only) and run 
+  the jobs received -- JSON lines of jmFU.config() keyword arguments, as in the batch manifest 
+  (see readManifest()) -- on a pool of "workers" threads. Every job is replied with the JSON line 
+  of its report (see runJob(), with 'job' -- its number within the connection). The jobs of one
+  connection run one by one, in order; the connections are served at the same time. All the jobs
+  share an inputFileCache validated against the files' stat; the files written by the jobs are 
+  never cached. Serve until interrupted (SIGINT, SIGTERM), or until the threading.Event stop 
+  is set, then remove the socket.
+  The jobs with Durability defer the fsyncs they can to one fsyncGroup, committed before their
+  reports are sent: the commits of the jobs finished at the same time are done at once.
+  '''
+  global _inputCache
+  if os.path.exists(socketPath):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      probe.connect(socketPath)
+    except socket.error:
+      # Left by a daemon that is gone.
+      os.remove(socketPath)
+    else:
+      raise RuntimeError('The daemon is running on ' + repr(socketPath) + ' already!')
+    finally:
+      probe.close()
+  listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  umask = os.umask(0o077)
+  try:
+    listener.bind(socketPath)
+  finally:
+    os.umask(umask)
+  listener.listen(64)
+  listener.settimeout(0.5)
+  if threading.current_thread().name == 'MainThread':
+    def onSignal(signum, frame):
+      raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, onSignal)
+  _inputCache = inputFileCache(validate=True)
+  group = fsyncGroup()
+  pool = ThreadPool(workers)
+  
+  def serveConnection(conn):
+    try:
+      rObj = conn.makefile('rb')
+      num = 0
+      for line in rObj:
+        if not line.strip():
+          continue
+        try:
+          job = json.loads(line.decode('utf-8'))
+          if not isinstance(job, dict):
+            raise ValueError('a JSON object of jmFU.config() keyword arguments is expected')
+          _inputCache.addVolatile(_jobFiles(job, ('OUTPUT', 'TmpOutPath', 'BackupPath')))
+        except Exception as e:
+          report = {'ok': False, 'log': '!!! Wrong job request: ' + str(e) + '\n'}
+        else:
+          try:
+            ticket = group.ticket()
+            report = pool.apply(runJob, (dict(job, SyncGroup=ticket),))
+            _commitJobs([ticket], [job], [report])
+          except Exception:
+            report = {'ok': False, 
+                      'log': '!!! Operation FAILED !!!\n' + traceback.format_exc() + '='*100 + '\n'}
+        report['job'] = num
+        num += 1
+        conn.sendall((json.dumps(report) + '\n').encode('utf-8'))
+    except socket.error:
+      # The client is gone.
+      pass
+    finally:
+      conn.close()
+  
+  try:
+    while stop is None or not stop.is_set():
+      try:
+        conn, addr = listener.accept()
+      except socket.timeout:
+        continue
+      conn.settimeout(None)
+      t = threading.Thread(target=serveConnection, args=(conn,))
+      t.daemon = True
+      t.start()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    listener.close()
+    if os.path.exists(socketPath):
+      os.remove(socketPath)
+    pool.close()
+    pool.join()
+    _inputCache.close()
+    _inputCache = None
+# *** ----------------------------------------------------------------------------------------------
+
+def _absJob(job):
+  # The job with the paths made absolute: the daemon does not share the working directory.
+  job = dict(job)
+  for key in ('INPUT1', 'INPUT2', 'OUTPUT', 'TmpOutPath', 'BackupPath', 'StatsPath'):
+    if job.get(key) == stdStream:
+      raise ValueError('The daemon can not take the streams: ' + key)
+    if job.get(key) and job[key] != '__AUTO__':
+      job[key] = os.path.abspath(job[key])
+  if job.get('INPUTS'):
+    job['INPUTS'] = [(os.path.abspath(path), oset, bwNot) for path, oset, bwNot in job['INPUTS']]
+  if job.get('Ledger'):
+    job['Ledger'] = [os.path.abspath(path) for path in job['Ledger']]
+  if job.get('TARGETS'):
+    job['TARGETS'] = [_absJob(target) for target in job['TARGETS']]
+  return job
+# *** ----------------------------------------------------------------------------------------------
+
+def daemonRequest(socketPath, jobs):
+  '''
+  reports = daemonRequest(socketPath, jobs)
+  Send the jobs (list of jmFU.config() kwargs dicts, the paths relative to the current directory)
+  to the daemon (see serveDaemon()) over one connection: they run one by one. Return the list 
+  of their reports in order.
+  '''
+  jobs = [_absJob(job) for job in jobs]
+  conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  conn.connect(socketPath)
+  errors = []
+  def sendJobs():
+    # In a thread: the replies are read while the jobs are still being sent.
+    try:
+      for job in jobs:
+        conn.sendall((json.dumps(job) + '\n').encode('utf-8'))
+      conn.shutdown(socket.SHUT_WR)
+    except socket.error as e:
+      errors.append(e)
+  sender = threading.Thread(target=sendJobs)
+  sender.daemon = True
+  sender.start()
+  try:
+    rObj = conn.makefile('rb')
+    reports = [json.loads(line.decode('utf-8')) for line in rObj if line.strip()]
+  finally:
+    sender.join()
+    conn.close()
+  if errors:
+    raise errors[0]
+  if len(reports) != len(jobs):
+    raise RuntimeError('The daemon replied to ' + str(len(reports)) + ' of ' + str(len(jobs)) + ' jobs!')
+  return reports
+
+# *** ==============================================================================================
+# Benchmark: every Modify Method over a grid of input shapes, Chunk Sizes and Backup / Temporary
+# Output settings, on synthetic files.
+# *** ==============================================================================================
+
+benchMethods = ('overwriteFile', 'appendBytes', 'rewriteBytes', 'insertBytes')
+benchShapes = {'tiny': (16, 17), 'pad': None}  # Input File sizes; None -- larger than processed
+benchChunkSizes = (4096, 65536, 1048576)
+
+def _benchBytes(rng, n):
+  ''' data = _benchBytes(rng, n) -- n pseudo-random bytes from the random.Random object rng. '''
+  return binascii.unhexlify('%0*x' % (2*n, rng.getrandbits(8*n)))
+# *** ----------------------------------------------------------------------------------------------
+
+def genBenchFiles(dirPath, numBytes, seed=0):
+  '''
+  genBenchFiles(dirPath, numBytes, seed=0)
+  Generate the synthetic files of the benchmark in the directory dirPath: tiny keys ('tiny1', 
+  'tiny2'), large pads not shorter than numBytes ('pad1', 'pad2') and the original Output File 
+  ('out') -- the same ones for the same numBytes and seed.
+  '''
+  rng = random.Random(seed)
+  sizes = {'out': numBytes, 'pad1': numBytes + 4099, 'pad2': numBytes + 8191}
+  sizes['tiny1'], sizes['tiny2'] = benchShapes['tiny']
+  for name in sorted(sizes):
+    with open(os.path.join(dirPath, name), 'wb') as fObj:
+      left = sizes[name]
+      while left > 0:
+        n = min(left, 1048576)
+        fObj.write(_benchBytes(rng, n))
+        left -= n
+# *** ----------------------------------------------------------------------------------------------
+
+def benchCases(dirPath, numBytes):
+  '''
+  cases = benchCases(dirPath, numBytes)
+  The grid of the benchmark: list of (name, kwopts) -- jmFU.config() kwargs of every case 
+  over the files of genBenchFiles(). The combinations 'insertBytes' cannot run 
+  (neither Backup nor Temporary Output) are left out.
+  '''
+  path = lambda name: os.path.join(dirPath, name)
+  cases = []
+  for method in benchMethods:
+    for numIn in (1, 2):
+      for bwNot in (False, True):
+        for shape in sorted(benchShapes):
+          for chunkSize in benchChunkSizes:
+            for safe in (False, True):
+              if method == 'insertBytes' and not safe:
+                continue
+              name = '/'.join([method, '%din' % numIn, 'not' if bwNot else 'plain', shape, 
+                               'cs%d' % chunkSize, 'bcp+tmp' if safe else 'direct'])
+              kw = {'INPUT1': path(shape + '1'), 'INPUT1_oset': 3, 'INPUT1_bwNot': bwNot, 
+                    'OUTPUT': path('work'), 'OUTPUT_oset': numBytes // 2, 
+                    'NumOfBytes': numBytes, 'ChunkSize': chunkSize, 'ModifyMethod': method}
+              if numIn == 2:
+                kw.update({'INPUT2': path(shape + '2'), 'INPUT2_oset': 5})
+              if safe:
+                kw.update({'BackupPath': path('work.bcp'), 'TmpOutPath': path('work.tmp')})
+              cases.append((name, kw))
+  return cases
+# *** ----------------------------------------------------------------------------------------------
+
+def _peakRss(reset=False):
+  '''
+  kB = _peakRss(reset=False)
+  Return the peak RSS of this process in kB (VmHWM on Linux, ru_maxrss elsewhere; None if unknown).
+  reset -- reset the peak to the current RSS first, where the kernel allows it (Linux clear_refs).
+  '''
+  if reset:
+    try:
+      with open('/proc/self/clear_refs', 'w') as fObj:
+        fObj.write('5')
+    except (IOError, OSError):
+      pass
+  try:
+    with open('/proc/self/status') as fObj:
+      for line in fObj:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1])
+  except (IOError, OSError):
+    pass
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+# *** ----------------------------------------------------------------------------------------------
+
+def _benchCase(task):
+  '''
+  Run one case of the benchmark (in a fresh worker process, see runBench()) "repeat" times on 
+  a fresh copy of the original Output File, with the Mixing Engine of the parent process. 
+  Return the result dict of the best run; 'peak_rss_kb' -- the peak RSS of the case, not 
+  inherited from the parent process (see _peakRss()).
+  '''
+  name, kwopts, repeat, engine = task
+  selectMixEngine(engine)
+  _peakRss(reset=True)
+  dirPath = os.path.dirname(kwopts['OUTPUT'])
+  best = None
+  for i in range(repeat):
+    for path in (kwopts.get('BackupPath'), kwopts.get('TmpOutPath')):
+      if path and os.path.exists(path):
+        os.remove(path)
+    copyFile(os.path.join(dirPath, 'out'), kwopts['OUTPUT'])
+    fw_obj = jmFU(**kwopts)
+    logMsg, execFlag = fw_obj.run()
+    if not execFlag:
+      raise RuntimeError('Benchmark case ' + name + ' FAILED:\n' + logMsg)
+    stats = fw_obj.stats
+    if best is None or stats['seconds']['total'] < best['seconds']:
+      best = {'seconds': stats['seconds']['total'], 
+              'mb_per_s': kwopts['NumOfBytes'] / stats['seconds']['total'] / 1e6, 
+              'mix_mb_per_s': stats.get('mb_per_s')}
+  best['peak_rss_kb'] = _peakRss()
+  return name, best
+# *** ----------------------------------------------------------------------------------------------
+
+def runBench(dirPath, numBytes, repeat=3, pattern=None, seed=0):
+  '''
+  results = runBench(dirPath, numBytes, repeat=3, pattern=None, seed=0)
+  Run the benchmark (the cases of benchCases() whose names contain the pattern, if given) 
+  in the directory dirPath. Every case runs in a worker process of its own (spawned, not forked,
+  where possible), so its peak RSS is inflated neither by the other ones nor by this process. 
+  Return the dict: case name --> result dict ('seconds' -- the best time of the run, 
+  'mb_per_s' -- throughput of the whole Modify Method, 'mix_mb_per_s' -- of jm_write only, 
+  'peak_rss_kb').
+  '''
+  genBenchFiles(dirPath, numBytes, seed)
+  tasks = [(name, kw, repeat, mixEngine.name) for name, kw in benchCases(dirPath, numBytes) 
+           if not pattern or pattern in name]
+  results = {}
+  if hasattr(multiprocessing, 'get_context'):
+    pool = multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1)
+  else:
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+  try:
+    for name, result in pool.imap(_benchCase, tasks):
+      results[name] = result
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+  return results
+# *** ----------------------------------------------------------------------------------------------
+
+def compareBench(results, baseline, tolerance=0.15):
+  '''
+  regressions = compareBench(results, baseline, tolerance=0.15)
+  Compare the benchmark results with the baseline ones (saved results of runBench()). 
+  Return the list of messages on the cases whose throughput dropped or peak RSS grew 
+  by more than the tolerance (fraction).
+  '''
+  regressions = []
+  for name in sorted(results):
+    if name not in baseline:
+      continue
+    res, base = results[name], baseline[name]
+    if res['mb_per_s'] < base['mb_per_s'] * (1 - tolerance):
+      regressions.append('%s: %.1f MB/s, baseline %.1f MB/s' % (name, res['mb_per_s'], 
+                                                                base['mb_per_s']))
+    if res['peak_rss_kb'] and base.get('peak_rss_kb') and \
+       res['peak_rss_kb'] > base['peak_rss_kb'] * (1 + tolerance):
+      regressions.append('%s: peak RSS %d kB, baseline %d kB' % (name, res['peak_rss_kb'], 
+                                                                 base['peak_rss_kb']))
+  return regressions
+# *** ----------------------------------------------------------------------------------------------
+
+def formatBench(results, baseline=None):
+  ''' Text table of the benchmark results (with the change of throughput vs the baseline). '''
+  lines = ['%-60s %10s %10s %12s %8s' % ('case', 'MB/s', 'mix MB/s', 'peak RSS kB', 'vs base')]
+  for name in sorted(results):
+    res = results[name]
+    vsBase = ''
+    if baseline and name in baseline:
+      vsBase = '%+.0f%%' % (100.0 * (res['mb_per_s'] / baseline[name]['mb_per_s'] - 1))
+    lines.append('%-60s %10.1f %10.1f %12s %8s' % (name, res['mb_per_s'], 
+                                                   res['mix_mb_per_s'] or 0.0, 
+                                                   res['peak_rss_kb'], vsBase))
+  return '\n'.join(lines) + '\n'
+
 # *** ==============================================================================================
 # *** ==============================================================================================
 
@@ -430,9 +4151,37 @@ def genTmpPath(f_path):
   timeStamp = t.strftime(fileTimeStampFormat)
   tmp_name = '_.TMP-' + timeStamp + '._' + fname
   return os.path.join(dirname, tmp_name)
+# *** ----------------------------------------------------------------------------------------------
+
+def genJournalPath(f_path):
+  # No time stamp: an unfinished in-place insertion must be found by the next run.
+  dirname, fname = os.path.split(f_path)
+  jrn_name = '_.JRN._' + fname
+  return os.path.join(dirname, jrn_name)
+# *** ----------------------------------------------------------------------------------------------
+
+def genCheckpointPath(f_path):
+  # No time stamp: the checkpoint of an interrupted run must be found by --resume.
+  dirname, fname = os.path.split(f_path)
+  ckp_name = '_.CKP._' + fname
+  return os.path.join(dirname, ckp_name)
+# *** ----------------------------------------------------------------------------------------------
+
+def genLedgerPath(f_path):
+  # No time stamp: one ledger for all the runs consuming the pad.
+  dirname, fname = os.path.split(f_path)
+  ldg_name = '_.LDG._' + fname
+  return os.path.join(dirname, ldg_name)
 
 # *** ==============================================================================================
 
+def digestAlgorithms():
+  ''' Return the sorted list of the hashlib algorithms available on every platform. '''
+  names = getattr(hashlib, 'algorithms_guaranteed', None) or getattr(hashlib, 'algorithms', ())
+  # SHAKE digests are of variable length.
+  return sorted(name for name in names if not name.startswith('shake'))
+# *** ----------------------------------------------------------------------------------------------
+
 def positiveInt(s):
   ok = True
   val = s
@@ -446,6 +4195,71 @@ def positiveInt(s):
   return val
 # *** ----------------------------------------------------------------------------------------------
 
+def nonNegativeInt(s):
+  ok = True
+  val = s
+  try:
+    val = int(s)
+  except:
+    ok = False
+  if not ok or val < 0:
+    msg = "\n\tWrong value: %r \n\tMust be non-negative integer." % s
+    raise argparse.ArgumentTypeError(msg)
+  return val
+# *** ----------------------------------------------------------------------------------------------
+
+def chunkSizeArg(s):
+  if s == autoChunkSize:
+    return s
+  return positiveInt(s)
+# *** ----------------------------------------------------------------------------------------------
+
+def inputSpec(s):
+  '''
+  Parse the "/path/to/input/file[:OFFSET][:not]" specification of an additional Input File 
+  to the (path, offset, bwNot) tuple.
+  '''
+  path, oset, bwNot = s, 0, False
+  head, sep, tail = path.rpartition(':')
+  if sep and tail.lower() == 'not':
+    path, bwNot = head, True
+  head, sep, tail = path.rpartition(':')
+  if sep:
+    try:
+      path, oset = head, int(tail)
+    except ValueError:
+      pass
+  if not path:
+    msg = "\n\tWrong Input File specification: %r" % s
+    raise argparse.ArgumentTypeError(msg)
+  return (path, oset, bwNot)
+# *** ----------------------------------------------------------------------------------------------
+
+def targetSpec(s):
+  '''
+  Parse the "/path/to/output/file[:modifyMethod][:OFFSET][:not]" specification of an additional 
+  fan-out target to the dict of its jmFU.config() keyword arguments (see fanOutTargets()).
+  '''
+  path, target = s, {}
+  head, sep, tail = path.rpartition(':')
+  if sep and tail.lower() == 'not':
+    path, target['bwNot'] = head, True
+  head, sep, tail = path.rpartition(':')
+  if sep:
+    try:
+      path, target['OUTPUT_oset'] = head, int(tail)
+    except ValueError:
+      pass
+  head, sep, tail = path.rpartition(':')
+  if sep and tail in ('overwriteFile', 'appendBytes', 'rewriteBytes', 'insertBytes'):
+    path, target['ModifyMethod'] = head, tail
+  if not path:
+    msg = "\n\tWrong target specification: %r" % s
+    raise argparse.ArgumentTypeError(msg)
+  target['OUTPUT'] = path
+  return target
+# *** ----------------------------------------------------------------------------------------------
+
 def checkOutFilePath(f_path):
   '''
   Try to open given file path for exclusive creation. In case of success close and remove
@@ -464,19 +4278,55 @@ def checkOutFilePath(f_path):
   return f_path
 # *** ----------------------------------------------------------------------------------------------
 
-def dispArgs(argDict):
-  if sys.version[0] == '2':
-    print '-'*50
-    for key, value in argDict.items():
-      print "The value of {} is {}".format(key, value)
-    print '-'*50
-  elif sys.version[0] == '3':
-    print('-'*50)
-    for key, value in argDict.items():
-      print( "The value of {} is {}".format(key, value))
-    print('-'*50)
-  else:
-    raise RuntimeError('Unrecognized python version:\n  {}'.format(sys.version))
+def prepareConfig(argD):
+  '''
+  argD = prepareConfig(argD)
+  Complete and check the jmFU configuration dict: generate TmpOutPath / BackupPath given 
+  as '__AUTO__', check the files' names, set NumOfBytes to the size of Input File 1 if it is 
+  not given (unless it is a stream: then up to its end). Raise ValueError if the files' names 
+  are wrong, or the Output stream is combined with the options it does not support.
+  '''
+  if isStream(argD.get('OUTPUT')):
+    if argD.get('TmpOutPath') or argD.get('BackupPath'):
+      raise ValueError('Output stream can neither be backed up nor replaced with Temporary Output!')
+    if argD.get('ModifyMethod', 'overwriteFile') not in ['overwriteFile', 'appendBytes']:
+      raise ValueError('Only \'overwriteFile\' and \'appendBytes\' can write to Output stream!')
+  
+  # Generate TmpOutPath if required
+  if argD.get('TmpOutPath') == '__AUTO__':
+    argD['TmpOutPath'] = genTmpPath(argD['OUTPUT'])
+  
+  # Generate BackupPath if required
+  if argD.get('BackupPath') == '__AUTO__':
+    argD['BackupPath'] = genBcpPath(argD['OUTPUT'])
+  
+  # Check files' names
+  inPaths = [path for path, oset, bwNot in getInputs(jmFU(**argD).get_conf())]
+  if len(set(inPaths)) != len(inPaths):
+    raise ValueError('All the Input Files must be DIFFERENT files!')
+  if argD.get('BackupPath') and argD.get('TmpOutPath') and argD['BackupPath'] == argD['TmpOutPath']:
+    raise ValueError('Backup File and Temporary Output File must be DIFFERENT files!')
+  if argD.get('OUTPUT') != stdStream and \
+     argD.get('OUTPUT') in inPaths + [argD.get('BackupPath'), argD.get('TmpOutPath')]:
+    raise ValueError('''Output File MUST NOT be the same as either of: 
+                     Input Files, Backup File or Temporary Output File.''')
+  
+  if argD.get('Durability', 'none') not in durabilityLevels:
+    raise ValueError('Durability must be one of: ' + ', '.join(durabilityLevels))
+  
+  # If NumOfBytes is not passed set it equal to the size of Input File 1
+  if not argD.get('NumOfBytes') and not isStream(argD['INPUT1']):
+    argD['NumOfBytes'] = fileSize(argD['INPUT1'])
+  return argD
+# *** ----------------------------------------------------------------------------------------------
+
+def dispArgs(argDict, outObj=None):
+  # Written to outObj (sys.stdout by default): stdout may carry the Output stream.
+  outObj = outObj or sys.stdout
+  outObj.write('-'*50 + '\n')
+  for key, value in argDict.items():
+    outObj.write("The value of {} is {}\n".format(key, value))
+  outObj.write('-'*50 + '\n')
 # *** ----------------------------------------------------------------------------------------------
 
 def main():
@@ -484,8 +4334,10 @@ def main():
                                    epilog = progCopyright)
   # Input File 1:
   if1_group = parser.add_argument_group(title='Input File 1 parameters')
-  if1_group.add_argument('--input_1', '--if1', dest='INPUT1', required=True, nargs='?',
-            help = 'Path to Input File 1', metavar = '/path/to/input/file_1')
+  if1_group.add_argument('--input_1', '--if1', dest='INPUT1', nargs='?',
+            help = '''Path to Input File 1; \'-\' -- read it from stdin. A stream (stdin, FIFO) 
+            is consumed once, up to its end unless Number of bytes is given; its offset is 
+            the number of bytes to skip.''', metavar = '/path/to/input/file_1')
   if1_group.add_argument('--input_1_offset', '--oset1', dest='INPUT1_oset', nargs='?', default='0',
             type=int, help = 'Offset for Input File 1 in bytes', metavar = 'NUMBER_OF_BYTES')
   if1_group.add_argument('--input_1_bw_not', '--bwNOT1', dest='INPUT1_bwNot', action='store_true',
@@ -500,6 +4352,14 @@ def main():
   if2_group.add_argument('--input_2_bw_not', '--bwNOT2', dest='INPUT2_bwNot', action='store_true',
             help = 'Whether to apply bitwise NOT to bytes from Input File 2 while read it context')
   
+  # Additional Input Files (optional):
+  ifn_group = parser.add_argument_group(title='Additional Input Files (optional)')
+  ifn_group.add_argument('--input_n', '--ifn', dest='INPUTS', action='append', default=[],
+            type=inputSpec, metavar = '/path/to/input/file[:OFFSET][:not]',
+            help = '''Additional Input File to be mixed in, optionally followed by its offset in 
+            bytes and by ":not" to apply bitwise NOT to its bytes. May be repeated any number 
+            of times: all the Input Files are mixed in a single pass.''')
+  
   # Workflow parameters:
   wf_group = parser.add_argument_group(title='Workflow parameters')
   wf_group.add_argument( '--modify_method', '-m', '-M', dest='ModifyMethod', nargs='?', 
@@ -510,13 +4370,75 @@ def main():
             help = '''Number of bytes to process. Will process Input File 1 completely one time 
             if this parameter is not specified explicitly.''')
   wf_group.add_argument('--chunk_size', '--cs', '-s', '-S', dest='ChunkSize', nargs='?', 
-            default=defaultChunkSize, type=positiveInt, metavar='NUMBER_OF_BYTES', 
-            help = 'Chunk Size in bytes for file input / output operations')
+            default=defaultChunkSize, type=chunkSizeArg, metavar='NUMBER_OF_BYTES', 
+            help = '''Chunk Size in bytes for file input / output operations, or \'auto\' 
+            to choose it by the throughput measured on the first chunks''')
+  wf_group.add_argument('--auto_chunk_limit', dest='AutoChunkLimit', nargs='?', type=positiveInt,
+            default=defaultAutoChunkLimit, metavar='NUMBER_OF_BYTES',
+            help = 'The largest Chunk Size to try if Chunk Size is \'auto\'')
+  wf_group.add_argument('--mmap', dest='UseMmap', action='store_true',
+            help = 'Whether to read Input File(s) through memory mapping')
+  wf_group.add_argument('--tile_budget', dest='TileBudget', nargs='?', type=nonNegativeInt,
+            default=defaultTileBudget, metavar='NUMBER_OF_BYTES',
+            help = '''Input File(s) not larger than this number of bytes are loaded into memory 
+            once and tiled instead of being re-read in round-robin manner. 0 disables tiling.''')
+  wf_group.add_argument('--fadvise', dest='CacheHints', action='store_true',
+            help = '''Give the kernel page cache hints: read the Input File(s) ahead and drop 
+            the bytes consumed and written from the page cache (posix_fadvise). Like 
+            --direct_io and --sync_every, it turns off the kernel-side copy and --jobs.''')
+  wf_group.add_argument('--direct_io', dest='DirectIO', action='store_true',
+            help = '''Write the Output File with O_DIRECT bypassing the page cache (the buffered 
+            writing is used if the filesystem does not support it). The kernel-side copy and 
+            --jobs are not used then.''')
+  wf_group.add_argument('--sync_every', dest='SyncEvery', type=nonNegativeInt, default=0, 
+            metavar='NUMBER_OF_BYTES',
+            help = '''Start the writeback of every this number of bytes of the Output File 
+            written (sync_file_range), so the dirty pages are flushed at a steady rate. 
+            The kernel-side copy and --jobs are not used then.''')
+  wf_group.add_argument('--durability', dest='Durability', choices=durabilityLevels, default='none',
+            help = '''none -- leave flushing the Output File to the kernel; end -- fsync it once 
+            written (the Temporary Output before the rename, the directory after it) and the 
+            Backup before the Output File is modified; periodic -- also fsync the Output File 
+            every --fsync_every bytes written (the kernel-side copy and --jobs are not used 
+            then). Batch jobs defer the fsyncs they can to one group commit at the end of 
+            the batch.''')
+  wf_group.add_argument('--fsync_every', dest='FsyncEvery', type=nonNegativeInt, default=0, 
+            metavar='NUMBER_OF_BYTES',
+            help = '''\'periodic\' durability: fsync the Output File every this number of bytes 
+            written ({} if not given)'''.format(defaultFsyncEvery))
+  wf_group.add_argument('--in_place', dest='InsertInPlace', action='store_true',
+            help = '''\'insertBytes\' Modify Method: shift the tail of the file to open a gap 
+            for the bytes instead of rebuilding the whole file from its copy. Neither Backup 
+            nor Temporary Output is required then: the insertion is journaled, and re-running 
+            it after a crash completes it.''')
+  wf_group.add_argument('--range_bcp', dest='RangeBackup', action='store_true',
+            help = '''\'rewriteBytes\' Modify Method: back up only the bytes to be overwritten 
+            (with their offset and the original file size) instead of the whole Output File. 
+            Use --restore_range_bcp to restore the file.''')
+  wf_group.add_argument('--checkpoint', dest='Checkpoint', nargs='?', type=nonNegativeInt,
+            const=defaultCheckpointChunks, default=0, metavar='NUMBER_OF_CHUNKS',
+            help = '''Commit the checkpoint of the run (the number of bytes written and fsync-ed) 
+            to a sidecar file every NUMBER_OF_CHUNKS chunks ({} if not specified), so an 
+            interrupted run can be resumed by --resume. The parallel jobs are not used then.'''.format(
+              defaultCheckpointChunks))
+  wf_group.add_argument('--resume', dest='Resume', action='store_true',
+            help = '''Continue the interrupted run (of the same configuration) from its last 
+            checkpoint instead of starting over; the Temporary Output and Backup are taken over 
+            from the checkpoint, so pass --tmp / --bcp without paths.''')
+  wf_group.add_argument('--jobs', '-j', '-J', dest='Jobs', nargs='?', type=positiveInt, default=1,
+            metavar='NUMBER_OF_JOBS', 
+            help = 'Number of worker processes to mix the bytes in parallel with')
+  wf_group.add_argument('--pipeline', dest='PipelineDepth', nargs='?', type=nonNegativeInt, 
+            const=3, default=0, metavar='RING_DEPTH',
+            help = '''Read the next chunks, mix the current one and write the previous ones 
+            at the same time (in separate threads) through a ring of RING_DEPTH reusable buffers
+            (3 if not specified). 0 or 1 -- strictly serial processing (default).''')
   
   # Output File:
   of_group = parser.add_argument_group(title='Output parameters')
-  of_group.add_argument('--output', '--of', dest='OUTPUT', required=True, nargs='?', 
-            help = 'Path to Output File', metavar = '/path/to/output/file')
+  of_group.add_argument('--output', '--of', dest='OUTPUT', nargs='?', 
+            help = '''Path to Output File; \'-\' -- write to stdout (\'overwriteFile\' or 
+            \'appendBytes\' only, as for a FIFO)''', metavar = '/path/to/output/file')
   of_group.add_argument('--output_offset', '--outoset', dest='OUTPUT_oset', nargs='?', default='0',
             type=int, help = 'Offset for Output File in bytes', metavar = 'NUMBER_OF_BYTES')
   of_group.add_argument('--tmp', dest='TmpOutPath', nargs='?', const='__AUTO__', default=None, 
@@ -532,9 +4454,111 @@ def main():
             the backup_file will be generated automatically.''',
             metavar = '/path/to/backup_file',
             type = checkOutFilePath)
+  of_group.add_argument('--target', dest='TARGETS', action='append', default=[], type=targetSpec,
+            metavar = '/path/to/output/file[:modifyMethod][:OFFSET][:not]',
+            help = '''Additional Output File (fan-out target) to write the same mixed bytes to, 
+            optionally with its own Modify Method, offset, and ":not" to apply bitwise NOT to 
+            the bytes written to it. May be repeated any number of times: the Input Files are 
+            read once for all the targets. The other Output parameters apply to every target 
+            (Backup / Temporary Output paths must then be generated).''')
+  
+  # Pad usage ledger:
+  ledger_group = parser.add_argument_group(title='Pad usage ledger')
+  ledger_group.add_argument('--ledger', dest='Ledger', action='append', default=[],
+            metavar = '/path/to/pad',
+            help = '''Input File (pad) to keep the usage ledger of: the byte ranges of it consumed 
+            by the runs are logged to a sidecar file, and a run reusing any of them is refused. 
+            May be repeated for several pads.''')
+  ledger_group.add_argument('--ledger_warn', dest='LedgerPolicy', action='store_const', 
+            const='warn', default='refuse',
+            help = 'Only warn about the pad reuse instead of refusing the run')
+  ledger_group.add_argument('--ledger_free', dest='LedgerFree', nargs='?', type=positiveInt, 
+            default=None, metavar='NUMBER_OF_BYTES',
+            help = '''Print the first offset of every --ledger pad NUMBER_OF_BYTES unused bytes 
+            can be read from (searching from its offset as an Input File, if given), and exit''')
+  
+  # Batch mode:
+  batch_group = parser.add_argument_group(title='Batch mode')
+  batch_group.add_argument('--batch', dest='Batch', nargs='?', default=None, 
+            metavar = '/path/to/manifest.jsonl',
+            help = '''Run all the jobs of the JSON-lines manifest (\'-\' -- read it from stdin) 
+            in this process, instead of the single job given by the other parameters. Every 
+            line is a dict of job parameters, named as the attributes of jmFU 
+            (INPUT1, INPUT1_oset, ..., OUTPUT, NumOfBytes, ModifyMethod, ...).''')
+  batch_group.add_argument('--batch_workers', dest='BatchWorkers', nargs='?', type=positiveInt,
+            default=1, metavar='NUMBER_OF_WORKERS',
+            help = 'Number of threads to run independent jobs of the batch at the same time with')
+  batch_group.add_argument('--batch_report', dest='BatchReport', nargs='?', default='-',
+            metavar = '/path/to/report.jsonl',
+            help = '''File to write the per-job report to, as JSON lines 
+            (\'-\' -- to stdout, the default)''')
+  
+  # Daemon mode:
+  daemon_group = parser.add_argument_group(title='Daemon mode')
+  daemon_group.add_argument('--serve', dest='Serve', nargs='?', default=None, 
+            metavar = '/path/to/socket',
+            help = '''Run as a daemon: listen on the Unix socket for the jobs (JSON lines as in 
+            the --batch manifest) and run them by --batch_workers threads, sharing warm caches 
+            of the Input Files, until interrupted''')
+  daemon_group.add_argument('--client', dest='Client', nargs='?', default=None, 
+            metavar = '/path/to/socket',
+            help = '''Send the job given by the other options (or the jobs of the --batch 
+            manifest) to the daemon listening on the Unix socket instead of running it here''')
+  
+  # Benchmark:
+  bench_group = parser.add_argument_group(title='Benchmark')
+  bench_group.add_argument('--bench', dest='Bench', action='store_true',
+            help = '''Run every Modify Method over the grid of cases (one / two Input Files, 
+            with / without NOT, tiny keys / large pads, several Chunk Sizes, with / without 
+            Backup and Temporary Output) on synthetic files, print the throughput and peak RSS 
+            of every case and exit''')
+  bench_group.add_argument('--bench_bytes', dest='BenchBytes', nargs='?', type=positiveInt,
+            default=8388608, metavar='NUMBER_OF_BYTES',
+            help = 'Number of bytes every case processes (8MiB by default)')
+  bench_group.add_argument('--bench_repeat', dest='BenchRepeat', nargs='?', type=positiveInt,
+            default=3, metavar='NUMBER', help = 'Runs of every case; the best one counts')
+  bench_group.add_argument('--bench_filter', dest='BenchFilter', nargs='?', default=None,
+            metavar='SUBSTRING', 
+            help = '''Run only the cases whose names contain the substring 
+            (e.g. \'insertBytes/2in\')''')
+  bench_group.add_argument('--bench_dir', dest='BenchDir', nargs='?', default=None,
+            metavar='/path/to/dir', 
+            help = 'Directory for the synthetic files (a temporary one by default)')
+  bench_group.add_argument('--bench_seed', dest='BenchSeed', nargs='?', type=int, default=0,
+            metavar='SEED', help = 'Seed of the synthetic files contents')
+  bench_group.add_argument('--bench_save', dest='BenchSave', nargs='?', default=None,
+            metavar='/path/to/baseline.json', help = 'Save the results as a baseline')
+  bench_group.add_argument('--bench_baseline', dest='BenchBaseline', nargs='?', default=None,
+            metavar='/path/to/baseline.json', 
+            help = '''Compare the results with the saved baseline: exit with status 1 if 
+            throughput dropped or peak RSS grew in any case by more than the tolerance''')
+  bench_group.add_argument('--bench_tolerance', dest='BenchTolerance', nargs='?', type=float,
+            default=0.15, metavar='FRACTION', 
+            help = 'Tolerance of the comparison with the baseline (0.15 by default)')
   
   # Others:
   other_group = parser.add_argument_group(title='Other parameters')
+  other_group.add_argument('--mix_engine', dest='MixEngine', nargs='?', default=None,
+            choices=sorted(mixEngineNames) + ['auto'], metavar = 'ENGINE',
+            help = '''Mixing Engine to perform XOR / NOT operations with: {} (if NumPy is 
+            installed). The fastest available one is chosen if not specified.'''.format(
+              ', '.join(mixEngineNames)))
+  other_group.add_argument('--stats', dest='StatsPath', nargs='?', default=None,
+            metavar = '/path/to/stats_file',
+            help = '''File to export the statistics of the run to (time of every phase, bytes
+            read per Input File, wrap-arounds, chunks, MB/s): Prometheus textfile if its name
+            ends with \'.prom\', JSON otherwise''')
+  other_group.add_argument('--digest', dest='Digest', nargs='?', const='sha256', default=None,
+            choices=digestAlgorithms(), metavar='ALGORITHM',
+            help = '''Compute the digests of the mixed bytes and of the bytes read from every 
+            Input File while processing them: {} (sha256 if not specified). 
+            They are reported in the log and in the statistics.'''.format(', '.join(digestAlgorithms())))
+  other_group.add_argument('--digest_output', dest='DigestOutput', action='store_true',
+            help = '''With --digest: compute the digest of the whole resulting Output File as well
+            (only the bytes the run leaves unchanged are read for it)''')
+  other_group.add_argument('--restore_range_bcp', action=restoreRangeBackupAction, nargs=2,
+            metavar=('/path/to/backup_file', '/path/to/output/file'),
+            help = 'Restore the Output File from the range-only backup and exit')
   other_group.add_argument('--version', action='version', help = 'Display version info and exit',
             version='%(prog)s {}'.format (progVersion))
   other_group.add_argument('--help', '-h', action='help', help='Show this help message and exit')
@@ -543,37 +4567,108 @@ def main():
   argNS = parser.parse_args(sys.argv[1:])
   # convert The Namespace object to dict:
   argD = vars(argNS)
-  dispArgs(argD) # <------------------------------------------------------------ For debug only !!!
   
-  # Generate TmpOutPath if required
-  if argD['TmpOutPath'] == '__AUTO__':
-    argD['TmpOutPath'] = genTmpPath(argD['OUTPUT'])
+  # Select the Mixing Engine if requested explicitly
+  if argD['MixEngine']:
+    try:
+      selectMixEngine(argD['MixEngine'])
+    except ValueError as e:
+      parser.error(str(e))
   
-  # Generate BackupPath if required
-  if argD['BackupPath'] == '__AUTO__':
-    argD['BackupPath'] = genBcpPath(argD['OUTPUT'])
+  # Benchmark: run the grid of cases, print / save / compare the results and exit
+  if argD['Bench']:
+    dirPath = argD['BenchDir'] or tempfile.mkdtemp(prefix='jmFUbench.')
+    try:
+      results = runBench(dirPath, argD['BenchBytes'], argD['BenchRepeat'], argD['BenchFilter'],
+                         argD['BenchSeed'])
+    finally:
+      if not argD['BenchDir']:
+        shutil.rmtree(dirPath, ignore_errors=True)
+    baseline = None
+    if argD['BenchBaseline']:
+      with open(argD['BenchBaseline']) as fObj:
+        baseline = json.load(fObj)
+    sys.stdout.write(formatBench(results, baseline))
+    if argD['BenchSave']:
+      with open(argD['BenchSave'], 'w') as fObj:
+        json.dump(results, fObj, indent=2, sort_keys=True)
+    if baseline:
+      regressions = compareBench(results, baseline, argD['BenchTolerance'])
+      if regressions:
+        sys.stderr.write('!!! Benchmark regressions:\n' + '\n'.join(regressions) + '\n')
+        sys.exit(1)
+    return None
   
-  # Check files' names
-  if argD['INPUT2'] and argD['INPUT2'] == argD['INPUT1']:
-    raise ValueError('Input File 1 and Input File 2 must be DIFFERENT files!')
-  if argD['BackupPath'] and argD['TmpOutPath'] and argD['BackupPath'] == argD['TmpOutPath']:
-    raise ValueError('Backup File and Temporary Output File must be DIFFERENT files!')
-  if argD['OUTPUT'] in [argD['INPUT1'], argD['INPUT2'], argD['BackupPath'], argD['TmpOutPath']]:
-    raise ValueError('''Output File MUST NOT be the same as either of: 
-                     Input File 1, Input File 2, Backup File or Temporary Output File.''')
+  # Daemon mode: serve the jobs until interrupted
+  if argD['Serve']:
+    serveDaemon(argD['Serve'], argD['BatchWorkers'])
+    return None
   
-  # If NumOfBytes is not passed set it equal to the size of Input File 1
-  if not argD['NumOfBytes']:
-    argD['NumOfBytes'] = os.path.getsize(argD['INPUT1'])
-  dispArgs(argD) # <------------------------------------------------------------ For debug only !!!
+  # Client of the daemon: a single job
+  if argD['Client'] and not argD['Batch']:
+    if not (argD['INPUT1'] and (argD['OUTPUT'] or argD['TARGETS'])):
+      parser.error('the following arguments are required: --input_1/--if1, --output/--of')
+    report = daemonRequest(argD['Client'], [argD])[0]
+    (sys.stdout if report['ok'] else sys.stderr).write(report['log'])
+    if not report['ok']:
+      sys.exit(1)
+    return None
+  
+  # Batch mode: run the manifest jobs (here or by the daemon), write the report and exit
+  if argD['Batch']:
+    if argD['Client']:
+      reports = daemonRequest(argD['Client'], readManifest(argD['Batch']))
+    else:
+      reports = runBatch(readManifest(argD['Batch']), argD['BatchWorkers'])
+    repObj = sys.stdout if argD['BatchReport'] == '-' else open(argD['BatchReport'], 'w')
+    try:
+      for report in reports:
+        repObj.write(json.dumps(report) + '\n')
+    finally:
+      if repObj is not sys.stdout:
+        repObj.close()
+    if not all(report['ok'] for report in reports):
+      sys.exit(1)
+    return None
+  
+  # Pad usage ledger: report the next free offsets and exit
+  if argD['LedgerFree']:
+    offsets = dict((_pathKey(path), oset) for path, oset, bwNot in getInputs(argD) if path)
+    for path in argD['Ledger']:
+      oset = fixOffset(path, offsets.get(_pathKey(path), 0))
+      free = padLedger(genLedgerPath(_pathKey(path))).nextFree(argD['LedgerFree'], fileSize(path), 
+                                                              oset)
+      sys.stdout.write('{}: {}\n'.format(path, 'no free range' if free is None else free))
+    return None
+  
+  # Fan-out: one read pass over the Input Files for all the targets
+  if argD['TARGETS']:
+    if not argD['INPUT1']:
+      parser.error('the following arguments are required: --input_1/--if1')
+    report = runFanOut(argD)
+    outPaths = [argD['OUTPUT']] + [target['OUTPUT'] for target in argD['TARGETS']]
+    logObj = sys.stderr if stdStream in outPaths or not report['ok'] else sys.stdout
+    logObj.write(report['log'])
+    if not report['ok']:
+      sys.exit(1)
+    return None
+  
+  if not (argD['INPUT1'] and argD['OUTPUT']):
+    parser.error('the following arguments are required: --input_1/--if1, --output/--of')
+  # Keep stdout clean if the output is streamed there.
+  logObj = sys.stderr if argD['OUTPUT'] == stdStream else sys.stdout
+  dispArgs(argD, logObj) # <---------------------------------------------------- For debug only !!!
+  prepareConfig(argD)
+  dispArgs(argD, logObj) # <---------------------------------------------------- For debug only !!!
   
   # Create jmFU-object, pocess the files ...
   fw_obj = jmFU(**argD)
   logMsg, execFlag = fw_obj.run() # <----------------------------------------------------------------------------- !!!
   if execFlag:
-    sys.stdout.write(logMsg)
+    logObj.write(logMsg)
   else:
     sys.stderr.write(logMsg)
+    sys.exit(1)
   
   return None
 # ------------------------------------------------------------------------------------------------ #
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+'''
+Shared helpers of the jmFUUtil tests: the script loaded as the jmFUUtil module, the simulated
+crash, and the test case working in a temporary directory.
+'''
+import os
+import sys
+import errno
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+scriptPath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'jmFUUtil.v.0.1.b.py')
+
+def _loadScript():
+  # The script is not an importable module name: load it by its path (once for all the tests).
+  if 'jmFUUtil' in sys.modules:
+    return sys.modules['jmFUUtil']
+  try:
+    import importlib.util
+  except ImportError:
+    import imp
+    return imp.load_source('jmFUUtil', scriptPath)
+  spec = importlib.util.spec_from_file_location('jmFUUtil', scriptPath)
+  module = importlib.util.module_from_spec(spec)
+  sys.modules['jmFUUtil'] = module
+  spec.loader.exec_module(module)
+  return module
+
+jmFUUtil = _loadScript()
+
+class crash(Exception):
+  ''' The simulated crash. '''
+# *** ----------------------------------------------------------------------------------------------
+
+class tempDirTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.dirPath = tempfile.mkdtemp(prefix='jmFU-test-')
+    self.rnd = random.Random(1234)
+
+  def tearDown(self):
+    shutil.rmtree(self.dirPath, ignore_errors=True)
+
+  def path(self, name):
+    return os.path.join(self.dirPath, name)
+
+  def randomBytes(self, n):
+    return bytes(bytearray(self.rnd.randrange(256) for i in range(n)))
+
+  def writeFile(self, name, data):
+    with open(self.path(name), 'wb') as fObj:
+      fObj.write(data)
+    return self.path(name)
+
+  def readFile(self, name):
+    with open(self.path(name), 'rb') as fObj:
+      return fObj.read()
+# *** ----------------------------------------------------------------------------------------------
+
+class osWithout:
+  ''' The os module without the given names: to force the fallbacks of jmFUUtil. '''
+  def __init__(self, *names):
+    self.names = names
+
+  def __getattr__(self, name):
+    if name in self.names:
+      raise AttributeError(name)
+    return getattr(os, name)
+# *** ----------------------------------------------------------------------------------------------
+
+class fifoFeeder(threading.Thread):
+  '''
+  Thread writing the data to the FIFO at the path (created) in pieces of 7777 bytes: a stream
+  Input File. With hold=(pos, threading.Event) it waits for the event once pos bytes are written.
+  finish() releases the hold and drains the FIFO until the thread ends (the reader may have
+  stopped early, or not started at all).
+  '''
+  def __init__(self, path, data, hold=None):
+    threading.Thread.__init__(self)
+    os.mkfifo(path)
+    self.path = path
+    self.data = data
+    self.hold = hold or (len(data), None)
+    self.daemon = True
+    self.start()
+
+  def run(self):
+    try:
+      with open(self.path, 'wb') as fObj:
+        pos = 0
+        for end in (self.hold[0], len(self.data)):
+          while pos < end:
+            fObj.write(self.data[pos:min(pos + 7777, end)])
+            pos = min(pos + 7777, end)
+          if self.hold[1] is not None:
+            self.hold[1].wait()
+    except (IOError, OSError):
+      pass  # the reader stopped early
+
+  def finish(self):
+    if self.hold[1] is not None:
+      self.hold[1].set()
+    fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+      while self.is_alive():
+        try:
+          os.read(fd, 65536)
+        except OSError as e:
+          if e.errno != errno.EAGAIN:
+            raise
+        self.join(0.01)
+    finally:
+      os.close(fd)
+# *** ----------------------------------------------------------------------------------------------
+
+def roundBytes(data, oset, n):
+  ''' The n bytes of data read in round-robin manner from the "extended" offset oset. '''
+  oset %= len(data)
+  pattern = data[oset:] + data[:oset]
+  return (pattern * (n // len(pattern) + 1))[:n]
+
+def referenceMix(inputs, n):
+  '''
+  The n mixed bytes of the inputs -- (data, oset, bwNot) tuples -- computed byte by byte:
+  the reference the mixed bytes of jmFUUtil must match.
+  '''
+  out = bytearray(n)
+  bwNot = False
+  for data, oset, inNot in inputs:
+    for i, b in enumerate(bytearray(roundBytes(data, oset, n))):
+      out[i] ^= b
+    bwNot ^= bool(inNot)
+  if bwNot:
+    out = bytearray(255 - b for b in out)
+  return bytes(out)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the asyncio entry point (see mixAsync()): progress updates, cancelling with rollback.
+Written without async / await: the file is parsed by python 2 as well, where they are skipped.
+'''
+import threading
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, fifoFeeder, referenceMix
+
+asyncio = jmFUUtil._importAsyncio()
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class mixAsyncTest(tempDirTestCase):
+  '''
+  Jobs run by mixAsync() on a pool of one thread: a job waiting for its stream Input File (FIFO)
+  is cancelled and rolled back, the progress updates are throttled.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.loop = asyncio.new_event_loop()
+    self.interval = jmFUUtil.asyncProgressInterval
+    jmFUUtil.setAsyncJobs(1)
+    self.data = self.randomBytes(100000)
+    self.key = self.randomBytes(999)
+    self.orig = self.randomBytes(5000)
+    self.feeder = None
+
+  def tearDown(self):
+    if self.feeder is not None:
+      self.feeder.finish()
+    jmFUUtil.setAsyncJobs(jmFUUtil.defaultAsyncJobs)
+    jmFUUtil.asyncProgressInterval = self.interval
+    self.loop.close()
+    tempDirTestCase.tearDown(self)
+
+  def job(self, input1, numBytes):
+    return dict(INPUT1=input1, INPUT1_oset=0, INPUT2=self.writeFile('key', self.key),
+                INPUT2_oset=7, OUTPUT=self.writeFile('out', self.orig), ModifyMethod='appendBytes',
+                NumOfBytes=numBytes, ChunkSize=4096)
+
+  def poolDone(self):
+    # The pool has one thread: a task run by it after the job means the job has ended.
+    self.loop.run_until_complete(self.loop.run_in_executor(jmFUUtil._asyncExecutor(), int))
+
+  def testCancelRollsBack(self):
+    go = threading.Event()
+    self.feeder = fifoFeeder(self.path('fifo'), self.data, (16384, go))
+    first = self.loop.create_future()
+    def progress(done, total):
+      if not first.done():
+        first.set_result(done)
+    future = jmFUUtil.mixAsync(progress, self.loop, **self.job(self.path('fifo'), 100000))
+    self.assertGreater(self.loop.run_until_complete(first), 0)
+    future.cancel()
+    self.loop.run_until_complete(asyncio.sleep(0))
+    go.set()
+    self.poolDone()
+    self.assertTrue(future.cancelled())
+    self.assertEqual(self.readFile('out'), self.orig)
+
+  def testProgressThrottled(self):
+    jmFUUtil.asyncProgressInterval = 3600
+    calls = []
+    future = jmFUUtil.mixAsync(lambda done, total: calls.append((done, total)), self.loop,
+                               **self.job(self.writeFile('pad', self.data), 100000))
+    report = self.loop.run_until_complete(future)
+    self.assertTrue(report['ok'], report['log'])
+    self.assertEqual(self.readFile('out'), self.orig + referenceMix([(self.data, 0, False),
+                                                                     (self.key, 7, False)], 100000))
+    # The first chunk and the last one only.
+    self.assertEqual(len(calls), 2)
+    self.assertEqual(calls[-1], (100000, 100000))
+
+  def testLastProgressOfFailedJob(self):
+    jmFUUtil.asyncProgressInterval = 3600
+    self.feeder = fifoFeeder(self.path('fifo'), self.data[:10000])
+    calls = []
+    future = jmFUUtil.mixAsync(lambda done, total: calls.append((done, total)), self.loop,
+                               **self.job(self.path('fifo'), 100000))
+    report = self.loop.run_until_complete(future)
+    self.assertFalse(report['ok'])
+    self.loop.run_until_complete(asyncio.sleep(0))
+    self.assertEqual(len(calls), 2)
+    self.assertEqual(calls[-1], (10000, 100000))
+
+if __name__ == '__main__':
+  unittest.main()
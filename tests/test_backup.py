@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the copy layer (see copyFile(), copyRange()) and of the range-only backups.
+'''
+import os
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, osWithout, referenceMix
+
+class copyTest(tempDirTestCase):
+  '''
+  copyFile() and copyRange() by every way available: reflink, copy_file_range(), sendfile()
+  and the buffered copy.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.data = self.randomBytes(300000)
+    self.srcPath = self.writeFile('src', self.data)
+
+  def tearDown(self):
+    jmFUUtil.os = os
+    tempDirTestCase.tearDown(self)
+
+  def testCopyFile(self):
+    os.chmod(self.srcPath, 0o640)
+    os.utime(self.srcPath, (1000000000, 1200000000))
+    jmFUUtil.copyFile(self.srcPath, self.path('dst'))
+    self.assertEqual(self.readFile('dst'), self.data)
+    st = os.stat(self.path('dst'))
+    self.assertEqual(st.st_mode & 0o777, 0o640)
+    self.assertEqual(int(st.st_mtime), 1200000000)
+
+  def checkCopyRange(self):
+    dstPath = self.writeFile('dst', b'x' * 1000)
+    with open(self.srcPath, 'rb') as fsrc, open(dstPath, 'rb+') as fdst:
+      self.assertEqual(jmFUUtil.copyRange(fsrc.fileno(), fdst.fileno(), 12345, 200000, 500,
+                                          bufSize=65536), 200000)
+      # Up to the end of the source only: over the head of the bytes copied before.
+      self.assertEqual(jmFUUtil.copyRange(fsrc.fileno(), fdst.fileno(), 299000, 5000, 0), 1000)
+    self.assertEqual(self.readFile('dst'), self.data[299000:] + self.data[12345+500:12345+200000])
+
+  def testCopyRange(self):
+    self.checkCopyRange()
+
+  def testSendfile(self):
+    jmFUUtil.os = osWithout('copy_file_range')
+    self.checkCopyRange()
+
+  def testBuffered(self):
+    jmFUUtil.os = osWithout('copy_file_range', 'sendfile')
+    self.checkCopyRange()
+    jmFUUtil.os = os
+    jmFUUtil.copyFile(self.srcPath, self.path('dst'))
+    self.assertEqual(self.readFile('dst'), self.data)
+# *** ==============================================================================================
+
+class rangeBackupTest(tempDirTestCase):
+  '''
+  The range-only backup (see saveRangeBackup()) of the bytes to be overwritten: restored,
+  the file must be the original one byte for byte, its size too.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.orig = self.randomBytes(100000)
+    self.outPath = self.writeFile('out', self.orig)
+    self.bcpPath = self.path('out.bcp')
+
+  def checkRestore(self, offset, length, newData):
+    jmFUUtil.saveRangeBackup(self.outPath, self.bcpPath, offset, length)
+    saved = max(0, min(length, len(self.orig) - offset))
+    self.assertEqual(os.path.getsize(self.bcpPath), jmFUUtil._rangeBackupHead.size + saved)
+    with open(self.outPath, 'rb+') as fObj:
+      fObj.seek(offset, 0)
+      fObj.write(newData)
+    jmFUUtil.restoreRangeBackup(self.bcpPath, self.outPath)
+    self.assertEqual(self.readFile('out'), self.orig, (offset, length))
+
+  def testRestore(self):
+    self.checkRestore(1000, 5000, b'\xff' * 5000)
+    self.checkRestore(0, 100000, b'\x00' * 100000)
+
+  def testRestoreGrownFile(self):
+    # The range runs past the end of the file: it is cut back to the original size.
+    self.checkRestore(99000, 5000, b'\xff' * 5000)
+    self.checkRestore(100000, 10, b'\xff' * 10)
+
+  def testNotRangeBackup(self):
+    self.writeFile('out.bcp', self.orig[:1000])
+    with self.assertRaises(ValueError):
+      jmFUUtil.restoreRangeBackup(self.bcpPath, self.outPath)
+    self.assertEqual(self.readFile('out'), self.orig)
+
+  def testRewriteBytes(self):
+    pad = self.randomBytes(7000)
+    fw_obj = jmFUUtil.jmFU(INPUT1=self.writeFile('pad', pad), INPUT1_oset=3, OUTPUT=self.outPath,
+                           OUTPUT_oset=-30000, NumOfBytes=50000, ModifyMethod='rewriteBytes',
+                           BackupPath=self.bcpPath, RangeBackup=True)
+    logMsg, execFlag = fw_obj.run()
+    self.assertTrue(execFlag, logMsg)
+    self.assertEqual(self.readFile('out'),
+                     self.orig[:70000] + referenceMix([(pad, 3, False)], 50000))
+    self.assertEqual(os.path.getsize(self.bcpPath), jmFUUtil._rangeBackupHead.size + 30000)
+    jmFUUtil.restoreRangeBackup(self.bcpPath, self.outPath)
+    self.assertEqual(self.readFile('out'), self.orig)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the batch mode (see readManifest(), runBatch()) against the reference mixed bytes.
+'''
+import json
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+class batchTest(tempDirTestCase):
+  '''
+  A manifest of dependent and independent jobs run on two workers, with malformed lines among
+  them: those are reported as failed jobs, the others run.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(20000)
+    self.key = self.randomBytes(321)
+    self.padPath = self.writeFile('pad', self.pad)
+    self.keyPath = self.writeFile('key', self.key)
+
+  def job(self, outName, oset, numBytes, **kwopts):
+    job = dict(INPUT1=self.padPath, INPUT1_oset=oset, INPUT2=self.keyPath, INPUT2_oset=0,
+               OUTPUT=self.path(outName), NumOfBytes=numBytes)
+    job.update(kwopts)
+    return json.dumps(job)
+
+  def expected(self, oset, numBytes):
+    return referenceMix([(self.pad, oset, False), (self.key, 0, False)], numBytes)
+
+  def testManifest(self):
+    lines = [self.job('out1', 100, 5000),
+             '{"INPUT1": "pad", ',
+             '',
+             '[1, 2]',
+             self.job('out1', 7, 3000, ModifyMethod='appendBytes'),
+             self.job('out2', -50, 12345)]
+    manifest = self.writeFile('manifest.jsonl', '\n'.join(lines).encode('utf-8') + b'\n')
+    jobs = jmFUUtil.readManifest(manifest)
+    self.assertEqual(len(jobs), 5)
+    reports = jmFUUtil.runBatch(jobs, workers=2)
+    self.assertEqual([report['job'] for report in reports], list(range(5)))
+    self.assertEqual([report['ok'] for report in reports], [True, False, False, True, True])
+    self.assertIn('line 2 of the manifest', reports[1]['log'])
+    self.assertIn('line 4 of the manifest', reports[2]['log'])
+    self.assertEqual(reports[0]['stats']['bytes_written'], 5000)
+    self.assertEqual(self.readFile('out1'), self.expected(100, 5000) + self.expected(7, 3000))
+    self.assertEqual(self.readFile('out2'), self.expected(-50, 12345))
+
+  def testChains(self):
+    jobs = [json.loads(line) for line in (self.job('out1', 0, 10), self.job('out2', 0, 10),
+                                          self.job('out1', 0, 10, ModifyMethod='appendBytes'))]
+    jobs.append({'ManifestError': 'line 4 of the manifest: ...'})
+    chains = sorted(jmFUUtil._batchChains(jobs))
+    self.assertEqual(chains, [[0, 2], [1], [3]])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the benchmark (see benchCases(), compareBench()): the grid, the synthetic files,
+the cases run against the reference mixed bytes, the regressions found.
+'''
+import os
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+class benchTest(tempDirTestCase):
+  ''' The benchmark grid over small synthetic files. '''
+  numBytes = 20000
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    jmFUUtil.genBenchFiles(self.dirPath, self.numBytes, seed=5)
+
+  def testGrid(self):
+    cases = jmFUUtil.benchCases(self.dirPath, self.numBytes)
+    names = [name for name, kw in cases]
+    self.assertEqual(len(set(names)), len(names))
+    perMethod = 2 * 2 * len(jmFUUtil.benchShapes) * len(jmFUUtil.benchChunkSizes)
+    self.assertEqual(len(cases), perMethod * (2 * len(jmFUUtil.benchMethods) - 1))
+    # insertBytes can not run without Backup or Temporary Output.
+    self.assertFalse([name for name in names if name.startswith('insertBytes/')
+                      and name.endswith('/direct')])
+
+  def testFiles(self):
+    sizes = dict((name, os.path.getsize(self.path(name)))
+                 for name in ('out', 'pad1', 'pad2', 'tiny1', 'tiny2'))
+    self.assertEqual(sizes['out'], self.numBytes)
+    self.assertGreater(min(sizes['pad1'], sizes['pad2']), self.numBytes)
+    self.assertEqual((sizes['tiny1'], sizes['tiny2']), jmFUUtil.benchShapes['tiny'])
+    data = self.readFile('pad1')
+    jmFUUtil.genBenchFiles(self.dirPath, self.numBytes, seed=5)
+    self.assertEqual(self.readFile('pad1'), data)
+
+  def testCases(self):
+    # One run of a case per Modify Method, in this process.
+    orig = self.readFile('out')
+    for name, kw in jmFUUtil.benchCases(self.dirPath, self.numBytes):
+      if '/2in/not/tiny/cs4096/' not in name + '/':
+        continue
+      result = jmFUUtil._benchCase((name, kw, 1, jmFUUtil.mixEngine.name))
+      self.assertEqual(result[0], name)
+      self.assertGreater(result[1]['mb_per_s'], 0)
+      mixed = referenceMix([(self.readFile('tiny1'), 3, True), (self.readFile('tiny2'), 5, False)],
+                           self.numBytes)
+      method = name.split('/')[0]
+      expected = {'overwriteFile': mixed, 'appendBytes': orig + mixed,
+                  'rewriteBytes': orig[:self.numBytes // 2] + mixed,
+                  'insertBytes': orig[:self.numBytes // 2] + mixed + orig[self.numBytes // 2:]}
+      self.assertEqual(self.readFile('work'), expected[method], name)
+
+  def testCompare(self):
+    baseline = {'a': {'mb_per_s': 100.0, 'peak_rss_kb': 1000},
+                'b': {'mb_per_s': 100.0, 'peak_rss_kb': 1000},
+                'c': {'mb_per_s': 100.0, 'peak_rss_kb': None}}
+    results = {'a': {'mb_per_s': 90.0, 'peak_rss_kb': 1100, 'mix_mb_per_s': None},
+               'b': {'mb_per_s': 80.0, 'peak_rss_kb': 1200, 'mix_mb_per_s': 1.0},
+               'c': {'mb_per_s': 100.0, 'peak_rss_kb': 5000, 'mix_mb_per_s': 1.0},
+               'd': {'mb_per_s': 1.0, 'peak_rss_kb': 1, 'mix_mb_per_s': 1.0}}
+    regressions = jmFUUtil.compareBench(results, baseline)
+    self.assertEqual(len(regressions), 2)
+    self.assertTrue(all(msg.startswith('b: ') for msg in regressions))
+    table = jmFUUtil.formatBench(results, baseline).splitlines()
+    self.assertEqual(len(table), 5)
+    self.assertTrue(table[2].startswith('b ') and table[2].endswith('-20%'))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the daemon (see serveDaemon(), daemonRequest()): jobs sent over the socket, malformed
+requests among them, and the socket left by a daemon that is gone.
+'''
+import json
+import os
+import socket
+import threading
+import time
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+class daemonTest(tempDirTestCase):
+  '''
+  The daemon served by a thread until the stop event is set: the jobs of a connection are replied
+  in order, numbered within the connection, the wrong ones reported as failed.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(30000)
+    self.key = self.randomBytes(555)
+    self.padPath = self.writeFile('pad', self.pad)
+    self.keyPath = self.writeFile('key', self.key)
+    self.socketPath = self.path('jmfu.sock')
+    self.stop = threading.Event()
+    self.daemon = None
+
+  def tearDown(self):
+    if self.daemon is not None:
+      self.stop.set()
+      self.daemon.join()
+    tempDirTestCase.tearDown(self)
+
+  def startDaemon(self):
+    self.daemon = threading.Thread(target=jmFUUtil.serveDaemon,
+                                   args=(self.socketPath, 2, self.stop))
+    self.daemon.daemon = True
+    self.daemon.start()
+    for i in range(500):
+      if self.isListening():
+        return
+      time.sleep(0.01)
+    self.fail('The daemon does not listen')
+
+  def isListening(self):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      conn.connect(self.socketPath)
+    except socket.error:
+      return False
+    finally:
+      conn.close()
+    return True
+
+  def job(self, outName, oset, numBytes, **kwopts):
+    job = dict(INPUT1=self.padPath, INPUT1_oset=oset, INPUT2=self.keyPath, INPUT2_oset=3,
+               INPUT2_bwNot=True, OUTPUT=self.path(outName), NumOfBytes=numBytes)
+    job.update(kwopts)
+    return job
+
+  def expected(self, oset, numBytes):
+    return referenceMix([(self.pad, oset, False), (self.key, 3, True)], numBytes)
+
+  def testRoundTrip(self):
+    self.startDaemon()
+    reports = jmFUUtil.daemonRequest(self.socketPath, [
+      self.job('out', 10, 20000),
+      {'ManifestError': 'line 2 of the manifest: ...'},
+      self.job('out', -100, 5000, ModifyMethod='appendBytes')])
+    self.assertEqual([report['job'] for report in reports], [0, 1, 2])
+    self.assertEqual([report['ok'] for report in reports], [True, False, True])
+    self.assertIn('Wrong job request: line 2 of the manifest', reports[1]['log'])
+    self.assertEqual(reports[2]['stats']['bytes_written'], 5000)
+    self.assertEqual(self.readFile('out'), self.expected(10, 20000) + self.expected(-100, 5000))
+    # The Input File changed between the connections: the cache must not serve the old bytes.
+    self.pad = self.randomBytes(30000)
+    self.writeFile('pad', self.pad)
+    reports = jmFUUtil.daemonRequest(self.socketPath, [self.job('out', 0, 1000)])
+    self.assertEqual([(report['job'], report['ok']) for report in reports], [(0, True)])
+    self.assertEqual(self.readFile('out'), self.expected(0, 1000))
+
+  def testMalformedRequests(self):
+    self.startDaemon()
+    lines = [json.dumps(self.job('out1', 0, 3000)), '{"OUTPUT": ', '', '[1, 2]',
+             json.dumps(self.job('out2', 7, 4000))]
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(self.socketPath)
+    try:
+      conn.sendall('\n'.join(lines).encode('utf-8') + b'\n')
+      conn.shutdown(socket.SHUT_WR)
+      rObj = conn.makefile('rb')
+      reports = [json.loads(line.decode('utf-8')) for line in rObj]
+      rObj.close()
+    finally:
+      conn.close()
+    self.assertEqual([report['job'] for report in reports], [0, 1, 2, 3])
+    self.assertEqual([report['ok'] for report in reports], [True, False, False, True])
+    self.assertIn('Wrong job request', reports[1]['log'])
+    self.assertIn('a JSON object', reports[2]['log'])
+    self.assertEqual(self.readFile('out1'), self.expected(0, 3000))
+    self.assertEqual(self.readFile('out2'), self.expected(7, 4000))
+
+  def testStaleSocket(self):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(self.socketPath)
+    stale.close()
+    self.startDaemon()
+    # Accessible by the owner only.
+    self.assertEqual(os.stat(self.socketPath).st_mode & 0o077, 0)
+    with self.assertRaises(RuntimeError):
+      jmFUUtil.serveDaemon(self.socketPath, stop=self.stop)
+    self.stop.set()
+    self.daemon.join()
+    self.daemon = None
+    self.assertFalse(os.path.exists(self.socketPath))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the digests computed while writing (see runStats, hashingWriter) against the digests
+of the reference bytes and of the resulting files.
+'''
+import hashlib
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, roundBytes, referenceMix
+
+class digestTest(tempDirTestCase):
+  '''
+  Every Modify Method run with Digest and DigestOutput: the digest of the mixed bytes, of the whole
+  Output File and of the bytes read from every Input File.
+  '''
+  numBytes = 70001
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(50000)
+    self.key = self.randomBytes(999)
+    self.orig = self.randomBytes(30000)
+
+  def runJmFU(self, method, digest='sha256', **kwopts):
+    conf = dict(INPUT1=self.writeFile('pad', self.pad), INPUT1_oset=-3,
+                INPUT2=self.writeFile('key', self.key), INPUT2_oset=9, INPUT2_bwNot=True,
+                OUTPUT=self.writeFile('out', self.orig), OUTPUT_oset=1234, NumOfBytes=self.numBytes,
+                ChunkSize=4096, ModifyMethod=method, Digest=digest, DigestOutput=True)
+    conf.update(kwopts)
+    fw_obj = jmFUUtil.jmFU(**conf)
+    logMsg, execFlag = fw_obj.run()
+    self.assertTrue(execFlag, logMsg)
+    return fw_obj.stats, logMsg
+
+  def checkDigests(self, method, digest='sha256', **kwopts):
+    stats, logMsg = self.runJmFU(method, digest, **kwopts)
+    mixed = referenceMix([(self.pad, -3, False), (self.key, 9, True)], self.numBytes)
+    output = self.readFile('out')
+    self.assertIn(mixed, output)
+    digests = stats['digests']
+    self.assertEqual(stats['digest'], digest)
+    self.assertEqual(digests['mixed'], hashlib.new(digest, mixed).hexdigest(), method)
+    self.assertEqual(digests['output'], hashlib.new(digest, output).hexdigest(), method)
+    inputs = dict((inp['path'], inp['digest']) for inp in stats['inputs'])
+    self.assertEqual(inputs[self.path('pad')],
+                     hashlib.new(digest, roundBytes(self.pad, -3, self.numBytes)).hexdigest())
+    self.assertEqual(inputs[self.path('key')],
+                     hashlib.new(digest, roundBytes(self.key, 9, self.numBytes)).hexdigest())
+    self.assertIn('* %s of the mixed bytes: %s\n' % (digest, digests['mixed']), logMsg)
+    self.assertIn('* %s of the output bytes: %s\n' % (digest, digests['output']), logMsg)
+
+  def testOverwriteFile(self):
+    self.checkDigests('overwriteFile')
+
+  def testAppendBytes(self):
+    self.checkDigests('appendBytes')
+
+  def testRewriteBytes(self):
+    self.checkDigests('rewriteBytes')
+    self.checkDigests('rewriteBytes', OUTPUT_oset=-100, TmpOutPath=self.path('tmp'))
+
+  def testInsertBytes(self):
+    self.checkDigests('insertBytes', InsertInPlace=True)
+    self.checkDigests('insertBytes', TmpOutPath=self.path('tmp'))
+
+  def testOtherAlgorithm(self):
+    self.checkDigests('overwriteFile', 'md5')
+
+  def testWithJobs(self):
+    # The digests need the bytes in order: the parallel mode gives way to the serial one.
+    self.checkDigests('rewriteBytes', Jobs=2)
+
+  def testWithoutDigest(self):
+    stats, logMsg = self.runJmFU('overwriteFile', None)
+    self.assertNotIn('digests', stats)
+    self.assertNotIn(' of the mixed bytes: ', logMsg)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the Mixing Engines (see availableMixEngines()) against the byte by byte reference.
+'''
+import random
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+def refXor(s1, s2, bwNot=False):
+  mask = 255 if bwNot else 0
+  return bytes(bytearray(a ^ b ^ mask for a, b in zip(bytearray(s1), bytearray(s2))))
+
+class engineTest(unittest.TestCase):
+  '''
+  Every engine available (NumPy one only if NumPy is installed) on the strings of various lengths,
+  with leading / trailing zero bytes (the wordwise engine goes through long integers).
+  '''
+  def setUp(self):
+    rnd = random.Random(77)
+    self.engines = jmFUUtil.availableMixEngines()
+    self.samples = []
+    for n in (0, 1, 7, 8, 9, 4095, 4096, 65537):
+      s1 = bytes(bytearray(rnd.randrange(256) for i in range(n)))
+      s2 = bytes(bytearray(rnd.randrange(256) for i in range(n)))
+      self.samples.append((s1, s2))
+    self.samples.append((b'\x00\x00ab\x00', b'\x00\x00ab\x00'))
+    self.samples.append((b'\x00\xff' * 100, b'\x00\x01' * 100))
+    self.mixEngine = jmFUUtil.mixEngine
+
+  def tearDown(self):
+    jmFUUtil.mixEngine = self.mixEngine
+
+  def testEngineNames(self):
+    self.assertTrue(set(self.engines) <= set(jmFUUtil.mixEngineNames))
+    self.assertIn('bytewise', self.engines)
+    self.assertIn('wordwise', self.engines)
+    if jmFUUtil._importNumpy() is not None:
+      self.assertIn('numpy', self.engines)
+
+  def testXor(self):
+    for name, engine in self.engines.items():
+      for s1, s2 in self.samples:
+        self.assertEqual(engine.xor(s1, s2), refXor(s1, s2), (name, len(s1)))
+        self.assertEqual(engine.notxor(s1, s2), refXor(s1, s2, True), (name, len(s1)))
+        self.assertEqual(engine.bnot(s1), refXor(s1, b'\x00' * len(s1), True), (name, len(s1)))
+
+  def testShortestLength(self):
+    s1, s2 = self.samples[-3]
+    for name, engine in self.engines.items():
+      self.assertEqual(engine.xor(s1, s2[:17]), refXor(s1[:17], s2[:17]), name)
+      self.assertEqual(engine.notxor(s1[:5], s2), refXor(s1[:5], s2[:5], True), name)
+
+  def testInPlace(self):
+    for name, engine in self.engines.items():
+      for s1, s2 in self.samples:
+        pos = len(s1) // 3
+        buf = bytearray(s1)
+        engine.xorInto(buf, pos, s2[:len(s1) - pos])
+        self.assertEqual(bytes(buf), s1[:pos] + refXor(s1[pos:], s2), (name, len(s1)))
+        engine.notInto(buf, pos)
+        self.assertEqual(bytes(buf[:pos]), refXor(s1[:pos], b'\x00' * pos, True), (name, len(s1)))
+        self.assertEqual(bytes(buf[pos:]), refXor(s1[pos:], s2), (name, len(s1)))
+
+  def testSelect(self):
+    s1, s2 = self.samples[5]
+    for name in self.engines:
+      self.assertIs(jmFUUtil.selectMixEngine(name), jmFUUtil.mixEngine)
+      self.assertEqual(jmFUUtil.mixEngine.name, name)
+      self.assertEqual(jmFUUtil.sxor(s1, s2), refXor(s1, s2))
+      self.assertEqual(jmFUUtil.snotxor(s1, s2), refXor(s1, s2, True))
+      self.assertEqual(jmFUUtil.snot(s1), refXor(s1, b'\x00' * len(s1), True))
+    self.assertNotEqual(jmFUUtil.selectMixEngine('auto').name, 'bytewise')
+    with self.assertRaises(ValueError):
+      jmFUUtil.selectMixEngine('no-such-engine')
+# *** ==============================================================================================
+
+class engineWriteTest(tempDirTestCase):
+  ''' jm_write() by every engine available: two Input Files, one with Bitwise NOT. '''
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.mixEngine = jmFUUtil.mixEngine
+
+  def tearDown(self):
+    jmFUUtil.mixEngine = self.mixEngine
+    tempDirTestCase.tearDown(self)
+
+  def testJmWrite(self):
+    pad = self.randomBytes(30000)
+    key = self.randomBytes(4097)
+    opts = dict(INPUT1=self.writeFile('pad', pad), INPUT1_oset=-1000, INPUT1_bwNot=False,
+                INPUT2=self.writeFile('key', key), INPUT2_oset=33, INPUT2_bwNot=True,
+                NumOfBytes=100000, ChunkSize=8192)
+    expected = referenceMix([(pad, -1000, False), (key, 33, True)], 100000)
+    for name in jmFUUtil.availableMixEngines():
+      jmFUUtil.selectMixEngine(name)
+      with open(self.path('out'), 'wb') as ofObj:
+        jmFUUtil.jm_write(ofObj, **opts)
+      self.assertEqual(self.readFile('out'), expected, name)
+
+if __name__ == '__main__':
+  unittest.main()
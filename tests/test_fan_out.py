@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the fan-out jobs (see runFanOut(), fanOutTargets()) against the reference mixed bytes.
+'''
+import os
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+class fanOutTest(tempDirTestCase):
+  '''
+  One read pass written to several targets: by different Modify Methods, with and without
+  Bitwise NOT, one of them failing.
+  '''
+  numBytes = 100003
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(60000)
+    self.key = self.randomBytes(1001)
+    self.orig = self.randomBytes(7000)
+    self.conf = dict(INPUT1=self.writeFile('pad', self.pad), INPUT1_oset=-17, INPUT1_bwNot=False,
+                     INPUT2=self.writeFile('key', self.key), INPUT2_oset=5, INPUT2_bwNot=True,
+                     NumOfBytes=self.numBytes, ChunkSize=4096)
+
+  def mixed(self, bwNot=False):
+    return referenceMix([(self.pad, -17, False), (self.key, 5, not bwNot)], self.numBytes)
+
+  def testTargets(self):
+    self.writeFile('app', self.orig)
+    self.writeFile('rew', self.orig)
+    report = jmFUUtil.runJob(dict(self.conf, OUTPUT=self.path('out'), TARGETS=[
+      {'OUTPUT': self.path('app'), 'ModifyMethod': 'appendBytes', 'bwNot': True},
+      {'OUTPUT': self.path('rew'), 'OUTPUT_oset': 1000, 'ModifyMethod': 'rewriteBytes'}]))
+    self.assertTrue(report['ok'], report['log'])
+    self.assertEqual([target['ok'] for target in report['targets']], [True, True, True])
+    self.assertEqual(report['stats']['bytes_written'], self.numBytes)
+    self.assertEqual(self.readFile('out'), self.mixed())
+    self.assertEqual(self.readFile('app'), self.orig + self.mixed(True))
+    self.assertEqual(self.readFile('rew'), self.orig[:1000] + self.mixed())
+
+  def testFailingTarget(self):
+    # The target in the missing directory fails, the others are written anyway.
+    report = jmFUUtil.runJob(dict(self.conf, TARGETS=[
+      {'OUTPUT': self.path('out1')},
+      {'OUTPUT': os.path.join(self.path('missing'), 'out')},
+      {'OUTPUT': self.path('out2'), 'bwNot': True}]))
+    self.assertFalse(report['ok'])
+    self.assertEqual([target['ok'] for target in report['targets']], [True, False, True])
+    self.assertEqual(self.readFile('out1'), self.mixed())
+    self.assertEqual(self.readFile('out2'), self.mixed(True))
+
+  def testWrongTargets(self):
+    for targets in ([{'OUTPUT': self.path('out1'), 'NumOfBytes': 10}],
+                    [{'OUTPUT': self.path('out1')}, {'OUTPUT': self.path('out1')}],
+                    [{'OUTPUT': self.path('out1'), 'Checkpoint': True}]):
+      with self.assertRaises(ValueError):
+        jmFUUtil.fanOutTargets(dict(self.conf, TARGETS=targets))
+      report = jmFUUtil.runFanOut(dict(self.conf, TARGETS=targets))
+      self.assertFalse(report['ok'])
+      self.assertEqual(report['targets'], [])
+    self.assertFalse(os.path.exists(self.path('out1')))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the group commit of the deferred fsyncs (see fsyncGroup, _commitJobs()): every path
+fsync-ed once, the error of a path delivered to the tickets waiting for it only.
+'''
+import errno
+import os
+import threading
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+class recordingFsync:
+  ''' fsyncPath() recording the paths, failing with EIO for the given ones. '''
+  def __init__(self, *failing):
+    self.failing = set(failing)
+    self.paths = []
+    self.lock = threading.Lock()
+
+  def __call__(self, path):
+    with self.lock:
+      self.paths.append(path)
+    if path in self.failing:
+      raise OSError(errno.EIO, os.strerror(errno.EIO), path)
+# *** ----------------------------------------------------------------------------------------------
+
+class fsyncGroupTest(tempDirTestCase):
+  ''' The tickets of one group committed one after another and at the same time. '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.fsyncPath = jmFUUtil.fsyncPath
+    self.a = self.writeFile('a', b'a')
+    self.b = self.writeFile('b', b'b')
+
+  def tearDown(self):
+    jmFUUtil.fsyncPath = self.fsyncPath
+    tempDirTestCase.tearDown(self)
+
+  def testOncePerPath(self):
+    jmFUUtil.fsyncPath = fsync = recordingFsync()
+    group = jmFUUtil.fsyncGroup()
+    t1, t2 = group.ticket(), group.ticket()
+    for ticket, path in ((t1, self.a), (t1, self.path('')), (t2, self.b), (t2, self.path('')),
+                         (t2, self.b)):
+      ticket.add(path)
+    t1.commit()
+    # The files first, then the directory; the commit of t1 has done the paths of t2 as well.
+    self.assertEqual(fsync.paths, sorted([self.a, self.b]) + [os.path.abspath(self.path(''))])
+    t2.commit()
+    self.assertEqual(len(fsync.paths), 3)
+
+  def testErrorPerTicket(self):
+    jmFUUtil.fsyncPath = recordingFsync(self.b)
+    group = jmFUUtil.fsyncGroup()
+    t1, t2, t3 = group.ticket(), group.ticket(), group.ticket()
+    t1.add(self.a)
+    t2.add(self.b)
+    t3.add(self.a)
+    t3.add(self.b)
+    t1.commit()
+    with self.assertRaises(OSError) as cm:
+      t2.commit()
+    self.assertEqual(cm.exception.errno, errno.EIO)
+    with self.assertRaises(OSError):
+      t3.commit()
+    # The error is delivered once: nothing is left in the group.
+    t2.commit()
+    t1.add(self.a)
+    t1.commit()
+
+  def testRemovedPathSkipped(self):
+    group = jmFUUtil.fsyncGroup()
+    ticket = group.ticket()
+    ticket.add(self.a)
+    ticket.add(self.path('gone'))
+    ticket.commit()
+
+  def testConcurrentCommits(self):
+    started, go = threading.Event(), threading.Event()
+    fsync = recordingFsync(self.b)
+    def slowFsync(path):
+      if path == self.a:
+        started.set()
+        go.wait()
+      fsync(path)
+    jmFUUtil.fsyncPath = slowFsync
+    group = jmFUUtil.fsyncGroup()
+    t1, t2 = group.ticket(), group.ticket()
+    errors = {}
+    def commit(name, ticket):
+      try:
+        ticket.commit()
+      except OSError as e:
+        errors[name] = e
+    t1.add(self.a)
+    th1 = threading.Thread(target=commit, args=('t1', t1))
+    th1.start()
+    self.assertTrue(started.wait(10))
+    # Added while the commit of t1 is running: committed by the next one.
+    t2.add(self.b)
+    th2 = threading.Thread(target=commit, args=('t2', t2))
+    th2.start()
+    go.set()
+    th1.join()
+    th2.join()
+    self.assertEqual(fsync.paths, [self.a, self.b])
+    self.assertEqual(list(errors), ['t2'])
+# *** ==============================================================================================
+
+class commitJobsTest(tempDirTestCase):
+  '''
+  A failed group commit turns failed the reports of the jobs asking for durability only: through
+  _commitJobs() and through runBatch().
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.fsyncPath = jmFUUtil.fsyncPath
+    self.pad = self.randomBytes(10000)
+    self.padPath = self.writeFile('pad', self.pad)
+
+  def tearDown(self):
+    jmFUUtil.fsyncPath = self.fsyncPath
+    tempDirTestCase.tearDown(self)
+
+  def testCommitJobs(self):
+    jmFUUtil.fsyncPath = recordingFsync(os.path.abspath(self.path('bad')))
+    group = jmFUUtil.fsyncGroup()
+    jobs = [{'Durability': 'end'}, {'Durability': 'none'}, {'Durability': 'end'},
+            {'TARGETS': [{'Durability': 'none'}, {'Durability': 'end'}]}]
+    tickets = [group.ticket() for job in jobs]
+    for ticket in tickets[1:]:
+      ticket.add(self.path('bad'))
+    tickets[0].add(self.padPath)
+    reports = [{'ok': True, 'log': ''} for job in jobs]
+    jmFUUtil._commitJobs(tickets, jobs, reports)
+    self.assertEqual([report['ok'] for report in reports], [True, True, False, False])
+    self.assertIn('Can not fsync the files written', reports[2]['log'])
+    self.assertEqual(reports[1]['log'], '')
+
+  def testRunBatch(self):
+    jmFUUtil.fsyncPath = recordingFsync(os.path.abspath(self.path('out2')))
+    jobs = [dict(INPUT1=self.padPath, INPUT1_oset=i, OUTPUT=self.path('out%d' % i),
+                 NumOfBytes=5000, Durability=level)
+            for i, level in enumerate(('end', 'none', 'end'))]
+    reports = jmFUUtil.runBatch(jobs, workers=2)
+    self.assertEqual([report['ok'] for report in reports], [True, True, False])
+    self.assertIn('Can not fsync the files written', reports[2]['log'])
+    for i in range(3):
+      self.assertEqual(self.readFile('out%d' % i), referenceMix([(self.pad, i, False)], 5000))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of jm_write() and its writing paths against the reference mixed bytes (see referenceMix()).
+Run: python -m pytest tests  (or, in tests: python -m unittest discover)
+'''
+import threading
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, roundBytes, referenceMix
+
+class kernelCopyTest(tempDirTestCase):
+  '''
+  The single Input File without Bitwise NOT copied kernel-side (see _jm_write_copy()), wrapping
+  around its end several times.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.data = self.randomBytes(300000)
+    self.inPath = self.writeFile('pad', self.data)
+    self.piece = jmFUUtil.kernelCopyPiece
+
+  def tearDown(self):
+    jmFUUtil.kernelCopyPiece = self.piece
+    tempDirTestCase.tearDown(self)
+
+  def opts(self, **kwopts):
+    opts = dict(INPUT1=self.inPath, INPUT1_oset=-12345, INPUT1_bwNot=False, NumOfBytes=1000000,
+                ChunkSize=16384, TileBudget=0)
+    opts.update(kwopts)
+    return opts
+
+  def copy(self, stats=None, **kwopts):
+    head = self.randomBytes(777)
+    outPath = self.writeFile('out', head)
+    opts = self.opts(**kwopts)
+    with open(outPath, 'rb+') as ofObj:
+      ofObj.seek(len(head), 0)
+      self.assertTrue(jmFUUtil._kernelCopyApplies(ofObj, opts))
+      jmFUUtil.jm_write(ofObj, Stats=stats, **opts)
+    return head, self.readFile('out')
+
+  def testBytes(self):
+    head, data = self.copy()
+    self.assertEqual(data, head + roundBytes(self.data, -12345, 1000000))
+
+  def testBytesInSmallPieces(self):
+    jmFUUtil.kernelCopyPiece = 65536
+    head, data = self.copy(NumOfBytes=654321)
+    self.assertEqual(data, head + roundBytes(self.data, -12345, 654321))
+
+  def testProgressPerPiece(self):
+    jmFUUtil.kernelCopyPiece = 65536
+    done = []
+    stats = jmFUUtil.runStats(lambda n, total: done.append(n), 1000000)
+    self.copy(stats)
+    self.assertEqual(done[-1], 1000000)
+    steps = [b - a for a, b in zip([0] + done, done)]
+    self.assertGreater(len(steps), 1000000 // 65536)
+    self.assertLessEqual(max(steps), 65536)
+
+  def testCancelAtPiece(self):
+    jmFUUtil.kernelCopyPiece = 65536
+    cancel = threading.Event()
+    stats = jmFUUtil.runStats(lambda n, total: cancel.set(), 1000000, cancel=cancel)
+    with self.assertRaises(jmFUUtil.runCancelled):
+      self.copy(stats)
+    # Stopped after the first piece: up to the end of the Input File, 12345 bytes from the offset.
+    self.assertEqual(stats.bytesWritten, 12345)
+    self.assertEqual(stats.chunks, 1)
+    self.assertEqual(len(self.readFile('out')), 777 + 12345)
+# *** ==============================================================================================
+
+class parallelTest(tempDirTestCase):
+  '''
+  jm_write() with Jobs > 1 (see jm_write_parallel()): the segments of the output range mixed
+  by a pool of processes must make up the bytes of the serial run, in the middle of the file.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(50000)
+    self.key = self.randomBytes(3001)
+    self.orig = self.randomBytes(400000)
+
+  def opts(self, **kwopts):
+    opts = dict(INPUT1=self.writeFile('pad', self.pad), INPUT1_oset=-777, INPUT1_bwNot=False,
+                INPUT2=self.writeFile('key', self.key), INPUT2_oset=10, INPUT2_bwNot=True,
+                NumOfBytes=300000, ChunkSize=4096, Jobs=3)
+    opts.update(kwopts)
+    return opts
+
+  def expected(self, n):
+    return referenceMix([(self.pad, -777, False), (self.key, 10, True)], n)
+
+  def testBytes(self):
+    outPath = self.writeFile('out', self.orig)
+    stats = jmFUUtil.runStats()
+    with open(outPath, 'rb+') as ofObj:
+      ofObj.seek(999, 0)
+      self.assertEqual(jmFUUtil.jm_write(ofObj, Stats=stats, **self.opts()), 4096)
+      self.assertEqual(ofObj.tell(), 999 + 300000)
+    self.assertEqual(self.readFile('out'),
+                     self.orig[:999] + self.expected(300000) + self.orig[999+300000:])
+    # The statistics of the workers are merged.
+    self.assertEqual(stats.bytesWritten, 300000)
+    self.assertEqual(stats.chunks, sum(-(-segLen // 4096) for segStart, segLen in
+                                       jmFUUtil.splitRange(300000, 3 * 4, 4096)))
+    self.assertEqual(sorted(stats.inputs), sorted([self.path('pad'), self.path('key')]))
+
+  def testAppend(self):
+    outPath = self.writeFile('out', self.orig[:5000])
+    with open(outPath, 'ab') as ofObj:
+      jmFUUtil.jm_write(ofObj, **self.opts(NumOfBytes=100001, Jobs=2))
+    self.assertEqual(self.readFile('out'), self.orig[:5000] + self.expected(100001))
+
+  def testRun(self):
+    outPath = self.writeFile('out', self.orig)
+    fw_obj = jmFUUtil.jmFU(**self.opts(OUTPUT=outPath, OUTPUT_oset=123,
+                                       ModifyMethod='rewriteBytes'))
+    logMsg, execFlag = fw_obj.run()
+    self.assertTrue(execFlag, logMsg)
+    self.assertEqual(self.readFile('out'),
+                     self.orig[:123] + self.expected(300000) + self.orig[123+300000:])
+
+  def testSplitRange(self):
+    for total, parts, align in ((300000, 12, 4096), (10, 4, 4096), (4096 * 8, 8, 4096), (1, 3, 1),
+                                (12345, 7, 1)):
+      segments = jmFUUtil.splitRange(total, parts, align)
+      self.assertLessEqual(len(segments), parts)
+      self.assertEqual([start for start, length in segments],
+                       [sum(length for start, length in segments[:i]) for i in range(len(segments))])
+      self.assertEqual(sum(length for start, length in segments), total)
+      self.assertTrue(all(length % align == 0 for start, length in segments[:-1]))
+# *** ==============================================================================================
+
+class nWayTest(tempDirTestCase):
+  '''
+  Any number of Input Files (INPUTS, see getInputs()) mixed in one pass: Bitwise NOT is applied
+  to the result by the parity of the inputs having it.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.datas = [self.randomBytes(n) for n in (20000, 333, 7001, 1, 65536)]
+    self.paths = [self.writeFile('in%d' % i, data) for i, data in enumerate(self.datas)]
+
+  def write(self, inputs, numBytes=100000, **kwopts):
+    # inputs: (index, offset, bwNot) tuples of Input File 1 and INPUTS (of the reference, if kwopts
+    # pass them otherwise).
+    (i1, oset1, not1), rest = inputs[0], inputs[1:]
+    opts = dict(INPUT1=self.paths[i1], INPUT1_oset=oset1, INPUT1_bwNot=not1, NumOfBytes=numBytes,
+                ChunkSize=4096, INPUTS=[(self.paths[i], oset, bwNot) for i, oset, bwNot in rest])
+    opts.update(kwopts)
+    with open(self.path('out'), 'wb') as ofObj:
+      jmFUUtil.jm_write(ofObj, **opts)
+    expected = referenceMix([(self.datas[i], oset, bwNot) for i, oset, bwNot in inputs], numBytes)
+    self.assertEqual(self.readFile('out'), expected, inputs)
+
+  def testParity(self):
+    for nots in ((False,) * 5, (True,) + (False,) * 4, (True, False, True, False, False),
+                 (True,) * 5, (False, True, True, True, False)):
+      self.write([(i, 17 * i - 40, bwNot) for i, bwNot in enumerate(nots)])
+
+  def testWithInput2(self):
+    self.write([(0, 5, False), (1, -1, True), (2, 0, False), (4, 70000, True)],
+               INPUT2=self.paths[1], INPUT2_oset=-1, INPUT2_bwNot=True,
+               INPUTS=[(self.paths[2], 0, False), (self.paths[4], 70000, True)])
+
+  def testRun(self):
+    fw_obj = jmFUUtil.jmFU(INPUT1=self.paths[0], INPUT1_oset=0, INPUTS=[(self.paths[2], 9, True),
+                           (self.paths[3], 0, False)], OUTPUT=self.path('out'), NumOfBytes=30000)
+    logMsg, execFlag = fw_obj.run()
+    self.assertTrue(execFlag, logMsg)
+    self.assertEqual(self.readFile('out'), referenceMix([(self.datas[0], 0, False),
+                                                         (self.datas[2], 9, True),
+                                                         (self.datas[3], 0, False)], 30000))
+
+  def testSameInputRefused(self):
+    with self.assertRaises(ValueError):
+      jmFUUtil.prepareConfig(dict(INPUT1=self.paths[0], INPUTS=[(self.paths[1], 0, False),
+                                  (self.paths[0], 5, True)], OUTPUT=self.path('out')))
+
+  def testShiftInputs(self):
+    opts = jmFUUtil.shiftInputs(dict(INPUT1='a', INPUT1_oset=1, INPUT1_bwNot=False, NumOfBytes=100,
+                                     INPUTS=[('b', -3, True)]), 10)
+    self.assertEqual(jmFUUtil.getInputs(opts), [('a', 11, False), ('b', 7, True)])
+    self.assertEqual(opts['NumOfBytes'], 90)
+
+  def testInputSpec(self):
+    for spec, parsed in (('a', ('a', 0, False)), ('a:5', ('a', 5, False)),
+                         ('a:-5:not', ('a', -5, True)), ('a:NOT', ('a', 0, True)),
+                         ('d:x/f', ('d:x/f', 0, False)), ('d:x/f:12', ('d:x/f', 12, False))):
+      self.assertEqual(jmFUUtil.inputSpec(spec), parsed, spec)
+    with self.assertRaises(Exception):
+      jmFUUtil.inputSpec(':not')
+# *** ==============================================================================================
+
+class failingWriter:
+  ''' Output File object failing (IOError) at its write call number "failAt" (counted from 1). '''
+  def __init__(self, failAt):
+    self.failAt = failAt
+    self.chunks = []
+
+  def write(self, data):
+    if len(self.chunks) + 1 == self.failAt:
+      raise IOError('No space left on the simulated device')
+    self.chunks.append(bytes(bytearray(data)))
+# *** ----------------------------------------------------------------------------------------------
+
+class pipelineTest(tempDirTestCase):
+  '''
+  jm_write() with PipelineDepth > 1 (see _jm_write_pipelined()): the reading, mixing and writing
+  threads must deliver the bytes of the serial run, in order, and stop on an error or cancel.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(100000)
+    self.key = self.randomBytes(5555)
+
+  def opts(self, **kwopts):
+    opts = dict(INPUT1=self.writeFile('pad', self.pad), INPUT1_oset=-1, INPUT1_bwNot=True,
+                INPUT2=self.writeFile('key', self.key), INPUT2_oset=2, INPUT2_bwNot=False,
+                NumOfBytes=250001, ChunkSize=4096, PipelineDepth=3, TileBudget=0)
+    opts.update(kwopts)
+    return opts
+
+  def testDepths(self):
+    expected = referenceMix([(self.pad, -1, True), (self.key, 2, False)], 250001)
+    for depth in (1, 2, 3, 8):
+      stats = jmFUUtil.runStats()
+      with open(self.path('out'), 'wb') as ofObj:
+        jmFUUtil.jm_write(ofObj, Stats=stats, **self.opts(PipelineDepth=depth))
+      self.assertEqual(self.readFile('out'), expected, depth)
+      self.assertEqual(stats.chunks, -(-250001 // 4096), depth)
+      self.assertEqual(stats.bytesWritten, 250001, depth)
+      self.assertEqual(stats.inputs[self.path('pad')], [250001, 3])
+
+  def testWriteError(self):
+    ofObj = failingWriter(5)
+    with self.assertRaises(IOError):
+      jmFUUtil.jm_write(ofObj, **self.opts())
+    self.assertEqual(b''.join(ofObj.chunks),
+                     referenceMix([(self.pad, -1, True), (self.key, 2, False)], 4 * 4096))
+
+  def testCancel(self):
+    cancel = threading.Event()
+    stats = jmFUUtil.runStats(lambda done, total: done >= 3 * 4096 and cancel.set(), 250001,
+                              cancel=cancel)
+    ofObj = failingWriter(None)
+    with self.assertRaises(jmFUUtil.runCancelled):
+      jmFUUtil.jm_write(ofObj, Stats=stats, **self.opts())
+    self.assertEqual(len(ofObj.chunks), 3)
+    self.assertEqual(stats.bytesWritten, 3 * 4096)
+# *** ==============================================================================================
+
+class fakeClockWriter:
+  '''
+  Output File object advancing the fake clock (see autoChunkTest) by the time the write of a chunk
+  of its length takes at the throughput given by rates: chunk length --> bytes per second.
+  '''
+  def __init__(self, clock, rates):
+    self.clock = clock
+    self.rates = rates
+    self.sizes = []
+
+  def write(self, data):
+    self.sizes.append(len(data))
+    self.clock[0] += float(len(data)) / self.rates[len(data)]
+# *** ----------------------------------------------------------------------------------------------
+
+class autoChunkTest(tempDirTestCase):
+  '''
+  'auto' ChunkSize (see _tuneChunkSize()): the first chunks of growing sizes are timed, the best
+  size is used for the rest; the bytes must not depend on it.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.randomBytes(300000)
+    self.key = self.randomBytes(1000)
+    self.timer = jmFUUtil.default_timer
+
+  def tearDown(self):
+    jmFUUtil.default_timer = self.timer
+    tempDirTestCase.tearDown(self)
+
+  def opts(self, **kwopts):
+    opts = dict(INPUT1=self.writeFile('pad', self.pad), INPUT1_oset=77, INPUT1_bwNot=False,
+                INPUT2=self.writeFile('key', self.key), INPUT2_oset=0, INPUT2_bwNot=True,
+                NumOfBytes=1000003, ChunkSize='auto', AutoChunkLimit=262144, TileBudget=0)
+    opts.update(kwopts)
+    return opts
+
+  def expected(self, n=1000003):
+    return referenceMix([(self.pad, 77, False), (self.key, 0, True)], n)
+
+  def testBytes(self):
+    with open(self.path('out'), 'wb') as ofObj:
+      chunkSize = jmFUUtil.jm_write(ofObj, **self.opts())
+    self.assertIn(chunkSize, (16384, 32768, 65536, 131072, 262144))
+    self.assertEqual(self.readFile('out'), self.expected())
+
+  def testTiledInput(self):
+    # The sizes tried are multiples of the pattern period of the tiled key too.
+    with open(self.path('out'), 'wb') as ofObj:
+      chunkSize = jmFUUtil.jm_write(ofObj, **self.opts(TileBudget=4096, AutoChunkLimit=1048576))
+    self.assertEqual(chunkSize % 1000, 0)
+    self.assertEqual(self.readFile('out'), self.expected())
+
+  def tune(self, rates, numBytes, limit):
+    clock = [0.0]
+    jmFUUtil.default_timer = lambda: clock[0]
+    ofObj = fakeClockWriter(clock, rates)
+    readers = [jmFUUtil.roundReader(self.writeFile('pad', self.pad), 77),
+               jmFUUtil.roundReader(self.writeFile('key', self.key), 0)]
+    try:
+      result = jmFUUtil._tuneChunkSize(ofObj, readers, numBytes, True, limit, 4096)
+    finally:
+      for rdr in readers:
+        rdr.close()
+    return result, ofObj.sizes
+
+  def testBestThroughput(self):
+    rates = {16384: 100e6, 32768: 200e6, 65536: 300e6, 131072: 150e6, 262144: 400e6}
+    (chunkSize, done), sizes = self.tune(rates, 10**7, 1048576)
+    # Stopped at the first noticeable drop: the larger sizes are not tried.
+    self.assertEqual(sizes, [16384, 32768, 65536, 131072])
+    self.assertEqual((chunkSize, done), (65536, sum(sizes)))
+
+  def testSmallDropTolerated(self):
+    rates = {16384: 100e6, 32768: 95e6, 65536: 300e6, 131072: 290e6, 262144: 280e6}
+    (chunkSize, done), sizes = self.tune(rates, 10**7, 262144)
+    self.assertEqual(sizes, [16384, 32768, 65536, 131072, 262144])
+    self.assertEqual(chunkSize, 65536)
+
+  def testShortRun(self):
+    rates = dict((n, 100e6) for n in (16384, 32768, 20000))
+    (chunkSize, done), sizes = self.tune(rates, 16384 + 32768 + 20000, 1048576)
+    self.assertEqual(sizes, [16384, 32768, 20000])
+    self.assertEqual(done, 16384 + 32768 + 20000)
+
+  def testRun(self):
+    fw_obj = jmFUUtil.jmFU(**self.opts(OUTPUT=self.path('out')))
+    logMsg, execFlag = fw_obj.run()
+    self.assertTrue(execFlag, logMsg)
+    self.assertIn('* Chunk Size chosen: ' + str(fw_obj.stats['chunk_size']) + '\n', logMsg)
+    self.assertEqual(self.readFile('out'), self.expected())
+
+if __name__ == '__main__':
+  unittest.main()
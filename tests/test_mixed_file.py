@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the virtual mixed file (see mixedFile) against the bytes jm_write() writes.
+'''
+import os
+import unittest
+
+from support import jmFUUtil, tempDirTestCase
+
+class mixedFileTest(tempDirTestCase):
+  '''
+  Random reads of a mixedFile -- any offsets and lengths, across its blocks and past its end --
+  must give the bytes of the file written by jm_write() with the same options.
+  '''
+  numBytes = 300007
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.opts = dict(INPUT1=self.writeFile('pad', self.randomBytes(100000)), INPUT1_oset=-5,
+                     INPUT1_bwNot=False, INPUT2=self.writeFile('key', self.randomBytes(777)),
+                     INPUT2_oset=3, INPUT2_bwNot=True, NumOfBytes=self.numBytes, ChunkSize=4096,
+                     INPUTS=[(self.writeFile('salt', self.randomBytes(12345)), 100, True)])
+
+  def written(self, **kwopts):
+    opts = dict(self.opts, **kwopts)
+    with open(self.path('out'), 'wb') as ofObj:
+      jmFUUtil.jm_write(ofObj, **opts)
+    return self.readFile('out')
+
+  def checkRandomReads(self, **kwopts):
+    data = self.written(**kwopts)
+    with jmFUUtil.mixedFile(blockSize=4096, cacheBlocks=4, **dict(self.opts, **kwopts)) as mf:
+      self.assertEqual(len(mf), len(data))
+      for i in range(200):
+        pos = self.rnd.randrange(len(data) + 100)
+        n = self.rnd.choice((0, 1, 100, 4095, 4096, 4097, 20000))
+        self.assertEqual(mf.seek(pos), pos)
+        self.assertEqual(mf.read(n), data[pos:pos+n], (pos, n, kwopts))
+        self.assertEqual(mf.tell(), max(pos, min(pos + n, len(data))))
+        self.assertLessEqual(len(mf._cache), 4)
+      mf.seek(0)
+      self.assertEqual(mf.read(), data)
+
+  def testRoundReaders(self):
+    self.checkRandomReads(TileBudget=0)
+
+  def testMmapReaders(self):
+    self.checkRandomReads(TileBudget=0, UseMmap=True)
+
+  def testTiledReaders(self):
+    self.checkRandomReads(TileBudget=jmFUUtil.defaultTileBudget)
+
+  def testSingleInput(self):
+    self.checkRandomReads(INPUT2=None, INPUTS=[])
+
+  def testSeekAndReadinto(self):
+    data = self.written()
+    with jmFUUtil.mixedFile(**self.opts) as mf:
+      mf.seek(-1000, 2)
+      mf.seek(-10, 1)
+      buf = bytearray(2000)
+      self.assertEqual(mf.readinto(buf), 1010)
+      self.assertEqual(bytes(buf[:1010]), data[-1010:])
+      self.assertEqual(mf.read(5), b'')
+      with self.assertRaises(ValueError):
+        mf.seek(-1)
+
+  def testNumOfBytesOfInput1(self):
+    with jmFUUtil.mixedFile(**dict(self.opts, NumOfBytes=0)) as mf:
+      self.assertEqual(len(mf), 100000)
+
+  def testStreamRefused(self):
+    os.mkfifo(self.path('fifo'))
+    with self.assertRaises(ValueError):
+      jmFUUtil.mixedFile(**dict(self.opts, INPUT2=self.path('fifo')))
+
+if __name__ == '__main__':
+  unittest.main()
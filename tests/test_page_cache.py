@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the page cache control of the Output File (see pageCacheWriter): the bytes written
+by every mode, the writeback windows, the buffered writing where O_DIRECT is not available.
+'''
+import os
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, osWithout, referenceMix
+
+class pageCacheWriterTest(tempDirTestCase):
+  '''
+  The wrapper written from an unaligned position of an existing file, by chunks of various
+  lengths: the file must be the original head and the bytes written, ofObj positioned after them.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.syncFileRange = jmFUUtil._syncFileRange
+    self.fadvise = jmFUUtil._fadvise
+    self.syncs, self.advices = [], []
+    jmFUUtil._syncFileRange = lambda fd, offset, length, flags: \
+                                self.syncs.append((offset, length, flags))
+    jmFUUtil._fadvise = lambda fd, offset, length, advice: \
+                          self.advices.append((offset, length, advice))
+    self.orig = self.randomBytes(5000)
+    self.data = self.randomBytes(300001)
+
+  def tearDown(self):
+    jmFUUtil._syncFileRange = self.syncFileRange
+    jmFUUtil._fadvise = self.fadvise
+    jmFUUtil.os = os
+    tempDirTestCase.tearDown(self)
+
+  def write(self, **kwopts):
+    self.writeFile('out', self.orig)
+    with open(self.path('out'), 'rb+') as ofObj:
+      ofObj.seek(1001, 0)
+      pw = jmFUUtil.pageCacheWriter(ofObj, bufSize=65536, **kwopts)
+      direct = pw.directFd is not None
+      pos = 0
+      for n in (1, 4095, 3, 70000, 4096, 100000, 8192):
+        pw.write(self.data[pos:pos+n])
+        pos += n
+      pw.write(self.data[pos:])
+      pw.close()
+      self.assertEqual(ofObj.tell(), 1001 + len(self.data))
+    self.assertEqual(self.readFile('out'), self.orig[:1001] + self.data)
+    return direct
+
+  def windows(self, flags):
+    return [(offset, length) for offset, length, f in self.syncs if f == flags]
+
+  def testPlain(self):
+    self.write()
+    self.assertEqual(self.syncs, [])
+    self.assertEqual(self.advices, [])
+
+  def testSyncEvery(self):
+    self.write(syncEvery=65536)
+    started = self.windows(jmFUUtil.SYNC_FILE_RANGE_WRITE)
+    # The windows follow each other from the start position to the end of the bytes written.
+    pos = 1001
+    for offset, length in started:
+      self.assertEqual(offset, pos)
+      pos += length
+    self.assertEqual(pos, 1001 + len(self.data))
+    self.assertTrue(all(length >= 65536 for offset, length in started[:-1]))
+    # Every window started is waited for.
+    waited = self.windows(jmFUUtil.SYNC_FILE_RANGE_WAIT_BEFORE | jmFUUtil.SYNC_FILE_RANGE_WRITE |
+                          jmFUUtil.SYNC_FILE_RANGE_WAIT_AFTER)
+    self.assertEqual(waited, started)
+    self.assertEqual(self.advices, [])
+
+  def testDropBehind(self):
+    self.write(syncEvery=65536, dropBehind=True)
+    self.assertEqual([(offset, length) for offset, length, advice in self.advices],
+                     self.windows(jmFUUtil.SYNC_FILE_RANGE_WRITE))
+    self.assertEqual(set(advice for offset, length, advice in self.advices),
+                     set([jmFUUtil.POSIX_FADV_DONTNEED]))
+
+  def testDirect(self):
+    self.write(direct=True)
+    self.write(direct=True, syncEvery=65536, dropBehind=True)
+
+  def testDirectNotAvailable(self):
+    jmFUUtil.os = osWithout('O_DIRECT')
+    self.assertFalse(self.write(direct=True))
+# *** ==============================================================================================
+
+class pageCacheRunTest(tempDirTestCase):
+  ''' jmFU runs with the page cache options: the Output File against the reference mixed bytes. '''
+
+  def testModifyMethods(self):
+    pad = self.randomBytes(50000)
+    key = self.randomBytes(333)
+    orig = self.randomBytes(20000)
+    expected = referenceMix([(pad, 11, False), (key, 0, True)], 123457)
+    for method, result in (('overwriteFile', expected), ('appendBytes', orig + expected),
+                           ('rewriteBytes', orig[:777] + expected)):
+      for opts in ({'CacheHints': True}, {'DirectIO': True}, {'SyncEvery': 65536},
+                   {'CacheHints': True, 'DirectIO': True, 'SyncEvery': 65536}):
+        fw_obj = jmFUUtil.jmFU(INPUT1=self.writeFile('pad', pad), INPUT1_oset=11,
+                               INPUT2=self.writeFile('key', key), INPUT2_bwNot=True,
+                               OUTPUT=self.writeFile('out', orig), OUTPUT_oset=777,
+                               NumOfBytes=123457, ChunkSize=10000, ModifyMethod=method, **opts)
+        logMsg, execFlag = fw_obj.run()
+        self.assertTrue(execFlag, logMsg)
+        self.assertEqual(self.readFile('out'), result, (method, opts))
+
+if __name__ == '__main__':
+  unittest.main()
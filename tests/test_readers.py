@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the Input File readers (see openReader()) and of mixChunks() against the reference
+bytes (see roundBytes(), referenceMix()).
+'''
+import hashlib
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, fifoFeeder, roundBytes, referenceMix
+
+def asBytes(v):
+  # A slice delivered by a reader: memoryview, or a string (python 2 mmap).
+  return v.tobytes() if hasattr(v, 'tobytes') else bytes(v)
+
+class roundReaderTest(tempDirTestCase):
+  '''
+  The reader of the class readerClass reading the Input File in round-robin manner from various
+  offsets, in the pieces shorter and longer than the file, against roundBytes(); and jm_write()
+  with the reader options writeOpts against the reference mixed bytes.
+  '''
+  readerClass = jmFUUtil.roundReader
+  writeOpts = dict(UseMmap=False, TileBudget=0)
+  offsets = (0, 1, 999, -1, 12345, -2500)
+  pieces = (1, 10, 999, 1000, 1001, 2500, 7, 4096)
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.data = self.randomBytes(1000)
+    self.inPath = self.writeFile('pad', self.data)
+
+  def open(self, offset):
+    return self.readerClass(self.inPath, offset)
+
+  def testReadinto(self):
+    for oset in self.offsets:
+      with self.open(oset) as rdr:
+        got = []
+        for n in self.pieces:
+          buf = bytearray(n + 3)
+          self.assertEqual(rdr.readinto(buf, n), n)
+          got.append(bytes(buf[:n]))
+        self.assertEqual(b''.join(got), roundBytes(self.data, oset, sum(self.pieces)), oset)
+        self.assertEqual(rdr.bytesRead, sum(self.pieces))
+        self.assertEqual(rdr.start, oset % len(self.data))
+
+  def testSlices(self):
+    for oset in self.offsets:
+      with self.open(oset) as rdr:
+        got = []
+        for n in self.pieces:
+          piece = b''.join(asBytes(v) for v in rdr.slices(n))
+          self.assertEqual(len(piece), n)
+          got.append(piece)
+        self.assertEqual(b''.join(got), roundBytes(self.data, oset, sum(self.pieces)), oset)
+
+  def testSeek(self):
+    with self.open(-7) as rdr:
+      rdr.readinto(bytearray(1234), 1234)
+      for pos in (0, 5, 999, 1000, 3333):
+        rdr.seek(pos)
+        buf = bytearray(1500)
+        rdr.readinto(buf, 1500)
+        self.assertEqual(bytes(buf), roundBytes(self.data, pos - 7, 1500), pos)
+
+  def testHash(self):
+    with self.open(500) as rdr:
+      rdr.hashObj = hashlib.sha256()
+      for n in self.pieces:
+        for v in rdr.slices(n):
+          pass
+      self.assertEqual(rdr.hashObj.hexdigest(),
+                       hashlib.sha256(roundBytes(self.data, 500, sum(self.pieces))).hexdigest())
+
+  def testJmWrite(self):
+    key = self.randomBytes(77777)
+    opts = dict(INPUT1=self.writeFile('key', key), INPUT1_oset=3, INPUT1_bwNot=False,
+                INPUT2=self.inPath, INPUT2_oset=-10, INPUT2_bwNot=False,
+                NumOfBytes=200000, ChunkSize=4096)
+    opts.update(self.writeOpts)
+    with open(self.path('out'), 'wb') as ofObj:
+      jmFUUtil.jm_write(ofObj, **opts)
+    self.assertEqual(self.readFile('out'),
+                     referenceMix([(key, 3, False), (self.data, -10, False)], 200000))
+# *** ==============================================================================================
+
+class mmapReaderTest(roundReaderTest):
+  readerClass = jmFUUtil.mmapReader
+  writeOpts = dict(UseMmap=True, TileBudget=0)
+
+  def testOpenReader(self):
+    for useMmap, cls in ((False, jmFUUtil.roundReader), (True, jmFUUtil.mmapReader)):
+      rdr = jmFUUtil.openReader(self.inPath, 0, 5000, UseMmap=useMmap)
+      rdr.close()
+      self.assertIs(rdr.__class__, cls)
+
+  def testRoundRead(self):
+    with open(self.inPath, 'rb') as fObj:
+      fObj.seek(600, 0)
+      self.assertEqual(jmFUUtil.roundRead(fObj, 2500), roundBytes(self.data, 600, 2500))
+# *** ==============================================================================================
+
+class tileReaderTest(roundReaderTest):
+  readerClass = jmFUUtil.tileReader
+  writeOpts = dict(UseMmap=False, TileBudget=jmFUUtil.defaultTileBudget)
+
+  def testOpenReader(self):
+    # Only the files shorter than NumOfBytes and not over the TileBudget are tiled.
+    cases = ((5000, 1000, jmFUUtil.tileReader), (5000, 999, jmFUUtil.roundReader),
+             (1000, 4096, jmFUUtil.roundReader), (5000, 0, jmFUUtil.roundReader))
+    for numBytes, budget, cls in cases:
+      rdr = jmFUUtil.openReader(self.inPath, 0, numBytes, TileBudget=budget)
+      rdr.close()
+      self.assertIs(rdr.__class__, cls, (numBytes, budget))
+
+  def testAlignChunkSize(self):
+    with self.open(3) as rdr:
+      self.assertEqual(jmFUUtil.alignChunkSize(4096, [rdr]), 4000)
+      self.assertEqual(jmFUUtil.alignChunkSize(999, [rdr]), 999)
+      rdr.readinto(bytearray(4000), 4000)
+      self.assertEqual(rdr.phase, 0)
+
+  def testRepeatFill(self):
+    for period, pos, n in ((1, 1, 100), (7, 7, 7), (7, 10, 1000), (1000, 1000, 4321)):
+      buf = bytearray(n)
+      buf[:period] = self.data[:period]
+      buf[period:pos] = roundBytes(self.data[:period], 0, pos)[period:]
+      jmFUUtil._repeatFill(memoryview(buf), pos, n, period)
+      self.assertEqual(bytes(buf), roundBytes(self.data[:period], 0, n), (period, pos, n))
+# *** ==============================================================================================
+
+class streamTest(tempDirTestCase):
+  '''
+  Input File 1 as a stream (FIFO fed by a thread, see streamReader) mixed by mixChunks() with
+  a round-robin Input File.
+  '''
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.data = self.randomBytes(100000)
+    self.key = self.randomBytes(999)
+    self.keyPath = self.writeFile('key', self.key)
+    self.fifoPath = self.path('fifo')
+    self.feeder = None
+
+  def tearDown(self):
+    if self.feeder is not None:
+      self.feeder.finish()
+    tempDirTestCase.tearDown(self)
+
+  def feed(self, data):
+    self.feeder = fifoFeeder(self.fifoPath, data)
+    return self.fifoPath
+
+  def mix(self, input1, **kwopts):
+    opts = dict(INPUT1=input1, INPUT1_oset=0, INPUT1_bwNot=False,
+                INPUT2=self.keyPath, INPUT2_oset=-3, INPUT2_bwNot=True, ChunkSize=4096)
+    opts.update(kwopts)
+    return list(jmFUUtil.mixChunks(**opts))
+
+  def testStreamReader(self):
+    self.assertTrue(jmFUUtil.isStream(self.feed(self.data)))
+    rdr = jmFUUtil.openReader(self.fifoPath, 1000, float('inf'))
+    try:
+      buf = bytearray(65536)
+      got = []
+      while True:
+        n = rdr.readinto(buf, 65536)
+        got.append(bytes(buf[:n]))
+        if n < 65536:
+          break
+    finally:
+      rdr.close()
+    self.assertEqual(b''.join(got), self.data[1000:])
+    self.assertEqual(rdr.bytesRead, len(self.data) - 1000)
+
+  def testUpToEnd(self):
+    chunks = self.mix(self.feed(self.data), NumOfBytes=0)
+    self.assertTrue(all(type(chunk) is bytes for chunk in chunks))
+    self.assertEqual(set(len(chunk) for chunk in chunks[:-1]), set([4096]))
+    self.assertEqual(b''.join(chunks),
+                     referenceMix([(self.data, 0, False), (self.key, -3, True)], len(self.data)))
+
+  def testOffsetAndNumOfBytes(self):
+    chunks = self.mix(self.feed(self.data), INPUT1_oset=555, NumOfBytes=50000)
+    self.assertEqual(b''.join(chunks),
+                     referenceMix([(self.data[555:], 0, False), (self.key, -3, True)], 50000))
+
+  def testStreamTooShort(self):
+    with self.assertRaises(EOFError):
+      self.mix(self.feed(self.data), NumOfBytes=len(self.data) + 1)
+
+  def testOffsetBeyondEnd(self):
+    with self.assertRaises(EOFError):
+      self.mix(self.feed(self.data), INPUT1_oset=len(self.data) + 1)
+
+  def testOnlyInput1(self):
+    with self.assertRaises(ValueError):
+      self.mix(self.keyPath, INPUT2=self.feed(self.data))
+
+  def testFileAsInput1(self):
+    # NumOfBytes 0: the size of the file.
+    chunks = self.mix(self.writeFile('pad', self.data[:5000]), INPUT1_oset=-10, NumOfBytes=0)
+    self.assertEqual(b''.join(chunks), referenceMix([(self.data[:5000], -10, False),
+                                                     (self.key, -3, True)], 5000))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+'''
+Regression tests of the crash recovery paths of jmFUUtil: the journaled in-place opening of
+a gap (insertJournal / openGap()) and the resumption of checkpointed runs (runCheckpoint,
+--resume) for every Modify Method, and the pad usage ledger index (padLedger) against
+a brute-force model.
+Run: python -m pytest tests  (or, in tests: python -m unittest discover)
+'''
+import os
+import errno
+import unittest
+
+from support import jmFUUtil, crash, tempDirTestCase
+
+class crashingJournal(jmFUUtil.insertJournal):
+  '''
+  insertJournal crashing at its record number "crashAt" (counted from 1), "when":
+    * 'before' -- before the record is written (the previous step is done);
+    * 'after' -- once it is written and fsync-ed (its step is not done);
+    * 'torn' -- in the middle of the write of its step (see tearingFile).
+  crashAt=None only counts the records, their kinds are listed in "kinds", the lengths of their
+  data in "dataLens".
+  '''
+  def __init__(self, path, crashAt=None, when='before'):
+    jmFUUtil.insertJournal.__init__(self, path)
+    self.crashAt = crashAt
+    self.when = when
+    self.kinds = []
+    self.dataLens = []
+    self.tear = False
+
+  def record(self, kind, start, end, data=b''):
+    self.kinds.append(kind)
+    self.dataLens.append(len(data))
+    if len(self.kinds) == self.crashAt and self.when == 'before':
+      raise crash()
+    jmFUUtil.insertJournal.record(self, kind, start, end, data)
+    if len(self.kinds) == self.crashAt:
+      if self.when == 'after':
+        raise crash()
+      self.tear = self.when == 'torn'
+# *** ----------------------------------------------------------------------------------------------
+
+class tearingFile:
+  '''
+  File object wrapper writing only the first half of the data, then crashing, once its
+  crashingJournal is armed to tear the step of the record written.
+  '''
+  def __init__(self, fObj, journal):
+    self.fObj = fObj
+    self.journal = journal
+
+  def write(self, data):
+    if getattr(self.journal, 'tear', False):
+      self.fObj.write(data[:len(data) // 2])
+      self.fObj.flush()
+      raise crash()
+    return self.fObj.write(data)
+
+  def __getattr__(self, name):
+    return getattr(self.fObj, name)
+# *** ----------------------------------------------------------------------------------------------
+
+class openGapTest(tempDirTestCase):
+  '''
+  openGap() interrupted at every journal state, then run again with the journal left: the gap
+  must end up opened exactly once, the bytes before and after it intact.
+  '''
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.shiftMaxSteps = jmFUUtil.shiftMaxSteps
+
+  def tearDown(self):
+    jmFUUtil.shiftMaxSteps = self.shiftMaxSteps
+    tempDirTestCase.tearDown(self)
+
+  def openGap(self, fPath, offset, gap, journal, blockSize):
+    with open(fPath, 'rb+') as fObj:
+      return jmFUUtil.openGap(tearingFile(fObj, journal), offset, gap, journal, blockSize)
+
+  def checkAllCrashes(self, size, offset, gap, blockSize):
+    orig = self.randomBytes(size)
+    fPath = self.writeFile('out', orig)
+    jPath = self.path('jrn')
+    counter = crashingJournal(jPath)
+    oset = self.openGap(fPath, offset, gap, counter, blockSize)
+    counter.remove()
+    self.assertGreater(len(counter.kinds), 1)
+    for crashAt, kind in enumerate(counter.kinds, 1):
+      for when in ('before', 'after', 'torn'):
+        if when == 'torn' and kind != 'S':
+          continue  # only the block moves write to the file
+        self.writeFile('out', orig)
+        with self.assertRaises(crash):
+          self.openGap(fPath, offset, gap, crashingJournal(jPath, crashAt, when), blockSize)
+        journal = jmFUUtil.insertJournal(jPath)
+        self.assertEqual(self.openGap(fPath, offset, gap, journal, blockSize), oset)
+        journal.remove()
+        data = self.readFile('out')
+        msg = 'crash at record %d (%s, %s)' % (crashAt, kind, when)
+        self.assertEqual(len(data), size + gap, msg)
+        self.assertEqual(data[:oset], orig[:oset], msg)
+        self.assertEqual(data[oset+gap:], orig[oset:], msg)
+    return counter
+
+  def testShortBlocks(self):
+    # Blocks not longer than the gap: no data copies in the journal.
+    counter = self.checkAllCrashes(5000, 1234, 1000, 700)
+    self.assertEqual(set(counter.dataLens), set([0]))
+
+  def testShortTail(self):
+    # The tail of a short gap moved in few gap-sized blocks: no data copies in the journal either.
+    counter = self.checkAllCrashes(9000, 777, 1000, 3000)
+    self.assertEqual(set(counter.dataLens), set([0]))
+    self.assertEqual(counter.kinds.count('S'), 9)
+
+  def testOverlappingBlocks(self):
+    # A long tail of a short gap: the blocks are longer than the gap and overlap their targets,
+    # only their overlapping parts are journaled, a torn move is redone from the copy.
+    jmFUUtil.shiftMaxSteps = 4
+    counter = self.checkAllCrashes(9000, 777, 1000, 3000)
+    self.assertEqual(counter.dataLens, [2000, 2000, 1223, 0])
+
+  def testGapAtStart(self):
+    self.checkAllCrashes(4000, 0, 1001, 1500)
+
+  def testOtherGapRefused(self):
+    orig = self.randomBytes(3000)
+    fPath = self.writeFile('out', orig)
+    jPath = self.path('jrn')
+    with self.assertRaises(crash):
+      self.openGap(fPath, 100, 1000, crashingJournal(jPath, 2), 700)
+    with self.assertRaises(RuntimeError):
+      self.openGap(fPath, 100, 999, jmFUUtil.insertJournal(jPath), 700)
+# *** ==============================================================================================
+
+class resumeTest(tempDirTestCase):
+  '''
+  A checkpointed run of every Modify Method interrupted after some chunks, then resumed:
+  the result must match the uninterrupted run byte for byte.
+  '''
+  numBytes = 50000
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.pad = self.writeFile('pad', self.randomBytes(60000))
+    self.key = self.writeFile('key', self.randomBytes(777))
+    self.orig = self.randomBytes(20000)
+
+  def conf(self, **kwopts):
+    conf = dict(INPUT1=self.pad, INPUT1_oset=100, INPUT2=self.key, INPUT2_oset=5,
+                OUTPUT=self.path('out'), OUTPUT_oset=3000, NumOfBytes=self.numBytes,
+                ChunkSize=1024, TileBudget=0)
+    conf.update(kwopts)
+    return conf
+
+  def runJmFU(self, **kwopts):
+    fw_obj = jmFUUtil.jmFU(**kwopts)
+    logMsg, execFlag = fw_obj.run()
+    return execFlag, logMsg
+
+  def expected(self, conf):
+    self.writeFile('out', self.orig)
+    ok, logMsg = self.runJmFU(**conf)
+    self.assertTrue(ok, logMsg)
+    data = self.readFile('out')
+    for name in os.listdir(self.dirPath):
+      if name not in ('pad', 'key', 'out'):
+        os.remove(self.path(name))
+    return data
+
+  def loseUncommitted(self, conf, committed, written):
+    # The mixed bytes written after the last commit were not fsync-ed: lost in the crash.
+    state = jmFUUtil.runCheckpoint(jmFUUtil.genCheckpointPath(conf['OUTPUT'])).load()
+    start = state['out_pos'] + committed
+    with open(state['tmp'] or conf['OUTPUT'], 'rb+') as fObj:
+      fObj.seek(start, 0)
+      fObj.write(b'\0' * len(fObj.read(written - committed)))
+
+  def checkResume(self, **kwopts):
+    conf = self.conf(**kwopts)
+    expected = self.expected(conf)
+    every = 4
+    for stopAt in (1, 17, 33):
+      self.writeFile('out', self.orig)
+      def progress(done, total, stopAt=stopAt):
+        if done >= stopAt * conf['ChunkSize']:
+          raise crash()
+      ok, logMsg = self.runJmFU(Checkpoint=every, ProgressCallback=progress, **conf)
+      self.assertFalse(ok)
+      self.assertTrue(os.path.isfile(jmFUUtil.genCheckpointPath(conf['OUTPUT'])))
+      committed = stopAt // every * every * conf['ChunkSize']
+      self.loseUncommitted(conf, committed, stopAt * conf['ChunkSize'])
+      ok, logMsg = self.runJmFU(Checkpoint=every, Resume=True, **conf)
+      self.assertTrue(ok, logMsg)
+      self.assertIn('Resumed from the checkpoint at byte %d\n' % committed, logMsg)
+      self.assertEqual(self.readFile('out'), expected, 'stopped at chunk %d' % stopAt)
+      self.assertFalse(os.path.isfile(jmFUUtil.genCheckpointPath(conf['OUTPUT'])))
+
+  def testOverwriteFile(self):
+    self.checkResume(ModifyMethod='overwriteFile')
+
+  def testOverwriteFileTmp(self):
+    self.checkResume(ModifyMethod='overwriteFile', TmpOutPath=self.path('tmp'))
+
+  def testAppendBytes(self):
+    self.checkResume(ModifyMethod='appendBytes')
+
+  def testAppendBytesTmp(self):
+    self.checkResume(ModifyMethod='appendBytes', TmpOutPath=self.path('tmp'))
+
+  def testRewriteBytes(self):
+    self.checkResume(ModifyMethod='rewriteBytes')
+
+  def testRewriteBytesRangeBackup(self):
+    self.checkResume(ModifyMethod='rewriteBytes', BackupPath=self.path('bcp'), RangeBackup=True)
+
+  def testInsertBytesBackup(self):
+    self.checkResume(ModifyMethod='insertBytes', BackupPath=self.path('bcp'))
+
+  def testInsertBytesTmp(self):
+    self.checkResume(ModifyMethod='insertBytes', TmpOutPath=self.path('tmp'))
+
+  def testInsertBytesInPlace(self):
+    self.checkResume(ModifyMethod='insertBytes', InsertInPlace=True)
+
+  def checkLedgerResume(self, hard):
+    # The checkpointed run consuming a pad with the ledger, killed (hard) or failed midway, keeps
+    # its reservation pending: another run is refused the pad bytes, the resumed run takes the
+    # reservation over and settles it.
+    conf = self.conf(ModifyMethod='overwriteFile', Ledger=[self.pad])
+    expected = self.expected(dict(conf, Ledger=[]))
+    ldgPath = jmFUUtil.genLedgerPath(os.path.realpath(self.pad))
+    self.writeFile('out', self.orig)
+    def progress(done, total):
+      if done >= 17 * conf['ChunkSize']:
+        if hard:
+          os._exit(3)
+        raise crash()
+    if hard:
+      pid = os.fork()
+      if not pid:
+        try:
+          self.runJmFU(Checkpoint=4, ProgressCallback=progress, **conf)
+        finally:
+          os._exit(4)
+      self.assertEqual(os.waitpid(pid, 0)[1] >> 8, 3)
+    else:
+      ok, logMsg = self.runJmFU(Checkpoint=4, ProgressCallback=progress, **conf)
+      self.assertFalse(ok)
+      self.assertIn('The pad ranges stay reserved for --resume', logMsg)
+    self.assertEqual(len(jmFUUtil.padLedger(ldgPath).pending), 1)
+    ok, logMsg = self.runJmFU(**dict(conf, OUTPUT=self.path('other')))
+    self.assertFalse(ok)
+    self.assertIn('Pad reuse refused', logMsg)
+    ok, logMsg = self.runJmFU(Checkpoint=4, Resume=True, **conf)
+    self.assertTrue(ok, logMsg)
+    self.assertIn('Resumed from the checkpoint at byte 16384\n', logMsg)
+    self.assertEqual(self.readFile('out'), expected)
+    ldg = jmFUUtil.padLedger(ldgPath)
+    self.assertEqual(ldg.pending, set())
+    self.assertEqual(ldg.overlaps(0, 60000), [(100, 100 + self.numBytes)])
+    ok, logMsg = self.runJmFU(**dict(conf, OUTPUT=self.path('other')))
+    self.assertFalse(ok)
+    self.assertIn('Pad reuse refused', logMsg)
+
+  def testLedgerHardCrash(self):
+    self.checkLedgerResume(hard=True)
+
+  def testLedgerFailure(self):
+    self.checkLedgerResume(hard=False)
+# *** ==============================================================================================
+
+class padLedgerTest(tempDirTestCase):
+  '''
+  padLedger.overlaps() and nextFree() against a brute-force model: the set of the pad bytes used.
+  '''
+
+  def modelRuns(self, used, size):
+    # The maximal runs of used bytes: the merged ranges of the ledger index.
+    runs, start = [], None
+    for i in range(size + 1):
+      if i < size and i in used:
+        if start is None:
+          start = i
+      elif start is not None:
+        runs.append((start, i))
+        start = None
+    return runs
+
+  def modelNextFree(self, used, n, size, after):
+    if not size or n > size:
+      return None
+    for i in range(size):
+      oset = (after + i) % size
+      if all((oset + j) % size not in used for j in range(n)):
+        return oset
+    return None
+
+  def testAgainstModel(self):
+    for trial in range(60):
+      size = self.rnd.randint(1, 80)
+      path = self.path('ldg%d' % trial)
+      ledger = jmFUUtil.padLedger(path)
+      used = set()
+      for step in range(self.rnd.randint(0, 8)):
+        ranges = jmFUUtil.padRanges(size, self.rnd.randrange(size), self.rnd.randint(1, size))
+        ledger.record(ranges, output='o', method='overwriteFile')
+        for start, end in ranges:
+          used.update(range(start, end))
+        runs = self.modelRuns(used, size)
+        # The index, and its copy loaded from the log, hold the merged ranges.
+        for ldg in (ledger, jmFUUtil.padLedger(path)):
+          self.assertEqual(list(zip(ldg.starts, ldg.ends)), runs)
+        for start in range(size + 1):
+          for end in range(start, size + 1):
+            self.assertEqual(ledger.overlaps(start, end),
+                             [r for r in runs if start < end and r[0] < end and start < r[1]], (start, end))
+        for n in range(1, size + 2):
+          after = self.rnd.randrange(2 * size)
+          self.assertEqual(ledger.nextFree(n, size, after),
+                           self.modelNextFree(used, n, size, after % size), (n, after, runs))
+
+  def testSettledAfterFailedWrite(self):
+    # The kernel-side copy failing halfway through its first piece: no chunk is counted, but
+    # the pad bytes are out, so the whole ranges reserved are consumed.
+    pad = self.writeFile('pad', self.randomBytes(100000))
+    copyRange, reflinkRange = jmFUUtil.copyRange, jmFUUtil._reflinkRange
+    def failingCopy(fdIn, fdOut, inPos, count, outPos):
+      copyRange(fdIn, fdOut, inPos, count // 2, outPos)
+      raise OSError(errno.EIO, 'Simulated I/O error')
+    jmFUUtil.copyRange, jmFUUtil._reflinkRange = failingCopy, lambda *args: False
+    try:
+      logMsg, ok = jmFUUtil.jmFU(INPUT1=pad, INPUT1_oset=1000, OUTPUT=self.path('out'),
+                                 NumOfBytes=20000, TileBudget=0, Ledger=[pad]).run()
+    finally:
+      jmFUUtil.copyRange, jmFUUtil._reflinkRange = copyRange, reflinkRange
+    self.assertFalse(ok)
+    self.assertIn('Simulated I/O error', logMsg)
+    self.assertEqual(len(self.readFile('out')), 10000)
+    ldg = jmFUUtil.padLedger(jmFUUtil.genLedgerPath(os.path.realpath(pad)))
+    self.assertEqual(ldg.pending, set())
+    self.assertEqual(ldg.overlaps(0, 100000), [(1000, 21000)])
+
+  def testReservations(self):
+    path = self.path('ldg')
+    first = jmFUUtil.padLedger(path)
+    self.assertEqual(first.reserve([(10, 20)]), [])
+    second = jmFUUtil.padLedger(path)
+    # Refused: nothing is recorded.
+    self.assertEqual(second.reserve([(15, 30)]), [(10, 20)])
+    self.assertIsNone(second.reservation)
+    self.assertEqual(jmFUUtil.padLedger(path).overlaps(0, 100), [(10, 20)])
+    first.release()
+    self.assertEqual(jmFUUtil.padLedger(path).overlaps(0, 100), [])
+    self.assertEqual(second.reserve([(15, 30)]), [])
+    second.settle(ok=True)
+    self.assertEqual(jmFUUtil.padLedger(path).overlaps(0, 100), [(15, 30)])
+    # Reuse allowed (the 'warn' policy): recorded anyway.
+    third = jmFUUtil.padLedger(path)
+    self.assertEqual(third.reserve([(0, 16)], reuse=True), [(15, 30)])
+    self.assertEqual(jmFUUtil.padLedger(path).overlaps(0, 100), [(0, 30)])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of the statistics of a run (see runStats) and of their export (see writeStats()).
+'''
+import re
+import json
+import unittest
+
+from support import jmFUUtil, tempDirTestCase, referenceMix
+
+# A sample of the Prometheus text exposition format: name{label="value",...} number
+promSample = re.compile(r'^([a-z_]+)\{((?:[a-z]+="(?:[^"\\\n]|\\[\\"n])*",?)+)\} (\S+)$')
+promLabel = re.compile(r'([a-z]+)="((?:[^"\\\n]|\\[\\"n])*)"')
+
+def promUnescape(value):
+  return re.sub(r'\\([\\"n])', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+class writeStatsTest(tempDirTestCase):
+  '''
+  A run exporting its statistics: as JSON, and in the Prometheus text format with the labels
+  escaped (an Input File path with a quote, a backslash and a newline in it).
+  '''
+  numBytes = 50000
+
+  def setUp(self):
+    tempDirTestCase.setUp(self)
+    self.data = self.randomBytes(7000)
+    self.key = self.randomBytes(333)
+
+  def runJmFU(self, padName, statsName):
+    conf = dict(INPUT1=self.writeFile(padName, self.data), INPUT1_oset=100,
+                INPUT2=self.writeFile('key', self.key), INPUT2_oset=5, INPUT2_bwNot=True,
+                OUTPUT=self.path('out'), NumOfBytes=self.numBytes, ChunkSize=4096,
+                StatsPath=self.path(statsName))
+    fw_obj = jmFUUtil.jmFU(**conf)
+    logMsg, execFlag = fw_obj.run()
+    self.assertTrue(execFlag, logMsg)
+    self.assertEqual(self.readFile('out'),
+                     referenceMix([(self.data, 100, False), (self.key, 5, True)], self.numBytes))
+    return fw_obj
+
+  def testJson(self):
+    fw_obj = self.runJmFU('pad', 'stats.json')
+    stats = json.loads(self.readFile('stats.json').decode('utf-8'))
+    self.assertEqual(stats, json.loads(json.dumps(fw_obj.stats)))
+    self.assertTrue(stats['ok'])
+    self.assertEqual(stats['method'], 'overwriteFile')
+    self.assertEqual(stats['bytes_written'], self.numBytes)
+    self.assertGreater(stats['chunks'], 1)
+    self.assertIn('total', stats['seconds'])
+    inputs = dict((inp['path'], inp) for inp in stats['inputs'])
+    self.assertEqual(sorted(inputs), sorted([self.path('pad'), self.path('key')]))
+    self.assertEqual(inputs[self.path('pad')]['bytes_read'], self.numBytes)
+    self.assertEqual(inputs[self.path('pad')]['wraps'], (100 + self.numBytes) // 7000)
+
+  def testPrometheus(self):
+    padName = 'pa"d\\1\nx'
+    self.runJmFU(padName, 'stats.prom')
+    text = self.readFile('stats.prom').decode('utf-8')
+    self.assertTrue(text.endswith('\n'))
+    samples = {}
+    for line in text.splitlines():
+      if line.startswith('# TYPE '):
+        continue
+      match = promSample.match(line)
+      self.assertTrue(match, line)
+      labels = dict((name, promUnescape(value)) for name, value in promLabel.findall(match.group(2)))
+      samples.setdefault(match.group(1), []).append((labels, float(match.group(3))))
+    self.assertEqual(samples['jmfu_bytes_written'], [({'method': 'overwriteFile'}, self.numBytes)])
+    self.assertEqual(samples['jmfu_success'], [({'method': 'overwriteFile'}, 1)])
+    readBytes = dict((labels['input'], n) for labels, n in samples['jmfu_input_bytes_read'])
+    self.assertEqual(readBytes, {self.path(padName): self.numBytes, self.path('key'): self.numBytes})
+
+  def testLabelEscaping(self):
+    self.assertEqual(jmFUUtil._promLabel('a\\b"c\nd'), 'a\\\\b\\"c\\nd')
+    self.assertEqual(promUnescape(jmFUUtil._promLabel('a\\nb"\\\n')), 'a\\nb"\\\n')
+
+if __name__ == '__main__':
+  unittest.main()